@@ -1,3 +1,18 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import Outbox
+
+
+@admin.register(Outbox)
+class OutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('contacto', 'created_at', 'sent_at', 'last_error')
+    actions = ('retry_now',)
+
+    @admin.action(description='Reintentar ahora')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
+        self.message_user(request, f'{updated} correo(s) vuelven a la cola.')
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from contacto.outbox import dispatch_batch, purge_sent
+
+
+class Command(BaseCommand):
+    help = 'Despachador: envía por lotes los correos de la cola Outbox, reutilizando la conexión SMTP.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Vacía la cola de correos vencidos y termina.')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=5.0, help='Segundos entre consultas a la cola.')
+
+    def handle(self, *args, **options):
+        retention = getattr(settings, 'OUTBOX_RETENTION_DAYS', 7)
+        self.stdout.write('Despachador de correo iniciado.')
+        while True:
+            result = dispatch_batch(options['batch_size'])
+            if any(result.values()):
+                self.stdout.write(
+                    f'Lote: {result["sent"]} enviados, {result["retried"]} para reintentar, '
+                    f'{result["failed"]} fallidos definitivamente, {result["deferred"]} aplazados'
+                )
+                continue
+            purged = purge_sent(retention)
+            if purged:
+                self.stdout.write(f'{purged} correo(s) enviados antiguos eliminados.')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Contacto(models.Model):
     nombre = models.CharField(max_length=100)
@@ -9,3 +10,39 @@ class Contacto(models.Model):
 
     def __str__(self) -> str:
         return f"{self.nombre} - {self.asunto}"
+
+
+class Outbox(models.Model):
+    """Correo pendiente para el despachador `send_outbox`.
+
+    Se escribe en la misma transacción que el Contacto: si el formulario se guarda, el
+    correo acabará saliendo aunque el servidor SMTP esté caído en ese momento.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En cola'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ]
+
+    contacto = models.ForeignKey(Contacto, on_delete=models.SET_NULL, null=True, blank=True, related_name='correos')
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    reply_to = models.CharField(max_length=254, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Próximo envío posible: espera de reintento o reserva de un despachador en curso
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='contacto_outbox_due_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.subject} ({self.get_status_display()})"
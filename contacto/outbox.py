@@ -0,0 +1,146 @@
+"""Cola de correos salientes (Outbox) y su despachador.
+
+El despachador reserva un lote de correos vencidos, los envía por una única conexión SMTP
+y anota el resultado de todo el lote con una sola actualización. Los fallos se reintentan
+con espera exponencial hasta OUTBOX_MAX_ATTEMPTS.
+
+La reserva dura OUTBOX_LEASE_SECONDS. Un lote deja de enviar al llegar a la mitad de ese
+tiempo y devuelve a la cola lo que no envió, y cada envío tiene como mucho un cuarto de
+margen (timeout de la conexión): así ningún correo se envía después de que otro
+despachador haya podido reservarlo.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Outbox
+
+
+def contact_recipient():
+    return getattr(settings, 'EMAIL_HOST_USER', None)
+
+
+def enqueue_contact_email(contacto):
+    """Encola el aviso de un mensaje de contacto. Llamar dentro de la transacción que lo guarda."""
+    recipient = contact_recipient()
+    if not recipient:
+        return None
+    sender = getattr(settings, 'DEFAULT_FROM_EMAIL', None) or recipient
+    return Outbox.objects.create(
+        contacto=contacto,
+        subject=f'Nuevo mensaje de contacto: {contacto.asunto}',
+        body=(
+            f"Nombre: {contacto.nombre}\n"
+            f"Email: {contacto.email}\n"
+            f"Asunto: {contacto.asunto}\n\n"
+            f"Mensaje:\n{contacto.mensaje}"
+        ),
+        from_email=sender,
+        recipients=[recipient],
+        reply_to=contacto.email,
+    )
+
+
+def claim_batch(limit: int) -> list:
+    """Reserva hasta `limit` correos vencidos; otro despachador no los verá hasta que
+    pase OUTBOX_LEASE_SECONDS (p. ej. si este muere a mitad de lote)."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = Outbox.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:limit])
+        if batch:
+            lease = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+            Outbox.objects.filter(pk__in=[message.pk for message in batch]).update(next_attempt_at=lease)
+    return batch
+
+
+def _backoff(attempts: int) -> timedelta:
+    seconds = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def _mark_failed(message: Outbox, error: Exception) -> None:
+    message.attempts += 1
+    message.last_error = f'{error.__class__.__name__}: {error}'
+    if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        message.status = 'failed'
+    else:
+        message.next_attempt_at = timezone.now() + _backoff(message.attempts)
+
+
+def _email(message: Outbox, smtp) -> EmailMessage:
+    return EmailMessage(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email,
+        to=message.recipients,
+        reply_to=[message.reply_to] if message.reply_to else None,
+        connection=smtp,
+    )
+
+
+def dispatch_batch(limit: int = 50) -> dict:
+    """Envía un lote por una sola conexión.
+
+    Devuelve {'sent': n, 'retried': n, 'failed': n, 'deferred': n}; los aplazados son los
+    que no dio tiempo a enviar dentro de la reserva y vuelven a la cola sin contar intento.
+    """
+    lease = settings.OUTBOX_LEASE_SECONDS
+    deadline = time.monotonic() + lease / 2
+    batch = claim_batch(limit)
+    result = {'sent': 0, 'retried': 0, 'failed': 0, 'deferred': 0}
+    if not batch:
+        return result
+
+    smtp = get_connection(fail_silently=False, timeout=getattr(settings, 'EMAIL_TIMEOUT', None) or lease / 4)
+    pending = list(batch)
+    try:
+        smtp.open()
+        while pending and time.monotonic() < deadline:
+            message = pending.pop(0)
+            try:
+                smtp.send_messages([_email(message, smtp)])
+            except Exception as error:
+                _mark_failed(message, error)
+                # La conexión puede haber quedado inservible: se abre otra para el resto
+                smtp.close()
+                smtp.open()
+            else:
+                message.status = 'sent'
+                message.sent_at = timezone.now()
+    except Exception as error:
+        # No se pudo (re)abrir la conexión: el resto del lote se reintenta más tarde
+        for message in pending:
+            _mark_failed(message, error)
+        pending = []
+    finally:
+        smtp.close()
+
+    # Se acabó el tiempo de la reserva: lo que queda puede tomarlo ya otro despachador
+    deferred = {message.pk for message in pending}
+    for message in pending:
+        message.next_attempt_at = timezone.now()
+
+    Outbox.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    for message in batch:
+        if message.pk in deferred:
+            result['deferred'] += 1
+        elif message.status == 'sent':
+            result['sent'] += 1
+        elif message.status == 'failed':
+            result['failed'] += 1
+        else:
+            result['retried'] += 1
+    return result
+
+
+def purge_sent(max_age_days: int) -> int:
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    deleted, _ = Outbox.objects.filter(status='sent', sent_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,86 @@
+"""Filtros baratos contra el spam del formulario de contacto.
+
+Se aplican antes de tocar la base de datos, de menos a más caro:
+
+1. Honeypot: un campo oculto que un humano deja vacío.
+2. Tiempo de relleno: el formulario lleva la hora firmada en que se mostró; los envíos
+   en menos de CONTACT_MIN_FILL_SECONDS son de un bot y los de un token caducado o
+   manipulado se rechazan.
+3. Límite por IP (THROTTLE_CONTACT_IP_RATE), con el mismo Throttle que login y registro.
+4. Duplicados: el hash del mensaje normalizado se recuerda CONTACT_DEDUP_SECONDS y los
+   reenvíos idénticos dentro de esa ventana se descartan, vengan de la IP o del correo que
+   vengan (ambos los controla quien envía).
+
+Los rechazos se cuentan por motivo en la caché THROTTLE_CACHE (compartida si lo es la
+caché) y se publican en /performance/.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+
+from vaul.throttling import Throttle
+
+HONEYPOT_FIELD = 'website'
+TOKEN_FIELD = 'form_token'
+TOKEN_SALT = 'contacto.form'
+REJECTION_REASONS = ('honeypot', 'too_fast', 'expired', 'rate_limited', 'duplicate')
+
+contact_throttle = Throttle('contacto', 'THROTTLE_CONTACT_IP_RATE')
+
+
+def _cache():
+    return caches[settings.THROTTLE_CACHE]
+
+
+def form_token() -> str:
+    """Hora firmada en que se muestra el formulario."""
+    return signing.dumps(time.time(), salt=TOKEN_SALT)
+
+
+def check_bot(data) -> str:
+    """Honeypot y tiempo de relleno. Devuelve '' si pasa o el motivo del rechazo."""
+    if data.get(HONEYPOT_FIELD):
+        return 'honeypot'
+    try:
+        rendered_at = signing.loads(
+            data.get(TOKEN_FIELD, ''), salt=TOKEN_SALT, max_age=settings.CONTACT_FORM_MAX_AGE
+        )
+    except signing.BadSignature:  # Incluye SignatureExpired
+        return 'expired'
+    if time.time() - float(rendered_at) < settings.CONTACT_MIN_FILL_SECONDS:
+        return 'too_fast'
+    return ''
+
+
+def _message_key(mensaje: str) -> str:
+    normalized = ' '.join(mensaje.lower().split())
+    return 'contacto:dedup:' + hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def claim_message(mensaje: str) -> bool:
+    """Reserva el mensaje en la ventana de duplicados. False si ya se recibió uno igual."""
+    return _cache().add(_message_key(mensaje), 1, settings.CONTACT_DEDUP_SECONDS)
+
+
+def release_message(mensaje: str) -> None:
+    """Deshace claim_message (p. ej. si no se pudo guardar el mensaje)."""
+    _cache().delete(_message_key(mensaje))
+
+
+def count_rejection(reason: str) -> None:
+    cache = _cache()
+    key = f'contacto:rejected:{reason}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # La caché lo desalojó entre add e incr
+        cache.set(key, 1, None)
+
+
+def rejection_counts() -> dict:
+    counts = _cache().get_many([f'contacto:rejected:{reason}' for reason in REJECTION_REASONS])
+    return {reason: counts.get(f'contacto:rejected:{reason}', 0) for reason in REJECTION_REASONS}
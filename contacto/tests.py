@@ -1,3 +1,200 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail, signing
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import spam
+from .models import Contacto, Outbox
+from .outbox import dispatch_batch, enqueue_contact_email
+
+LOCMEM = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+@override_settings(
+    EMAIL_BACKEND=LOCMEM,
+    EMAIL_HOST_USER='buzon@example.com',
+    DEFAULT_FROM_EMAIL='web@example.com',
+    OUTBOX_MAX_ATTEMPTS=3,
+    OUTBOX_RETRY_BASE_SECONDS=60,
+    OUTBOX_RETRY_MAX_SECONDS=3600,
+    OUTBOX_LEASE_SECONDS=300,
+)
+class OutboxDispatchTests(TestCase):
+    def _enqueue(self, n=1):
+        for i in range(n):
+            contacto = Contacto.objects.create(
+                nombre='Ana', email=f'ana{i}@example.com', asunto='Consulta', mensaje=f'Mensaje número {i}'
+            )
+            enqueue_contact_email(contacto)
+
+    def _make_due(self):
+        Outbox.objects.update(next_attempt_at=timezone.now())
+
+    def test_sends_the_batch_over_one_connection(self):
+        self._enqueue(3)
+        with mock.patch(f'{LOCMEM}.open') as open_connection:
+            result = dispatch_batch()
+        self.assertEqual(result, {'sent': 3, 'retried': 0, 'failed': 0, 'deferred': 0})
+        self.assertEqual(open_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['buzon@example.com'])
+        self.assertEqual(mail.outbox[0].reply_to, ['ana0@example.com'])
+        self.assertFalse(Outbox.objects.exclude(status='sent').exists())
+
+    def test_failed_send_is_retried_with_backoff_until_max_attempts(self):
+        self._enqueue()
+        with mock.patch(f'{LOCMEM}.send_messages', side_effect=OSError('conexión rechazada')):
+            before = timezone.now()
+            self.assertEqual(dispatch_batch(), {'sent': 0, 'retried': 1, 'failed': 0, 'deferred': 0})
+            message = Outbox.objects.get()
+            self.assertEqual((message.status, message.attempts), ('pending', 1))
+            self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=60))
+            self.assertIn('conexión rechazada', message.last_error)
+
+            # Aún no vence: no se vuelve a intentar
+            self.assertEqual(dispatch_batch(), {'sent': 0, 'retried': 0, 'failed': 0, 'deferred': 0})
+
+            self._make_due()
+            before = timezone.now()
+            dispatch_batch()
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, 2)
+            self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=120))
+
+            self._make_due()
+            self.assertEqual(dispatch_batch(), {'sent': 0, 'retried': 0, 'failed': 1, 'deferred': 0})
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 3))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_one_failure_does_not_stop_the_rest_of_the_batch(self):
+        self._enqueue(3)
+        real_send = mail.get_connection(LOCMEM).__class__.send_messages
+        calls = []
+
+        def flaky_send(backend, messages):
+            calls.append(messages)
+            if len(calls) == 2:
+                raise OSError('timeout')
+            return real_send(backend, messages)
+
+        with mock.patch(f'{LOCMEM}.send_messages', flaky_send):
+            self.assertEqual(dispatch_batch(), {'sent': 2, 'retried': 1, 'failed': 0, 'deferred': 0})
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_batch_stops_before_the_lease_expires(self):
+        self._enqueue(3)
+        with mock.patch('contacto.outbox.time') as clock:
+            clock.monotonic.side_effect = [0.0, 10.0, 200.0]
+            result = dispatch_batch()
+        self.assertEqual(result, {'sent': 1, 'retried': 0, 'failed': 0, 'deferred': 2})
+        # Los aplazados quedan disponibles al momento y sin gastar intentos
+        deferred = Outbox.objects.filter(status='pending')
+        self.assertEqual(deferred.count(), 2)
+        self.assertFalse(deferred.filter(next_attempt_at__gt=timezone.now()).exists())
+        self.assertFalse(deferred.exclude(attempts=0).exists())
+        self.assertEqual(dispatch_batch()['sent'], 2)
+
+    @override_settings(EMAIL_HOST_USER='')
+    def test_nothing_is_queued_without_a_recipient(self):
+        self._enqueue()
+        self.assertFalse(Outbox.objects.exists())
+
+
+@override_settings(
+    EMAIL_BACKEND=LOCMEM,
+    EMAIL_HOST_USER='buzon@example.com',
+    THROTTLE_ENABLED=True,
+    THROTTLE_CONTACT_IP_RATE='3/600',
+    CONTACT_MIN_FILL_SECONDS=3,
+    CONTACT_FORM_MAX_AGE=3600,
+    CONTACT_DEDUP_SECONDS=3600,
+)
+class ContactSpamTests(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+
+    def _token(self, age=10):
+        # El formulario se mostró hace `age` segundos (también la firma)
+        shown_at = time.time() - age
+        with mock.patch('django.core.signing.time.time', return_value=shown_at):
+            return signing.dumps(shown_at, salt=spam.TOKEN_SALT)
+
+    def _post(self, email='ana@example.com', mensaje='Hola, necesito ayuda con mi cuenta', **overrides):
+        data = {
+            'nombre': 'Ana', 'email': email, 'asunto': 'Consulta', 'mensaje': mensaje,
+            spam.TOKEN_FIELD: self._token(), spam.HONEYPOT_FIELD: '',
+        }
+        data.update(overrides)
+        return self.client.post('/contacto/', data)
+
+    def test_form_carries_token_and_honeypot(self):
+        response = self.client.get('/contacto/')
+        self.assertContains(response, f'name="{spam.TOKEN_FIELD}"')
+        self.assertContains(response, f'name="{spam.HONEYPOT_FIELD}"')
+
+    def test_valid_message_is_saved_and_queued(self):
+        self.assertEqual(self._post().status_code, 302)
+        self.assertEqual(Contacto.objects.count(), 1)
+        self.assertEqual(Outbox.objects.count(), 1)
+
+    def test_bots_are_discarded_before_the_database(self):
+        cases = {
+            'honeypot': {spam.HONEYPOT_FIELD: 'https://spam.example.com'},
+            'too_fast': {spam.TOKEN_FIELD: self._token(age=0)},
+        }
+        for reason, overrides in cases.items():
+            with self.subTest(reason=reason), self.assertNumQueries(0):
+                response = self._post(**overrides)
+                # Al bot se le responde como si se hubiera enviado
+                self.assertEqual(response.status_code, 302)
+        self.assertFalse(Contacto.objects.exists())
+        self.assertEqual(spam.rejection_counts()['honeypot'], 1)
+        self.assertEqual(spam.rejection_counts()['too_fast'], 1)
+
+    def test_expired_or_forged_token_asks_to_resend(self):
+        for token in (self._token(age=7200), 'falso', ''):
+            with self.subTest(token=token), self.assertNumQueries(0):
+                response = self._post(**{spam.TOKEN_FIELD: token})
+                self.assertEqual(response.status_code, 400)
+                self.assertContains(response, 'caducado', status_code=400)
+        self.assertFalse(Contacto.objects.exists())
+        self.assertEqual(spam.rejection_counts()['expired'], 3)
+
+    def test_duplicate_message_is_discarded(self):
+        self._post()
+        with self.assertNumQueries(0):
+            response = self._post(mensaje='  HOLA, necesito ayuda   con mi cuenta ')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Contacto.objects.count(), 1)
+        self.assertEqual(spam.rejection_counts()['duplicate'], 1)
+
+    def test_same_message_from_rotating_senders_is_discarded(self):
+        # El correo lo elige quien envía: cambiarlo no evita la ventana de duplicados
+        for email in ('ana@example.com', 'luis@example.com', 'bot1@spam.example'):
+            self.assertEqual(self._post(email=email).status_code, 302)
+        self.assertEqual(Contacto.objects.count(), 1)
+        self.assertEqual(spam.rejection_counts()['duplicate'], 2)
+
+    def test_rate_limit_returns_429(self):
+        for i in range(3):
+            self.assertEqual(self._post(mensaje=f'Mensaje distinto número {i}').status_code, 302)
+        with self.assertNumQueries(0):
+            response = self._post(mensaje='Otro mensaje más')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        self.assertEqual(Contacto.objects.count(), 3)
+        self.assertEqual(spam.rejection_counts()['rate_limited'], 1)
+
+    def test_failed_save_releases_the_duplicate_window(self):
+        with mock.patch('contacto.views.enqueue_contact_email', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._post()
+        self.assertFalse(Contacto.objects.exists())
+        self.assertEqual(self._post().status_code, 302)
+        self.assertEqual(Contacto.objects.count(), 1)
@@ -1,36 +1,64 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
 from .forms import ContactoForm
+from .outbox import enqueue_contact_email
+from . import spam
+
+SUCCESS_MESSAGE = '¡Mensaje enviado con éxito! Nos pondremos en contacto contigo pronto.'
+
+def _render(request, form, status=200):
+    context = {
+        'form': form,
+        'form_token': spam.form_token(),
+        'honeypot_field': spam.HONEYPOT_FIELD,
+        'token_field': spam.TOKEN_FIELD,
+    }
+    return render(request, 'contacto/contacto.html', context, status=status)
+
+def _discard(request, reason):
+    # Al bot (o al doble envío) se le responde como si se hubiera aceptado
+    spam.count_rejection(reason)
+    messages.success(request, SUCCESS_MESSAGE)
+    return redirect('contacto:contacto')
 
 def contacto(request):
     if request.method == 'POST':
-        form = ContactoForm(request.POST)
-        if form.is_valid():
-            contacto = form.save()
+        # Todos los filtros van antes de la base de datos
+        reason = spam.check_bot(request.POST)
+        if reason == 'expired':
+            spam.count_rejection(reason)
+            messages.error(request, 'El formulario ha caducado. Por favor, envíalo de nuevo.')
+            return _render(request, ContactoForm(request.POST), status=400)
+        if reason:
+            return _discard(request, reason)
 
-            subject = f'Nuevo mensaje de contacto: {contacto.asunto}'
-            message = (
-                f"Nombre: {contacto.nombre}\n"
-                f"Email: {contacto.email}\n"
-                f"Asunto: {contacto.asunto}\n\n"
-                f"Mensaje:\n{contacto.mensaje}"
-            )
+        wait = spam.contact_throttle.attempt(request)
+        if wait:
+            spam.count_rejection('rate_limited')
+            messages.error(request, f'Demasiados mensajes. Vuelve a intentarlo en {wait} segundos.')
+            response = _render(request, ContactoForm(request.POST), status=429)
+            response['Retry-After'] = str(wait)
+            return response
 
+        form = ContactoForm(request.POST)
+        if form.is_valid():
+            mensaje = form.cleaned_data['mensaje']
+            if not spam.claim_message(mensaje):
+                return _discard(request, 'duplicate')
+            # El correo lo envía el despachador (manage.py send_outbox): la petición no espera al SMTP
             try:
-                sender = getattr(settings, 'DEFAULT_FROM_EMAIL', None) or getattr(settings, 'EMAIL_HOST_USER', None) or 'no-reply@example.com'
-                recipient = getattr(settings, 'EMAIL_HOST_USER', None)
-                if recipient:
-                    send_mail(subject, message, sender, [recipient], fail_silently=False)
-                messages.success(request, '¡Mensaje enviado con éxito! Nos pondremos en contacto contigo pronto.')
+                with transaction.atomic():
+                    contacto = form.save()
+                    enqueue_contact_email(contacto)
             except Exception:
-                messages.error(request, 'Hubo un error al enviar el mensaje. Por favor, inténtalo de nuevo más tarde.')
-
+                spam.release_message(mensaje)
+                raise
+            messages.success(request, SUCCESS_MESSAGE)
             return redirect('contacto:contacto')
     else:
         form = ContactoForm()
 
-    return render(request, 'contacto/contacto.html', {'form': form})
+    return _render(request, form)
 
 # Create your views here.
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'password_manager.settings')
+# Los settings ajustan las conexiones persistentes según el servidor (ver DB_CONN_MAX_AGE)
+os.environ.setdefault('SERVER_GATEWAY', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,212 @@
+"""Compresión gzip o brotli de las respuestas dinámicas, también las de streaming.
+
+Las respuestas de streaming (exportaciones, CSV de registros) se comprimen trozo a trozo a
+medida que se generan: nunca se acumula el cuerpo entero. Se omiten las respuestas pequeñas,
+las que ya traen Content-Encoding y los tipos que no son texto.
+
+BREACH: para deducir un secreto por el tamaño de la respuesta comprimida, el atacante
+tiene que provocar muchas peticiones desde otro sitio y mezclar texto suyo con el secreto.
+Por eso no se comprime nada pedido desde otro sitio (Sec-Fetch-Site: cross-site), gzip lleva
+relleno aleatorio en la cabecera (como GZipMiddleware de Django) y las vistas que devuelven
+contraseñas en claro se excluyen con `no_compression`. El token CSRF ya va enmascarado de
+forma distinta en cada respuesta.
+"""
+import secrets
+import string
+import struct
+import zlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .staticfiles import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin él solo se ofrece gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+# Bytes de relleno aleatorio como máximo en la cabecera gzip (igual que Django)
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+class GzipCompressor:
+    """Gzip incremental con un nombre de fichero aleatorio en la cabecera.
+
+    El relleno cambia la longitud de cada respuesta, lo que dificulta medir el efecto de la
+    compresión ("Heal the BREACH").
+    """
+
+    def __init__(self, level: int = 6, max_random_bytes: int = GZIP_MAX_RANDOM_BYTES):
+        padding = ''.join(
+            secrets.choice(string.ascii_letters) for _ in range(secrets.randbelow(max_random_bytes) + 1)
+        )
+        # ID1 ID2 CM FLG(FNAME) MTIME XFL OS, nombre terminado en NUL
+        self._header = b'\x1f\x8b\x08\x08\x00\x00\x00\x00\x00\xff' + padding.encode('ascii') + b'\x00'
+        self._deflate = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self._crc = 0
+        self._size = 0
+
+    def _with_header(self, data: bytes) -> bytes:
+        if self._header:
+            data, self._header = self._header + data, b''
+        return data
+
+    def compress(self, data: bytes) -> bytes:
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        return self._with_header(self._deflate.compress(data))
+
+    def flush(self) -> bytes:
+        return self._with_header(self._deflate.flush(zlib.Z_SYNC_FLUSH))
+
+    def finish(self) -> bytes:
+        tail = self._deflate.flush(zlib.Z_FINISH) + struct.pack('<II', self._crc, self._size & 0xFFFFFFFF)
+        return self._with_header(tail)
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int = 4):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def make_compressor(encoding: str):
+    if encoding == 'br':
+        return BrotliCompressor(getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4))
+    return GzipCompressor(getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6))
+
+
+def compress_iterator(chunks, compressor, flush_bytes: int):
+    """Comprime un iterador de bytes. Vacía el compresor cada `flush_bytes` de entrada
+    para que el cliente vaya recibiendo datos aunque los trozos sean pequeños."""
+    pending = 0
+    for chunk in chunks:
+        output = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_bytes:
+            output += compressor.flush()
+            pending = 0
+        if output:
+            yield output
+    yield compressor.finish()
+
+
+async def acompress_iterator(chunks, compressor, flush_bytes: int):
+    pending = 0
+    async for chunk in chunks:
+        output = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_bytes:
+            output += compressor.flush()
+            pending = 0
+        if output:
+            yield output
+    yield compressor.finish()
+
+
+def no_compression(view):
+    """Excluye la respuesta de la vista de CompressionMiddleware (p. ej. si lleva contraseñas)."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            response = await view(request, *args, **kwargs)
+            response.no_compression = True
+            return response
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        response.no_compression = True
+        return response
+    return wrapper
+
+
+class CompressionMiddleware:
+    """Negocia brotli o gzip con Accept-Encoding y comprime la respuesta."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'COMPRESSION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.flush_bytes = getattr(settings, 'COMPRESSION_FLUSH_BYTES', 64 * 1024)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress(request, await self.get_response(request))
+
+    def _compressible(self, request, response) -> bool:
+        if getattr(response, 'no_compression', False) or response.has_header('Content-Encoding'):
+            return False
+        if request.headers.get('Sec-Fetch-Site') == 'cross-site':
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        return response.streaming or len(response.content) >= self.min_size
+
+    def _compress(self, request, response):
+        if not self._compressible(request, response):
+            return response
+        # La respuesta depende de Accept-Encoding aunque a este cliente no se le comprima
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+        compressor = make_compressor(encoding)
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_iterator(
+                    response.streaming_content, compressor, self.flush_bytes
+                )
+            else:
+                response.streaming_content = compress_iterator(
+                    response.streaming_content, compressor, self.flush_bytes
+                )
+            response.headers.pop('Content-Length', None)
+        else:
+            compressed = compressor.compress(response.content) + compressor.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # La representación comprimida no es idéntica byte a byte a la original
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,24 @@
+"""Backend PostgreSQL de Django que mide cuánto se tarda en obtener cada conexión.
+
+Sin pool es el handshake completo (TCP, TLS y autenticación); con el pool de psycopg 3
+(OPTIONS['pool']) es la espera hasta que el pool entrega una conexión libre. El tiempo se
+suma a las métricas de la petición (password_manager.instrumentation).
+"""
+import time
+
+from django.db.backends.postgresql import base
+
+from password_manager.instrumentation import record_db_connect
+
+
+class TimedConnectMixin:
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        try:
+            return super().get_new_connection(conn_params)
+        finally:
+            record_db_connect(self.alias, time.perf_counter() - started)
+
+
+class DatabaseWrapper(TimedConnectMixin, base.DatabaseWrapper):
+    pass
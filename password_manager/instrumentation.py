@@ -0,0 +1,282 @@
+"""Instrumentación por petición: tiempo en SQL, en abrir conexiones, en cifrado (vaul.utils)
+y en plantillas.
+
+Cada petición se publica como cabecera Server-Timing, como una línea de log JSON y en
+una ventana deslizante de percentiles por vista (por proceso) que el staff puede consultar.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+from django.utils.functional import LazyObject, empty
+
+from vaul.utils import count_crypto
+
+logger = logging.getLogger('password_manager.performance')
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.db_connect_count = 0
+        self.db_connect_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar('perf_request_metrics', default=None)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_count += 1
+        metrics.sql_seconds += time.perf_counter() - started
+
+
+def install_execute_wrapper(wrapper) -> None:
+    """Añade `wrapper` a todas las conexiones, las ya abiertas y las que se abran después.
+
+    Queda instalado para toda la vida de la conexión, así que debe no hacer nada fuera de
+    una petición. Las vistas async usan conexiones de otros hilos, por eso no basta con
+    `connection.execute_wrapper()` alrededor de la vista.
+    """
+    def install(connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    # dispatch_uid: el middleware se vuelve a instanciar con cada handler (p. ej. en los tests)
+    connection_created.connect(install, weak=False, dispatch_uid=f'{wrapper.__module__}.{wrapper.__qualname__}')
+    # Conexiones abiertas antes de cargar el middleware (p. ej. por las comprobaciones del arranque)
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+
+
+class ConnectionStats:
+    """Conexiones obtenidas por alias en este proceso: handshakes o salidas del pool."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def add(self, alias: str, seconds: float) -> None:
+        with self._lock:
+            count, total, worst = self._stats.get(alias, (0, 0.0, 0.0))
+            self._stats[alias] = (count + 1, total + seconds, max(worst, seconds))
+
+    def summary(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+        return {
+            alias: {
+                'connections': count,
+                'avg_ms': round(total * 1000 / count, 2),
+                'max_ms': round(worst * 1000, 2),
+            }
+            for alias, (count, total, worst) in sorted(snapshot.items())
+        }
+
+
+connection_stats = ConnectionStats()
+
+
+def record_db_connect(alias: str, seconds: float) -> None:
+    """Lo llama el backend de password_manager.db cada vez que obtiene una conexión."""
+    connection_stats.add(alias, seconds)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.db_connect_count += 1
+        metrics.db_connect_seconds += seconds
+
+
+def pool_stats() -> dict:
+    """Estadísticas de psycopg_pool (esperas, colas, tamaño) de los alias con pool."""
+    result = {}
+    for connection in connections.all():
+        if connection.settings_dict['OPTIONS'].get('pool') and getattr(connection, 'pool', None):
+            result[connection.alias] = connection.pool.get_stats()
+    return result
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self._template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Motor de plantillas de Django que suma el tiempo de render a la petición en curso."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class ViewTimings:
+    """Últimas `window` peticiones de cada vista, para calcular percentiles."""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, view: str, sample: tuple) -> None:
+        with self._lock:
+            samples = self._samples.get(view)
+            if samples is None:
+                samples = self._samples[view] = deque(maxlen=self.window)
+            samples.append(sample)
+
+    def summary(self) -> dict:
+        with self._lock:
+            snapshot = {view: list(samples) for view, samples in self._samples.items()}
+        result = {}
+        for view, samples in sorted(snapshot.items()):
+            totals = sorted(sample[0] for sample in samples)
+            n = len(samples)
+            result[view] = {
+                'requests': n,
+                'p50_ms': round(_percentile(totals, 50), 2),
+                'p90_ms': round(_percentile(totals, 90), 2),
+                'p99_ms': round(_percentile(totals, 99), 2),
+                'max_ms': round(totals[-1], 2),
+                'avg_sql_ms': round(sum(sample[1] for sample in samples) / n, 2),
+                'avg_sql_queries': round(sum(sample[2] for sample in samples) / n, 1),
+                'avg_crypto_ms': round(sum(sample[3] for sample in samples) / n, 2),
+                'avg_template_ms': round(sum(sample[4] for sample in samples) / n, 2),
+                'avg_db_connect_ms': round(sum(sample[5] for sample in samples) / n, 2),
+            }
+        return result
+
+
+view_timings = ViewTimings()
+
+
+def _loaded_user(request):
+    """Usuario que la petición ya resolvió, o None: consultarlo aquí costaría leer la sesión
+    y auth_user en peticiones (anónimas, estáticos, API) que no lo necesitan."""
+    user = getattr(request, 'user', None)
+    if isinstance(user, LazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    return user or getattr(request, '_cached_user', None) or getattr(request, '_acached_user', None)
+
+
+class PerformanceMiddleware:
+    """Mide cada petición. Debe ir la primera en MIDDLEWARE para cubrir también a las demás."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PERF_SERVER_TIMING', 'staff')
+        view_timings.window = getattr(settings, 'PERF_METRICS_WINDOW', 500)
+        install_execute_wrapper(_sql_wrapper)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with count_crypto() as crypto:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+        return self._finish(request, response, metrics, crypto, elapsed, self._show_header(request))
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with count_crypto() as crypto:
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+        return self._finish(request, response, metrics, crypto, elapsed, self._show_header(request))
+
+    def _show_header(self, request) -> bool:
+        if self.server_timing == 'all':
+            return True
+        if self.server_timing != 'staff':
+            return False
+        # Se decide después de la vista y solo con el usuario que ya cargó
+        user = _loaded_user(request)
+        return user is not None and user.is_staff
+
+    def _finish(self, request, response, metrics, crypto, elapsed, show_header):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'sin_resolver'
+        total_ms = elapsed * 1000
+        sql_ms = metrics.sql_seconds * 1000
+        crypto_ms = crypto.seconds * 1000
+        template_ms = metrics.template_seconds * 1000
+        connect_ms = metrics.db_connect_seconds * 1000
+        view_timings.add(view, (total_ms, sql_ms, metrics.sql_count, crypto_ms, template_ms, connect_ms))
+
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'sql_queries': metrics.sql_count,
+            'sql_ms': round(sql_ms, 2),
+            'db_connects': metrics.db_connect_count,
+            'db_connect_ms': round(connect_ms, 2),
+            'crypto_encrypts': crypto.encrypts,
+            'crypto_decrypts': crypto.decrypts,
+            'crypto_ms': round(crypto_ms, 2),
+            'template_ms': round(template_ms, 2),
+        }))
+
+        if show_header:
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={sql_ms:.2f};desc="{metrics.sql_count} consultas"',
+                f'db-connect;dur={connect_ms:.2f};desc="{metrics.db_connect_count} conexiones"',
+                f'crypto;dur={crypto_ms:.2f};desc="{crypto.encrypts + crypto.decrypts} operaciones"',
+                f'tpl;dur={template_ms:.2f}',
+                f'total;dur={total_ms:.2f}',
+            ])
+        return response
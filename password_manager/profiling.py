@@ -0,0 +1,247 @@
+"""Perfilado opcional de peticiones: una fracción muestreada y todas las que superan un umbral.
+
+Con PROFILING_SAMPLE_RATE = 0 y PROFILING_SLOW_MS = 0 el middleware se retira al arrancar
+(MiddlewareNotUsed): no queda ni el envoltorio de SQL ni el hilo de muestreo.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .instrumentation import install_execute_wrapper
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 64
+
+# Desde Python 3.12 solo puede haber un perfilador activo por proceso (sys.monitoring):
+# las peticiones muestreadas que se solapan con otra perfilada usan el muestreo de pilas
+_cprofile_lock = threading.Lock()
+
+
+class _Capture:
+    """Estado de perfilado de una petición."""
+
+    def __init__(self, max_sql: int):
+        self.max_sql = max_sql
+        self.statements = []
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.stacks = Counter()
+        self.thread_id = threading.get_ident()
+        self.deadline = 0.0
+
+
+_capture: ContextVar[Optional[_Capture]] = ContextVar('profiling_capture', default=None)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    capture = _capture.get()
+    if capture is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        capture.sql_count += 1
+        capture.sql_seconds += elapsed
+        # Solo la sentencia: los parámetros pueden llevar datos cifrados o huellas
+        if len(capture.statements) < capture.max_sql:
+            capture.statements.append((elapsed * 1000, sql))
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class _StackSampler:
+    """Hilo que muestrea la pila de las peticiones que han pasado de su plazo.
+
+    Mientras ninguna petición lo supera solo se despierta cada `interval` segundos
+    para comprobar los plazos.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._watched = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def watch(self, capture: _Capture) -> None:
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+                    self._thread.start()
+        with self._lock:
+            self._watched.add(capture)
+
+    def unwatch(self, capture: _Capture) -> None:
+        with self._lock:
+            self._watched.discard(capture)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self._lock:
+                due = [capture for capture in self._watched if now >= capture.deadline]
+            if not due:
+                continue
+            frames = sys._current_frames()
+            for capture in due:
+                frame = frames.get(capture.thread_id)
+                if frame is not None:
+                    capture.stacks[_fold(frame)] += 1
+
+
+class ProfilingMiddleware:
+    """Guarda un SlowRequest para las peticiones muestreadas y para las lentas.
+
+    Las muestreadas de vistas síncronas se perfilan con cProfile, de una en una por proceso.
+    El resto (lentas, vistas async y muestreadas mientras otra se perfila) se muestrean con
+    el hilo de pilas desde que pasan el umbral, o desde el inicio si están muestreadas. En las vistas async se muestrea el hilo del bucle de eventos.
+    Bajo WSGI una vista async corre en otro hilo, así que su cProfile solo refleja la espera;
+    el SQL sí se captura igualmente.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        slow_ms = getattr(settings, 'PROFILING_SLOW_MS', 0)
+        if self.sample_rate <= 0 and slow_ms <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = slow_ms / 1000 if slow_ms > 0 else None
+        self.max_sql = getattr(settings, 'PROFILING_MAX_SQL', 500)
+        self.sampler = _StackSampler(getattr(settings, 'PROFILING_STACK_INTERVAL_MS', 10) / 1000)
+        install_execute_wrapper(_sql_wrapper)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, use_cprofile: bool):
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and self.slow_seconds is None:
+            return None, None, None
+        capture = _Capture(self.max_sql)
+        if sampled and use_cprofile and _cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                return capture, profiler, sampled
+            except Exception:
+                # Otra herramienta (un depurador, coverage) ocupa el perfilador
+                _cprofile_lock.release()
+                logger.warning('cProfile no disponible; se muestrean pilas', exc_info=True)
+        capture.deadline = time.perf_counter() + (0 if sampled else self.slow_seconds)
+        self.sampler.watch(capture)
+        return capture, None, sampled
+
+    @staticmethod
+    def _stop(profiler) -> None:
+        try:
+            profiler.disable()
+        finally:
+            _cprofile_lock.release()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        capture, profiler, sampled = self._start(use_cprofile=True)
+        if capture is None:
+            return self.get_response(request)
+        token = _capture.set(capture)
+        started = time.perf_counter()
+        try:
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    self._stop(profiler)
+        finally:
+            _capture.reset(token)
+            self.sampler.unwatch(capture)
+        record = self._build(request, response, capture, profiler, sampled, time.perf_counter() - started)
+        if record is not None:
+            self._save(record)
+        return response
+
+    async def __acall__(self, request):
+        # cProfile no distingue peticiones que se intercalan en el mismo bucle: solo pilas
+        capture, _, sampled = self._start(use_cprofile=False)
+        if capture is None:
+            return await self.get_response(request)
+        token = _capture.set(capture)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _capture.reset(token)
+            self.sampler.unwatch(capture)
+        record = self._build(request, response, capture, None, sampled, time.perf_counter() - started)
+        if record is not None:
+            await sync_to_async(self._save)(record)
+        return response
+
+    def _build(self, request, response, capture: _Capture, profiler, sampled: bool, elapsed: float):
+        from vaul.models import SlowRequest
+
+        slow = self.slow_seconds is not None and elapsed >= self.slow_seconds
+        if not (sampled or slow):
+            return None
+        if profiler is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            stats.sort_stats('cumulative').print_stats(40)
+            profile_format, summary, data = 'cprofile', stream.getvalue(), marshal.dumps(stats.stats)
+        else:
+            folded = [f'{stack} {count}' for stack, count in capture.stacks.most_common()]
+            profile_format, summary, data = 'stacks', '\n'.join(folded[:20]), '\n'.join(folded).encode()
+
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, '_cached_user', None) or getattr(request, '_acached_user', None)
+        return SlowRequest(
+            reason='slow' if slow else 'sampled',
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            view_name=match.view_name if match else '',
+            status_code=response.status_code,
+            user=user if user is not None and user.is_authenticated else None,
+            duration_ms=elapsed * 1000,
+            sql_count=capture.sql_count,
+            sql_ms=capture.sql_seconds * 1000,
+            sql='\n'.join(f'{ms:8.2f} ms  {sql}' for ms, sql in capture.statements),
+            profile_format=profile_format,
+            profile_summary=summary,
+            profile_data=data,
+        )
+
+    def _save(self, record) -> None:
+        try:
+            record.save()
+        except Exception:
+            # El perfilado nunca debe romper la respuesta
+            logger.exception('No se pudo guardar el perfil de %s', record.path)
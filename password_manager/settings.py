@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,7 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # La primera, para medir también al resto del middleware
+    'password_manager.instrumentation.PerformanceMiddleware',
+    'password_manager.profiling.ProfilingMiddleware',
+    'vaul.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'password_manager.staticfiles.StaticFilesMiddleware',
+    'password_manager.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,7 +62,8 @@ ROOT_URLCONF = 'password_manager.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + tiempo de render por petición (ver password_manager.instrumentation)
+        'BACKEND': 'password_manager.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -76,18 +83,147 @@ WSGI_APPLICATION = 'password_manager.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 
+# Bajo WSGI las conexiones se reutilizan entre peticiones durante DB_CONN_MAX_AGE segundos y
+# se comprueban antes de reutilizarlas. Bajo ASGI el trabajo síncrono de cada petición puede
+# ir a un hilo distinto y las conexiones persistentes se acumulan en vez de reutilizarse, así
+# que por defecto no se reutilizan: ahí conviene DB_POOL=True, el pool de psycopg 3 (requiere
+# psycopg[pool]), que comprueba cada conexión al entregarla.
+# Los tiempos de conexión y de espera del pool salen en /performance/
+SERVER_GATEWAY = config('SERVER_GATEWAY', default='wsgi')  # password_manager.asgi lo pone a 'asgi'
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_OPTIONS = {}
+if DB_POOL:
+    from psycopg_pool import ConnectionPool
+
+    DB_OPTIONS['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        # Segundos máximos esperando una conexión libre antes de fallar
+        'timeout': config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+        'max_idle': config('DB_POOL_MAX_IDLE', default=300.0, cast=float),
+        'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=1800.0, cast=float),
+        'check': ConnectionPool.check_connection,
+    }
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # Backend PostgreSQL de Django que además mide el tiempo de conexión
+        'ENGINE': 'password_manager.db',
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', default='5432'),
+        # El pool y las conexiones persistentes de Django son incompatibles
+        'CONN_MAX_AGE': 0 if DB_POOL else config(
+            'DB_CONN_MAX_AGE', default=0 if SERVER_GATEWAY == 'asgi' else 60, cast=int
+        ),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': DB_OPTIONS,
     }
 }
 
+# Réplicas de solo lectura (mismas credenciales que el primario). Solo las usan las vistas
+# marcadas con vaul.replicas.read_from_replica; quien acaba de escribir lee del primario
+# durante DB_REPLICA_PIN_SECONDS
+DATABASE_REPLICAS = []
+for index, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'OPTIONS': dict(DB_OPTIONS),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+DATABASE_ROUTERS = ['vaul.replicas.PrimaryReplicaRouter']
+DB_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=5, cast=int)
+
 FERNET_KEY = config('FERNET_KEY')
+# Claves aceptadas al descifrar; la primera es la que cifra (MultiFernet)
+FERNET_KEYS = config('FERNET_KEYS', default=FERNET_KEY, cast=Csv())
+# Reparto opcional de los lotes de cifrado grandes entre hilos (1 = desactivado)
+CRYPTO_MAX_WORKERS = config('CRYPTO_MAX_WORKERS', default=1, cast=int)
+CRYPTO_PARALLEL_THRESHOLD = config('CRYPTO_PARALLEL_THRESHOLD', default=512, cast=int)
+# Hilos que descifran para las vistas async (el bucle de eventos nunca descifra)
+CRYPTO_ASYNC_WORKERS = config('CRYPTO_ASYNC_WORKERS', default=4, cast=int)
+# Clave HMAC para las huellas de contraseñas (detección de duplicados sin descifrar)
+PASSWORD_FINGERPRINT_KEY = config('PASSWORD_FINGERPRINT_KEY', default=SECRET_KEY)
+
+# Importaciones/exportaciones en segundo plano (worker: manage.py run_jobs)
+VAUL_JOBS_ROOT = config('VAUL_JOBS_ROOT', default=str(BASE_DIR / 'jobs'))
+VAUL_JOBS_RETENTION_HOURS = config('VAUL_JOBS_RETENTION_HOURS', default=24, cast=int)
+# Una tarea en curso sin progreso durante este tiempo se da por abandonada y la retoma otro worker
+VAUL_JOBS_LEASE_SECONDS = config('VAUL_JOBS_LEASE_SECONDS', default=600, cast=int)
+VAUL_JOBS_MAX_ATTEMPTS = config('VAUL_JOBS_MAX_ATTEMPTS', default=3, cast=int)
+# Las subidas mayores que esto (bytes) se importan en segundo plano
+VAUL_IMPORT_ASYNC_THRESHOLD = config('VAUL_IMPORT_ASYNC_THRESHOLD', default=1024 * 1024, cast=int)
+
+# Auditoría de revelados: 'buffered' escribe en segundo plano por lotes;
+# 'sync' garantiza que el registro existe antes de devolver la contraseña
+VAUL_AUDIT_MODE = config('VAUL_AUDIT_MODE', default='buffered')
+VAUL_AUDIT_FLUSH_SIZE = config('VAUL_AUDIT_FLUSH_SIZE', default=100, cast=int)
+VAUL_AUDIT_FLUSH_INTERVAL = config('VAUL_AUDIT_FLUSH_INTERVAL', default=1.0, cast=float)
+VAUL_AUDIT_MAX_QUEUE = config('VAUL_AUDIT_MAX_QUEUE', default=10000, cast=int)
+# Máximo de entradas por petición al revelado por lotes
+VAUL_REVEAL_BATCH_MAX = config('VAUL_REVEAL_BATCH_MAX', default=50, cast=int)
+
+# Búsqueda del dashboard: 'auto' usa tsvector + trigramas en PostgreSQL y la tabla de tokens en el resto
+VAUL_SEARCH_BACKEND = config('VAUL_SEARCH_BACKEND', default='auto')
+
+# Segundos que se guarda el panel de estadísticas del dashboard (se invalida al escribir entradas)
+VAUL_DASHBOARD_CACHE_SECONDS = config('VAUL_DASHBOARD_CACHE_SECONDS', default=300, cast=int)
+
+# Métricas por petición (SQL, cifrado, plantillas). Server-Timing: 'all', 'staff' u 'off'
+PERF_METRICS_ENABLED = config('PERF_METRICS_ENABLED', default=True, cast=bool)
+PERF_METRICS_WINDOW = config('PERF_METRICS_WINDOW', default=500, cast=int)
+PERF_SERVER_TIMING = config('PERF_SERVER_TIMING', default='staff')
+
+# Límite de intentos de login, registro y formulario de contacto ('intentos/segundos'), con bloqueo exponencial.
+# Los contadores viven en CACHES[THROTTLE_CACHE]: memoria local por defecto (por proceso);
+# con varios procesos o servidores, un backend compartido (p. ej. RedisCache)
+THROTTLE_ENABLED = config('THROTTLE_ENABLED', default=True, cast=bool)
+THROTTLE_CACHE = 'throttle'
+# Proxies inversos (IPs o redes) de los que se acepta X-Forwarded-For, p. ej. 127.0.0.1 con Nginx
+# delante de Gunicorn. Sin ellos todos los clientes compartirían la IP del proxy
+THROTTLE_TRUSTED_PROXIES = config('THROTTLE_TRUSTED_PROXIES', default='', cast=Csv())
+THROTTLE_LOGIN_IP_RATE = config('THROTTLE_LOGIN_IP_RATE', default='30/300')
+THROTTLE_LOGIN_USER_RATE = config('THROTTLE_LOGIN_USER_RATE', default='10/900')
+THROTTLE_REGISTER_IP_RATE = config('THROTTLE_REGISTER_IP_RATE', default='10/3600')
+THROTTLE_CONTACT_IP_RATE = config('THROTTLE_CONTACT_IP_RATE', default='5/600')
+THROTTLE_BACKOFF_BASE = config('THROTTLE_BACKOFF_BASE', default=30, cast=int)
+THROTTLE_BACKOFF_MAX = config('THROTTLE_BACKOFF_MAX', default=3600, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    THROTTLE_CACHE: {
+        'BACKEND': config('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default='vaul-throttle'),
+    },
+}
+
+# Perfilado (admin > Slow requests). Con ambos a 0 el middleware no se carga
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_SLOW_MS = config('PROFILING_SLOW_MS', default=0, cast=int)
+PROFILING_STACK_INTERVAL_MS = config('PROFILING_STACK_INTERVAL_MS', default=10, cast=int)
+PROFILING_MAX_SQL = config('PROFILING_MAX_SQL', default=500, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Una línea JSON por petición
+        'password_manager.performance': {
+            'handlers': ['console'],
+            'level': config('PERF_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
 
 
 
@@ -126,7 +262,35 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
-STATICFILES_DIRS = [BASE_DIR / 'static']    
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+# collectstatic con nombres con hash y variantes .gz/.br (.br requiere el paquete brotli).
+# Activado por defecto fuera de DEBUG: exige haber ejecutado collectstatic
+STATIC_MANIFEST = config('STATIC_MANIFEST', default=not DEBUG, cast=bool)
+# Servir STATIC_ROOT desde Django (StaticFilesMiddleware) si no hay un Nginx delante
+STATIC_SERVE = config('STATIC_SERVE', default=not DEBUG, cast=bool)
+# Caché de los ficheros sin hash en el nombre; los que lo llevan son inmutables
+STATIC_MAX_AGE = config('STATIC_MAX_AGE', default=60, cast=int)
+
+# Compresión gzip/brotli de las respuestas dinámicas (password_manager.compression)
+COMPRESSION_ENABLED = config('COMPRESSION_ENABLED', default=True, cast=bool)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+# En streaming, cada cuántos bytes de entrada se envía lo comprimido hasta el momento
+COMPRESSION_FLUSH_BYTES = config('COMPRESSION_FLUSH_BYTES', default=64 * 1024, cast=int)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'password_manager.staticfiles.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
 
 
 # Default primary key field type
@@ -146,6 +310,20 @@ else:
     EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
     DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
 
+# Filtros anti-spam del formulario de contacto (contacto.spam): tiempo mínimo de relleno,
+# validez del formulario mostrado y ventana en la que se descartan mensajes repetidos
+CONTACT_MIN_FILL_SECONDS = config('CONTACT_MIN_FILL_SECONDS', default=3, cast=int)
+CONTACT_FORM_MAX_AGE = config('CONTACT_FORM_MAX_AGE', default=86400, cast=int)
+CONTACT_DEDUP_SECONDS = config('CONTACT_DEDUP_SECONDS', default=3600, cast=int)
+
+# Cola de correo del formulario de contacto (worker: manage.py send_outbox)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_RETRY_BASE_SECONDS = config('OUTBOX_RETRY_BASE_SECONDS', default=60, cast=int)
+OUTBOX_RETRY_MAX_SECONDS = config('OUTBOX_RETRY_MAX_SECONDS', default=3600, cast=int)
+# Lo que un despachador tiene reservado un lote antes de que otro pueda retomarlo
+OUTBOX_LEASE_SECONDS = config('OUTBOX_LEASE_SECONDS', default=300, cast=int)
+OUTBOX_RETENTION_DAYS = config('OUTBOX_RETENTION_DAYS', default=7, cast=int)
+
 # Autenticación
 # Asegura que @login_required redirija a nuestra vista de login personalizada
 LOGIN_URL = 'login'
@@ -0,0 +1,172 @@
+"""Estáticos con hash en el nombre, precomprimidos y servidos con caché inmutable.
+
+`collectstatic` (con CompressedManifestStaticFilesStorage) copia cada fichero a STATIC_ROOT
+con el hash de su contenido en el nombre, reescribe las referencias de CSS y JS y deja al
+lado las variantes `.gz` y, si está instalado el paquete `brotli`, `.br`. `{% static %}`
+devuelve ya el nombre con hash.
+
+StaticFilesMiddleware sirve STATIC_ROOT sin pasar por las vistas: elige la variante según
+Accept-Encoding y marca los nombres con hash como inmutables durante un año.
+"""
+import gzip
+import json
+import mimetypes
+import os
+from urllib.parse import unquote
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin él solo se genera gzip
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+# Por debajo de esto la cabecera Content-Encoding y el Vary cuestan más de lo que se ahorra
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que además escribe las variantes .gz y .br."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in {*paths, *self.hashed_files.values()}:
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                self._compress(name)
+
+    def _compress(self, name: str) -> None:
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data, quality=11)))
+        for suffix, compressed in variants:
+            # Solo si compensa: algunos ficheros pequeños o ya comprimidos crecen
+            if len(compressed) < len(data) * 0.95:
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
+
+
+def accepted_encodings(header: str) -> set:
+    """Codificaciones con q > 0 de una cabecera Accept-Encoding."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class _StaticFile:
+    def __init__(self, path: str, immutable: bool):
+        self.path = path
+        self.immutable = immutable
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = {
+            encoding: path + suffix for encoding, suffix in ENCODINGS if os.path.exists(path + suffix)
+        }
+
+
+class StaticFilesMiddleware:
+    """Sirve STATIC_URL desde STATIC_ROOT con la mejor variante comprimida aceptada.
+
+    El índice de ficheros se construye al arrancar: hay que reiniciar tras `collectstatic`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'STATIC_SERVE', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.strip('/') + '/'
+        self.max_age = getattr(settings, 'STATIC_MAX_AGE', 60)
+        self.files = self._scan(str(settings.STATIC_ROOT))
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _scan(self, root: str) -> dict:
+        immutable = set()
+        manifest = os.path.join(root, ManifestStaticFilesStorage.manifest_name)
+        if os.path.exists(manifest):
+            with open(manifest, encoding='utf-8') as handle:
+                immutable = set(json.load(handle).get('paths', {}).values())
+        files = {}
+        for directory, _, names in os.walk(root):
+            for filename in names:
+                if filename.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                files[name] = _StaticFile(path, name in immutable)
+        return files
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path_info.startswith(self.prefix):
+            response = self._serve(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path_info.startswith(self.prefix):
+            response = self._serve(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def _serve(self, request):
+        static_file = self.files.get(unquote(request.path_info[len(self.prefix):]))
+        if static_file is None:
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding, path = next(
+            ((encoding, variant) for encoding, variant in static_file.variants.items() if encoding in accepted),
+            (None, static_file.path),
+        )
+        stat = os.stat(path)
+        if not static_file.immutable and not was_modified_since(
+            request.headers.get('If-Modified-Since'), stat.st_mtime
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            # FileResponse la pone con el nombre de la variante (.br, .gz); aquí sobra
+            response.headers.pop('Content-Disposition', None)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if static_file.immutable else f'public, max-age={self.max_age}'
+        )
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
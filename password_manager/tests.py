@@ -0,0 +1,103 @@
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+
+from . import profiling
+from .instrumentation import PerformanceMiddleware
+from .profiling import ProfilingMiddleware
+
+
+@override_settings(PERF_METRICS_ENABLED=True, PERF_SERVER_TIMING='staff')
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def _stack(self, view):
+        return PerformanceMiddleware(SessionMiddleware(AuthenticationMiddleware(view)))
+
+    def _request(self, factory):
+        factory.cookies[settings.SESSION_COOKIE_NAME] = self.session
+        return factory.get('/')
+
+    def test_header_does_not_load_the_user(self):
+        # Ni la sesión ni auth_user: la vista no los usa y la medición no debe añadirlos
+        with self.assertNumQueries(0):
+            response = self._stack(lambda request: HttpResponse())(self._request(RequestFactory()))
+        self.assertNotIn('Server-Timing', response)
+
+        async def view(request):
+            return HttpResponse()
+
+        with self.assertNumQueries(0):
+            response = async_to_sync(self._stack(view))(self._request(AsyncRequestFactory()))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_header_uses_the_user_the_view_loaded(self):
+        def view(request):
+            request.user.is_authenticated
+            return HttpResponse()
+
+        with self.assertNumQueries(2):
+            response = self._stack(view)(self._request(RequestFactory()))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+
+        async def aview(request):
+            request.user = await request.auser()
+            return HttpResponse()
+
+        response = async_to_sync(self._stack(aview))(self._request(AsyncRequestFactory()))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_SLOW_MS=0)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.saved = []
+        self.enterContext(mock.patch.object(ProfilingMiddleware, '_save', lambda _, record: self.saved.append(record)))
+
+    def _request(self, path='/'):
+        return RequestFactory().get(path)
+
+    def test_overlapping_sampled_requests_do_not_share_cprofile(self):
+        entered, release = threading.Event(), threading.Event()
+
+        def slow_view(request):
+            entered.set()
+            release.wait(5)
+            return HttpResponse('lenta')
+
+        responses = []
+        slow = ProfilingMiddleware(slow_view)
+        worker = threading.Thread(target=lambda: responses.append(slow(self._request('/lenta/'))))
+        worker.start()
+        self.assertTrue(entered.wait(5))
+        try:
+            # La primera sigue perfilándose: la segunda no puede activar otro cProfile
+            response = ProfilingMiddleware(lambda request: HttpResponse('rápida'))(self._request('/rapida/'))
+        finally:
+            release.set()
+            worker.join(5)
+
+        self.assertEqual([response.status_code, responses[0].status_code], [200, 200])
+        formats = {record.path: record.profile_format for record in self.saved}
+        self.assertEqual(formats, {'/lenta/': 'cprofile', '/rapida/': 'stacks'})
+        # Al terminar se libera para la siguiente
+        ProfilingMiddleware(lambda request: HttpResponse())(self._request('/otra/'))
+        self.assertEqual(self.saved[-1].profile_format, 'cprofile')
+
+    def test_profiler_in_use_elsewhere_does_not_fail_the_request(self):
+        error = ValueError('Another profiling tool is already active')
+        with mock.patch.object(profiling.cProfile.Profile, 'enable', side_effect=error), \
+                self.assertLogs('password_manager.profiling', 'WARNING'):
+            response = ProfilingMiddleware(lambda request: HttpResponse('ok'))(self._request())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.saved[-1].profile_format, 'stacks')
+        self.assertFalse(profiling._cprofile_lock.locked())
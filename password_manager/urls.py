@@ -18,8 +18,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls import handler400, handler403, handler404, handler500
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('performance/', views.performance_stats, name='performance_stats'),
     path('', include('vaul.urls')),
     path('contacto/', include('contacto.urls')),
 ]
@@ -1,5 +1,12 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render
 
+from contacto.spam import rejection_counts
+
+from .instrumentation import connection_stats, pool_stats, view_timings
+
 def bad_request(request, exception=None):
     return render(request, '400.html', status=400)
 
@@ -12,4 +19,16 @@ def page_not_found(request, exception=None):
 def server_error(request):
     return render(request, '500.html', status=500)
 
-
+@login_required
+def performance_stats(request):
+    """Percentiles por vista de las últimas peticiones de este proceso y estado de las
+    conexiones a la base de datos y envíos rechazados del formulario de contacto (solo staff)"""
+    if not request.user.is_staff:
+        return HttpResponseForbidden('No autorizado')
+    return JsonResponse({
+        'window': settings.PERF_METRICS_WINDOW,
+        'views': view_timings.summary(),
+        'db_connections': connection_stats.summary(),
+        'db_pools': pool_stats(),
+        'contact_rejections': rejection_counts(),
+    })
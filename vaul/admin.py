@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import PasswordEntry
+from django.db import transaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import EntryTombstone, PasswordEntry, SlowRequest
+from .search import index_entries
+from .stats import apply_delta, reserve_change_seq
 
 # Register your models here.
 
@@ -13,4 +21,94 @@ class PasswordEntryAdmin(admin.ModelAdmin):
     # Enlaces solo en 'site_name' para evitar conflicto con list_editable
     list_display_links = ('site_name',)
     # Editables en lista (no pueden estar en list_display_links)
-    list_editable = ('site_url', 'username')
\ No newline at end of file
+    list_editable = ('site_url', 'username')
+
+    def get_readonly_fields(self, request, obj=None):
+        # Cambiar el dueño exigiría una marca de borrado y mover los contadores del anterior
+        if obj is not None:
+            return ('user',)
+        return ()
+
+    # Las escrituras desde el admin siguen el mismo camino que las vistas: secuencia de
+    # cambios (API de sincronización), contadores e índice de búsqueda.
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            previous_category = (
+                PasswordEntry.objects.filter(pk=obj.pk).values_list('category', flat=True).first() if change else None
+            )
+            obj.change_seq = reserve_change_seq(obj.user)
+            super().save_model(request, obj, form, change)
+            if previous_category != obj.category:
+                deltas = {obj.category: 1}
+                if previous_category:
+                    deltas[previous_category] = -1
+                apply_delta(obj.user, deltas)
+            index_entries([obj])
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, PasswordEntry.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for entry in queryset.select_related('user'):
+                EntryTombstone.objects.create(
+                    user=entry.user, entry_id=entry.id, change_seq=reserve_change_seq(entry.user),
+                )
+                entry.delete()
+                apply_delta(entry.user, {entry.category: -1})
+
+
+@admin.register(SlowRequest)
+class SlowRequestAdmin(admin.ModelAdmin):
+    """Perfiles de peticiones lentas o muestreadas: solo lectura, con descarga del perfil."""
+    list_display = ('created_at', 'reason', 'method', 'path', 'duration_ms', 'sql_count', 'user', 'download_link')
+    list_filter = ('reason', 'profile_format', 'view_name')
+    search_fields = ('path', 'view_name')
+    ordering = ('-created_at',)
+    list_per_page = 50
+    fields = (
+        'created_at', 'reason', 'method', 'path', 'view_name', 'status_code', 'user',
+        'duration_ms', 'sql_count', 'sql_ms', 'download_link', 'summary_block', 'sql_block',
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='vaul_slowrequest_download',
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        record = get_object_or_404(SlowRequest, pk=pk)
+        if record.profile_format == 'cprofile':
+            # Se abre con pstats, snakeviz, etc.
+            response = HttpResponse(bytes(record.profile_data), content_type='application/octet-stream')
+            response['Content-Disposition'] = f'attachment; filename="request-{record.pk}.prof"'
+        else:
+            # Formato "folded" de flamegraph.pl / speedscope
+            response = HttpResponse(bytes(record.profile_data), content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="request-{record.pk}.folded"'
+        return response
+
+    @admin.display(description='Perfil')
+    def download_link(self, obj):
+        return format_html('<a href="{}">Descargar</a>', reverse('admin:vaul_slowrequest_download', args=[obj.pk]))
+
+    @admin.display(description='Resumen del perfil')
+    def summary_block(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.profile_summary)
+
+    @admin.display(description='SQL')
+    def sql_block(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.sql)
@@ -0,0 +1,86 @@
+"""API JSON versionada para scripts y la extensión del navegador."""
+from functools import wraps
+
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+
+from .models import EntryTombstone, PasswordEntry, VaultStats
+from .replicas import read_from_replica
+
+SYNC_PAGE_SIZE = 500
+# Solo metadatos: ni la contraseña en claro ni el texto cifrado salen por la API
+SYNC_FIELDS = (
+    'id', 'site_name', 'site_url', 'username', 'category', 'notes',
+    'strength', 'created_at', 'updated_at', 'change_seq',
+)
+
+
+def api_login_required(view):
+    """Como login_required, pero responde 401 en JSON en lugar de redirigir al login."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'No autenticado'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _with_cache_headers(response, etag: str):
+    response['ETag'] = etag
+    # Cada usuario tiene su propia respuesta: ningún proxy debe compartirla
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _sync_page(user, since: int, current: int) -> dict:
+    """Cambios en (since, current], como mucho SYNC_PAGE_SIZE de cada tipo.
+
+    Si alguna lista se trunca, ambas se cortan en el menor número de secuencia
+    alcanzado para que el token devuelto no salte cambios.
+    """
+    changed = list(
+        PasswordEntry.objects.filter(user=user, change_seq__gt=since, change_seq__lte=current)
+        .order_by('change_seq').values(*SYNC_FIELDS)[:SYNC_PAGE_SIZE + 1]
+    )
+    deleted = list(
+        EntryTombstone.objects.filter(user=user, change_seq__gt=since, change_seq__lte=current)
+        .order_by('change_seq').values('entry_id', 'change_seq')[:SYNC_PAGE_SIZE + 1]
+    )
+    cuts = [rows[SYNC_PAGE_SIZE - 1]['change_seq'] for rows in (changed, deleted) if len(rows) > SYNC_PAGE_SIZE]
+    token = min(cuts) if cuts else current
+    return {
+        'changed': [row for row in changed if row['change_seq'] <= token],
+        'deleted': [row['entry_id'] for row in deleted if row['change_seq'] <= token],
+        'token': str(token),
+        'has_more': bool(cuts),
+    }
+
+
+@require_GET
+@api_login_required
+@read_from_replica
+def sync(request):
+    """Entradas cambiadas y eliminadas desde el token `since` (vacío o 0 = todo).
+
+    El ETag depende solo del token recibido y de la secuencia actual del usuario, así
+    que un sondeo sin cambios cuesta una consulta por clave primaria y un 304.
+    """
+    try:
+        since = int(request.GET.get('since') or 0)
+    except ValueError:
+        since = -1
+    if since < 0:
+        return JsonResponse({'error': 'Token de sincronización no válido'}, status=400)
+
+    current = VaultStats.objects.filter(user=request.user).values_list('last_change_seq', flat=True).first() or 0
+    etag = f'"sync-{since}-{current}"'
+    # Comparación débil: CompressionMiddleware marca como W/ el ETag de las respuestas comprimidas
+    if etag in [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]:
+        return _with_cache_headers(HttpResponseNotModified(), etag)
+
+    if since >= current:
+        payload = {'changed': [], 'deleted': [], 'token': str(current), 'has_more': False}
+    else:
+        payload = _sync_page(request.user, since, current)
+    return _with_cache_headers(JsonResponse(payload), etag)
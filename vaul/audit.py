@@ -0,0 +1,225 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, connection
+
+from .models import RevealLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """Escribe los RevealLog en segundo plano, agrupados con bulk_create.
+
+    Los eventos se acumulan en memoria y se vuelcan al llegar a `flush_size`
+    o cada `flush_interval` segundos, y también al terminar el proceso. Si la
+    cola está llena el evento se escribe en el acto: nunca se descarta. Si la base de
+    datos no está disponible el lote vuelve a la cola y se reintenta en el siguiente
+    volcado; solo se pierde lo que ya no cabe en ella (contador `failed`).
+    """
+
+    def __init__(self, flush_size: int = 100, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        # Contadores
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.requeued = 0
+        self.sync_fallbacks = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def _ensure_thread(self) -> None:
+        # Tras un fork (p. ej. gunicorn --preload) el hilo no existe en el proceso hijo
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='vaul-audit-writer', daemon=True)
+            self._thread.start()
+
+    def record(self, log: RevealLog) -> None:
+        if len(self._queue) >= self.max_queue:
+            self.sync_fallbacks += 1
+            log.save()
+            return
+        self._enqueue(log)
+
+    async def arecord(self, log: RevealLog) -> None:
+        """Como record, desde una vista async: solo toca la base de datos si la cola está llena."""
+        if len(self._queue) >= self.max_queue:
+            self.sync_fallbacks += 1
+            await log.asave()
+            return
+        self._enqueue(log)
+
+    def _enqueue(self, log: RevealLog) -> None:
+        self._ensure_thread()
+        self._queue.append(log)
+        self.enqueued += 1
+        if len(self._queue) >= self.flush_size:
+            self._wakeup.set()
+
+    def record_many(self, logs: list) -> None:
+        if len(self._queue) + len(logs) > self.max_queue:
+            self.sync_fallbacks += len(logs)
+            RevealLog.objects.bulk_create(logs)
+            return
+        self._ensure_thread()
+        self._queue.extend(logs)
+        self.enqueued += len(logs)
+        if len(self._queue) >= self.flush_size:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        try:
+            while not self._stopped:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                # Las señales de petición no llegan a este hilo: la conexión caída o
+                # caducada (CONN_MAX_AGE) se descarta aquí y el volcado abre otra
+                close_old_connections()
+                self.flush()
+        finally:
+            connection.close()
+
+    def flush(self) -> int:
+        """Vuelca un lote. Devuelve cuántos registros se resolvieron (0 si la base no responde)."""
+        batch = []
+        while self._queue and len(batch) < self.max_queue:
+            batch.append(self._queue.popleft())
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        done = len(batch)
+        try:
+            RevealLog.objects.bulk_create(batch, batch_size=self.flush_size)
+            self.written += len(batch)
+        except (OperationalError, InterfaceError):
+            # Base de datos caída o conexión rota: nada de este lote es culpa de sus registros
+            logger.exception('Base de datos no disponible; %d registros de auditoría vuelven a la cola', len(batch))
+            self._requeue(batch)
+            done = 0
+        except Exception:
+            # Un registro problemático (p. ej. entrada ya eliminada) no debe perder el resto
+            logger.exception('Fallo al volcar %d registros de auditoría; reintentando uno a uno', len(batch))
+            for i, log in enumerate(batch):
+                try:
+                    log.save()
+                    self.written += 1
+                except (OperationalError, InterfaceError):
+                    logger.exception('Base de datos no disponible; %d registros de auditoría vuelven a la cola', len(batch) - i)
+                    self._requeue(batch[i:])
+                    done = i
+                    break
+                except Exception:
+                    self.failed += 1
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+        return done
+
+    def _requeue(self, logs: list) -> None:
+        """Devuelve los registros al principio de la cola, sin pasar de max_queue."""
+        with self._lock:
+            room = max(0, self.max_queue - len(self._queue))
+            kept, lost = logs[:room], logs[room:]
+            self._queue.extendleft(reversed(kept))
+        self.requeued += len(kept)
+        if lost:
+            self.failed += len(lost)
+            logger.error('Cola de auditoría llena: se pierden %d registros', len(lost))
+
+    def stop(self) -> None:
+        """Detiene el hilo y vuelca lo pendiente."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+        # Si la base no responde no se insiste: lo pendiente queda en `queue_depth`
+        while self._queue and self.flush():
+            pass
+        if self._queue:
+            logger.error('%d registros de auditoría sin escribir al detener el proceso', len(self._queue))
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': len(self._queue),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'failed': self.failed,
+            'requeued': self.requeued,
+            'sync_fallbacks': self.sync_fallbacks,
+            'flushes': self.flushes,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+            'avg_flush_ms': round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+        }
+
+
+_writer: Optional[AuditWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter(
+                    flush_size=getattr(settings, 'VAUL_AUDIT_FLUSH_SIZE', 100),
+                    flush_interval=getattr(settings, 'VAUL_AUDIT_FLUSH_INTERVAL', 1.0),
+                    max_queue=getattr(settings, 'VAUL_AUDIT_MAX_QUEUE', 10000),
+                )
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def record_reveal(user, entry, ip_address, user_agent) -> None:
+    """Registra un revelado. En modo 'sync' se escribe antes de devolver la contraseña."""
+    log = RevealLog(user=user, entry=entry, ip_address=ip_address, user_agent=user_agent)
+    if getattr(settings, 'VAUL_AUDIT_MODE', 'sync') == 'sync':
+        log.save()
+    else:
+        get_audit_writer().record(log)
+
+
+async def arecord_reveal(user, entry, ip_address, user_agent) -> None:
+    """Versión asíncrona de record_reveal."""
+    log = RevealLog(user=user, entry=entry, ip_address=ip_address, user_agent=user_agent)
+    if getattr(settings, 'VAUL_AUDIT_MODE', 'sync') == 'sync':
+        await log.asave()
+    else:
+        await get_audit_writer().arecord(log)
+
+
+def record_reveals(user, entries, ip_address, user_agent) -> None:
+    """Como record_reveal para varias entradas: en modo 'sync' un único bulk_create."""
+    logs = [RevealLog(user=user, entry=entry, ip_address=ip_address, user_agent=user_agent) for entry in entries]
+    if not logs:
+        return
+    if getattr(settings, 'VAUL_AUDIT_MODE', 'sync') == 'sync':
+        RevealLog.objects.bulk_create(logs)
+    else:
+        get_audit_writer().record_many(logs)
@@ -0,0 +1,62 @@
+import json
+from itertools import islice
+from typing import Iterator
+
+from django.utils import timezone
+
+from .models import PasswordEntry
+from .utils import get_engine
+
+EXPORT_FIELDS = ('site_name', 'site_url', 'username', 'encrypted_password', 'category', 'notes', 'created_at')
+
+
+def _iter_decrypted(user, chunk_size: int, progress=None) -> Iterator[dict]:
+    """Recorre las entradas del usuario descifrando por lotes, sin cargar todo en memoria."""
+    entries = (
+        PasswordEntry.objects.filter(user=user)
+        .order_by('-created_at')
+        .only(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    engine = get_engine()
+    done = 0
+    while True:
+        chunk = list(islice(entries, chunk_size))
+        if not chunk:
+            break
+        results = engine.decrypt_many(entry.encrypted_password for entry in chunk)
+        for entry, result in zip(chunk, results):
+            if not result.ok:
+                continue  # Omitir entradas que no se pueden descifrar
+            yield {
+                'site_name': entry.site_name,
+                'site_url': entry.site_url,
+                'username': entry.username,
+                'password': result.value,
+                'category': entry.category,
+                'notes': entry.notes or '',
+                'created_at': entry.created_at.isoformat(),
+            }
+        done += len(chunk)
+        if progress:
+            progress(done)
+
+
+def iter_export(user, fmt: str = 'json', chunk_size: int = 500, progress=None) -> Iterator[str]:
+    """Genera la exportación por fragmentos de texto.
+
+    `json` mantiene el formato que acepta la importación; `ndjson` emite una entrada por línea.
+    `progress(n)` recibe el número de entradas recorridas tras cada lote.
+    """
+    if fmt == 'ndjson':
+        for item in _iter_decrypted(user, chunk_size, progress):
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+        return
+
+    # total_entries va al final para no necesitar un COUNT previo
+    yield '{\n  "export_date": %s,\n  "entries": [' % json.dumps(timezone.now().isoformat())
+    total = 0
+    for item in _iter_decrypted(user, chunk_size, progress):
+        yield (',\n    ' if total else '\n    ') + json.dumps(item, ensure_ascii=False)
+        total += 1
+    yield '\n  ],\n  "total_entries": %d\n}\n' % total
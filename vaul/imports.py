@@ -0,0 +1,256 @@
+import codecs
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator
+
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from .models import PasswordEntry
+from .search import index_user_entries_after, last_entry_id
+from .stats import apply_delta, release_change_seq, reserve_change_seq
+from .utils import get_engine, password_fingerprint, password_strength
+
+_decoder = json.JSONDecoder()
+_CATEGORIES = {key for key, _ in PasswordEntry.CATEGORY_CHOICES}
+
+
+class ImportFormatError(ValueError):
+    """El archivo es JSON válido pero no tiene el formato de exportación."""
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    by_category: Counter = field(default_factory=Counter)
+
+
+class _TextStream:
+    """Búfer de texto sobre los fragmentos del archivo subido."""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Siguiente carácter no blanco ('' al final del archivo)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Se esperaba {char!r}', self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decodifica el siguiente valor JSON completo, leyendo más si hace falta."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Un número al final del búfer podría estar cortado
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _iter_json_entries(stream: _TextStream) -> Iterator:
+    """Recorre el arreglo `entries` de la exportación sin cargar el documento entero."""
+    stream.expect('{')
+    found = False
+    if stream.peek() == '}':
+        raise ImportFormatError('Formato de archivo inválido.')
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'entries' and stream.peek() == '[':
+            found = True
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.pos += 1
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.peek() == ',':
+                        stream.pos += 1
+                        continue
+                    stream.expect(']')
+                    break
+        else:
+            stream.value()
+        if stream.peek() == ',':
+            stream.pos += 1
+            continue
+        stream.expect('}')
+        break
+    if not found:
+        raise ImportFormatError('Formato de archivo inválido.')
+
+
+def _iter_ndjson_entries(stream: _TextStream) -> Iterator:
+    while stream.peek():
+        yield stream.value()
+
+
+def is_ndjson(filename: str) -> bool:
+    return (filename or '').lower().endswith('.ndjson')
+
+
+def iter_entries(chunks: Iterable[bytes], ndjson: bool = False) -> Iterator:
+    """Entradas del archivo, en JSON de exportación o NDJSON (una por línea)."""
+    stream = _TextStream(codecs.iterdecode(chunks, 'utf-8-sig'))
+    if ndjson:
+        return _iter_ndjson_entries(stream)
+    return _iter_json_entries(stream)
+
+
+def _clean(entry_data):
+    """Normaliza una entrada; devuelve None si no es importable."""
+    if not isinstance(entry_data, dict):
+        return None
+    values = {}
+    for name in ('site_name', 'site_url', 'username', 'password', 'category', 'notes'):
+        value = entry_data.get(name) or ''
+        if not isinstance(value, str):
+            return None
+        values[name] = value if name == 'password' else value.strip()
+    if not values['site_name'] or not values['site_url'] or not values['username'] or not values['password']:
+        return None
+    if len(values['site_name']) > 100 or len(values['username']) > 100 or len(values['site_url']) > 2048:
+        return None
+    if values['category'] not in _CATEGORIES:
+        values['category'] = 'other'
+    values['notes'] = values['notes'][:500] or None
+    return values
+
+
+def _insert_batch(user, batch: list, existing: set, engine, report: ImportReport) -> Counter:
+    """Valida, deduplica, cifra e inserta un lote; devuelve las altas por categoría."""
+    rows = []
+    for entry_data in batch:
+        values = _clean(entry_data)
+        if values is None:
+            report.invalid += 1
+            continue
+        key = (values['site_name'], values['site_url'], values['username'])
+        if key in existing:
+            report.skipped += 1
+            continue
+        existing.add(key)
+        rows.append(values)
+
+    results = engine.encrypt_many(values['password'] for values in rows)
+    objs = []
+    for values, result in zip(rows, results):
+        if not result.ok:
+            report.invalid += 1
+            continue
+        objs.append(PasswordEntry(
+            user=user,
+            site_name=values['site_name'],
+            site_url=values['site_url'],
+            username=values['username'],
+            encrypted_password=result.value,
+            password_fingerprint=password_fingerprint(values['password']),
+            strength=password_strength(values['password']),
+            category=values['category'],
+            notes=values['notes'],
+        ))
+    if not objs:
+        return Counter()
+
+    first_seq = reserve_change_seq(user, len(objs))
+    for offset, obj in enumerate(objs):
+        obj.change_seq = first_seq + offset
+    last_id = last_entry_id(user)
+    # La restricción única cubre las escrituras concurrentes que el set en memoria no ve
+    # (otra importación, un alta desde el dashboard): esas filas se descartan sin error
+    PasswordEntry.objects.bulk_create(objs, batch_size=len(objs), ignore_conflicts=True)
+    # Los números reservados identifican las filas que sí se insertaron
+    inserted = list(
+        PasswordEntry.objects.filter(user=user, change_seq__range=(first_seq, first_seq + len(objs) - 1))
+        .order_by('change_seq')
+        .values_list('id', 'change_seq', 'category')
+    )
+    if len(inserted) < len(objs):
+        # Se renumeran sin huecos y se devuelven los números sobrantes
+        PasswordEntry.objects.filter(id__in=[entry_id for entry_id, _, _ in inserted]).update(change_seq=Case(
+            *[When(id=entry_id, then=Value(first_seq + n)) for n, (entry_id, _, _) in enumerate(inserted)]
+        ))
+        release_change_seq(user, first_seq + len(inserted) - 1)
+    index_user_entries_after(user, last_id)
+
+    by_category = Counter(category for _, _, category in inserted)
+    report.imported += len(inserted)
+    report.skipped += len(objs) - len(inserted)
+    report.by_category.update(by_category)
+    return by_category
+
+
+def import_entries(user, chunks: Iterable[bytes], ndjson: bool = False, batch_size: int = 500,
+                   single_transaction: bool = True, progress=None) -> ImportReport:
+    """Importa el archivo con inserciones por lotes.
+
+    Los duplicados (mismo sitio, URL y usuario) se detectan en memoria contra las
+    claves existentes, cargadas una sola vez. Con `single_transaction` todo el archivo
+    se importa o nada; si no, cada lote se confirma por separado (las tareas en segundo
+    plano lo usan para publicar el progreso y, si el worker se cae, la tarea se retoma
+    desde el principio del archivo y omite lo ya importado).
+    `progress(report)` se llama después de cada lote.
+    """
+    report = ImportReport()
+    existing = set(
+        PasswordEntry.objects.filter(user=user).order_by().values_list('site_name', 'site_url', 'username')
+    )
+    engine = get_engine()
+    entries = iter_entries(chunks, ndjson)
+
+    def batches():
+        while True:
+            batch = list(islice(entries, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    if single_transaction:
+        with transaction.atomic():
+            for batch in batches():
+                _insert_batch(user, batch, existing, engine, report)
+                if progress:
+                    progress(report)
+            apply_delta(user, report.by_category)
+    else:
+        for batch in batches():
+            with transaction.atomic():
+                apply_delta(user, _insert_batch(user, batch, existing, engine, report))
+            if progress:
+                progress(report)
+
+    return report
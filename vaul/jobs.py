@@ -0,0 +1,183 @@
+import os
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .exports import iter_export
+from .imports import ImportFormatError, import_entries, is_ndjson
+from .models import ImportExportJob, PasswordEntry
+from .utils import get_engine
+
+# Tamaño aproximado de cada bloque cifrado en los archivos de las tareas
+BLOCK_SIZE = 64 * 1024
+
+
+def _jobs_root() -> Path:
+    root = Path(getattr(settings, 'VAUL_JOBS_ROOT', settings.BASE_DIR / 'jobs'))
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def write_encrypted(path: Path, chunks: Iterable[bytes]) -> None:
+    """Guarda los fragmentos cifrados, un token Fernet por línea."""
+    engine = get_engine()
+    buf = bytearray()
+    with open(path, 'wb') as fh:
+        for chunk in chunks:
+            buf += chunk
+            if len(buf) >= BLOCK_SIZE:
+                fh.write(engine.encrypt_bytes(bytes(buf)) + b'\n')
+                buf.clear()
+        if buf:
+            fh.write(engine.encrypt_bytes(bytes(buf)) + b'\n')
+
+
+def read_encrypted(path: Path) -> Iterator[bytes]:
+    engine = get_engine()
+    with open(path, 'rb') as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield engine.decrypt_bytes(line)
+
+
+def _remove_file(job: ImportExportJob) -> None:
+    if job.file_path:
+        Path(job.file_path).unlink(missing_ok=True)
+
+
+def enqueue_import(user, upload) -> ImportExportJob:
+    path = _jobs_root() / f'import-{uuid.uuid4().hex}'
+    write_encrypted(path, upload.chunks())
+    fmt = 'ndjson' if is_ndjson(upload.name) else 'json'
+    return ImportExportJob.objects.create(user=user, kind='import', format=fmt, file_path=str(path))
+
+
+def enqueue_export(user, fmt: str = 'json') -> ImportExportJob:
+    return ImportExportJob.objects.create(user=user, kind='export', format=fmt)
+
+
+def claim_next_job() -> Optional[ImportExportJob]:
+    """Toma la siguiente tarea pendiente, o una en curso cuyo worker dejó de dar señales
+    (p. ej. porque se cayó); varios workers no se pisan entre sí."""
+    now = timezone.now()
+    stale = Q(status='running', heartbeat_at__lt=now - timedelta(seconds=settings.VAUL_JOBS_LEASE_SECONDS))
+    with transaction.atomic():
+        # Una tarea que ha tumbado al worker VAUL_JOBS_MAX_ATTEMPTS veces no se vuelve a intentar
+        ImportExportJob.objects.filter(stale, attempts__gte=settings.VAUL_JOBS_MAX_ATTEMPTS).update(
+            status='failed', error='El worker se detuvo durante la tarea demasiadas veces.', finished_at=now,
+        )
+        candidates = ImportExportJob.objects.filter(Q(status='pending') | stale).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        job = candidates.first()
+        if job is None:
+            return None
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'attempts'])
+    return job
+
+
+def _held(job: ImportExportJob):
+    """La tarea, solo mientras este worker conserva la concesión (nadie la ha retomado)."""
+    return ImportExportJob.objects.filter(pk=job.pk, status='running', attempts=job.attempts)
+
+
+def _save_progress(job: ImportExportJob, **fields) -> None:
+    _held(job).update(heartbeat_at=timezone.now(), **fields)
+
+
+def _run_import(job: ImportExportJob) -> None:
+    def progress(report):
+        _save_progress(
+            job,
+            processed_rows=report.imported + report.skipped + report.invalid,
+            imported=report.imported,
+            skipped=report.skipped,
+            invalid=report.invalid,
+        )
+
+    report = import_entries(
+        job.user,
+        read_encrypted(Path(job.file_path)),
+        ndjson=job.format == 'ndjson',
+        single_transaction=False,
+        progress=progress,
+    )
+    job.processed_rows = job.total_rows = report.imported + report.skipped + report.invalid
+    job.imported = report.imported
+    job.skipped = report.skipped
+    job.invalid = report.invalid
+
+
+def _run_export(job: ImportExportJob) -> None:
+    job.total_rows = PasswordEntry.objects.filter(user=job.user).count()
+    _save_progress(job, total_rows=job.total_rows)
+    # Cada intento escribe su propio archivo y lo publica con un rename atómico: un worker
+    # lento al que le retomaron la tarea no pisa ni borra el del que la tiene ahora
+    path = _jobs_root() / f'export-{job.pk}-{job.attempts}-{uuid.uuid4().hex}'
+    partial = path.with_name(path.name + '.part')
+
+    def progress(done):
+        _save_progress(job, processed_rows=done)
+
+    try:
+        write_encrypted(partial, (piece.encode() for piece in iter_export(job.user, job.format, progress=progress)))
+        os.replace(partial, path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    job.file_path = str(path)
+    job.processed_rows = job.total_rows
+
+
+def run_job(job: ImportExportJob) -> ImportExportJob:
+    # Solo se guarda lo que esta ejecución ha calculado: si una importación falla a medias,
+    # los contadores de los lotes ya confirmados los dejó _save_progress
+    fields = ['status', 'error', 'finished_at']
+    try:
+        if job.kind == 'import':
+            _run_import(job)
+            fields += ['processed_rows', 'total_rows', 'imported', 'skipped', 'invalid']
+        else:
+            _run_export(job)
+            fields += ['file_path', 'processed_rows', 'total_rows']
+        job.status = 'done'
+    except ImportFormatError:
+        job.status = 'failed'
+        job.error = 'Formato de archivo inválido.'
+    except Exception as e:
+        job.status = 'failed'
+        job.error = f'{e.__class__.__name__}: {e}'
+    job.finished_at = timezone.now()
+    # Si otro worker la retomó mientras tanto (attempts cambió), su resultado prevalece
+    held = _held(job).update(**{field: getattr(job, field) for field in fields})
+    if not held:
+        if job.kind == 'export' and job.status == 'done':
+            # Nadie apunta a este archivo
+            Path(job.file_path).unlink(missing_ok=True)
+    elif job.kind == 'import':
+        # El archivo subido contiene contraseñas en claro (cifradas en disco): no se conserva.
+        # Solo lo borra quien tiene la concesión; el worker que la retomó puede estar leyéndolo
+        _remove_file(job)
+    return job
+
+
+def purge_finished_jobs(max_age_hours: int) -> int:
+    """Elimina las tareas terminadas antiguas junto con sus archivos."""
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    old = ImportExportJob.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff)
+    purged = 0
+    for job in old.iterator():
+        _remove_file(job)
+        job.delete()
+        purged += 1
+    return purged
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from vaul.models import PasswordEntry, VaultStats
+from vaul.stats import reserve_change_seq
+from vaul.utils import get_engine, password_fingerprint, password_strength
+
+
+class Command(BaseCommand):
+    help = 'Calcula la huella y la fortaleza de las contraseñas que aún no las tienen.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recalcula todas las entradas, no solo las pendientes.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        engine = get_engine()
+        entries = (
+            PasswordEntry.objects.select_related('user')
+            .only('id', 'encrypted_password', 'strength', 'user')
+            .order_by('id')
+        )
+        if not options['all']:
+            entries = entries.filter(password_fingerprint='')
+
+        updated = 0
+        failed = 0
+        last_id = 0
+        while True:
+            # Paginación por id: cada lote es una transacción corta
+            batch = list(entries.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            pending = []
+            # La fortaleza sale por la API de sincronización: las que cambian necesitan un
+            # número nuevo de la secuencia de cambios de su usuario
+            resynced = {}
+            results = engine.decrypt_many(entry.encrypted_password for entry in batch)
+            for entry, result in zip(batch, results):
+                if not result.ok:
+                    failed += 1
+                    continue
+                strength = password_strength(result.value)
+                if strength != entry.strength:
+                    resynced.setdefault(entry.user_id, []).append(entry)
+                entry.password_fingerprint = password_fingerprint(result.value)
+                entry.strength = strength
+                pending.append(entry)
+            with transaction.atomic():
+                PasswordEntry.objects.bulk_update(pending, ['password_fingerprint', 'strength'])
+                now = timezone.now()
+                for user_entries in resynced.values():
+                    first_seq = reserve_change_seq(user_entries[0].user, len(user_entries))
+                    for offset, entry in enumerate(user_entries):
+                        entry.change_seq = first_seq + offset
+                        entry.updated_at = now
+                    PasswordEntry.objects.bulk_update(user_entries, ['change_seq', 'updated_at'])
+            updated += len(pending)
+
+        if updated:
+            # Cambia la clave del panel de alertas cacheado en el dashboard
+            VaultStats.objects.update(updated_at=timezone.now())
+        self.stdout.write(self.style.SUCCESS(f'{updated} entradas actualizadas, {failed} no se pudieron descifrar.'))
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from password_manager import compression
+from vaul.models import PasswordEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la compresión en streaming (ratio y CPU) de una exportación JSON y de un CSV de '
+        'registros de revelado sintéticos, con los mismos trozos que generan las vistas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=5000, help='Entradas de la exportación')
+        parser.add_argument('--logs', type=int, default=50000, help='Filas del CSV de registros')
+
+    def _export_chunks(self, n: int) -> list:
+        # Mismo troceado que vaul.exports.iter_export: un trozo por entrada
+        categories = [key for key, _ in PasswordEntry.CATEGORY_CHOICES]
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        chunks = ['{\n  "export_date": "2025-01-01T00:00:00+00:00",\n  "entries": [']
+        for i in range(n):
+            item = {
+                'site_name': f'Sitio {i}',
+                'site_url': f'https://sitio{i}.example.com/login',
+                'username': f'usuario{i}@example.com',
+                'password': secrets.token_urlsafe(12),
+                'category': categories[i % len(categories)],
+                'notes': 'Cuenta de trabajo' if i % 4 == 0 else '',
+                'created_at': (created + timedelta(minutes=i)).isoformat(),
+            }
+            chunks.append((',\n    ' if i else '\n    ') + json.dumps(item, ensure_ascii=False))
+        chunks.append('\n  ],\n  "total_entries": %d\n}\n' % n)
+        return [chunk.encode() for chunk in chunks]
+
+    def _csv_chunks(self, n: int) -> list:
+        # Mismo troceado que el CSV de reveal_logs: una fila por trozo
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        revealed = datetime(2025, 1, 1)
+        chunks = []
+        for i in range(n):
+            writer.writerow([
+                f'Sitio {i % 300} (usuario{i % 300})', 'demo',
+                (revealed + timedelta(seconds=37 * i)).strftime('%Y-%m-%d %H:%M:%S'),
+                f'192.168.{i % 7}.{i % 250}',
+                'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0 Safari/537.36',
+            ])
+            chunks.append(buffer.getvalue().encode())
+            buffer.seek(0)
+            buffer.truncate()
+        return chunks
+
+    def _measure(self, chunks: list, factory) -> tuple:
+        started = time.process_time()
+        output = sum(
+            len(part) for part in compression.compress_iterator(chunks, factory(), settings.COMPRESSION_FLUSH_BYTES)
+        )
+        return output, time.process_time() - started
+
+    def handle(self, *args, **options):
+        encoders = [
+            (f'gzip-{settings.COMPRESSION_GZIP_LEVEL}',
+             lambda: compression.GzipCompressor(settings.COMPRESSION_GZIP_LEVEL)),
+            ('gzip-1', lambda: compression.GzipCompressor(1)),
+        ]
+        if compression.brotli is not None:
+            encoders.append((f'br-{settings.COMPRESSION_BROTLI_QUALITY}',
+                             lambda: compression.BrotliCompressor(settings.COMPRESSION_BROTLI_QUALITY)))
+        else:
+            self.stdout.write(self.style.WARNING('brotli no está instalado: solo se mide gzip'))
+
+        payloads = [
+            (f'export JSON ({options["entries"]})', self._export_chunks(options['entries'])),
+            (f'CSV registros ({options["logs"]})', self._csv_chunks(options['logs'])),
+        ]
+        self.stdout.write(
+            f'{"respuesta":<26} {"códec":<8} {"original KB":>12} {"comprimido KB":>14} {"ratio":>7} '
+            f'{"CPU ms":>8} {"MB/s":>8}'
+        )
+        for label, chunks in payloads:
+            size = sum(len(chunk) for chunk in chunks)
+            for name, factory in encoders:
+                output, cpu = self._measure(chunks, factory)
+                self.stdout.write(
+                    f'{label:<26} {name:<8} {size / 1024:>12.1f} {output / 1024:>14.1f} '
+                    f'{size / output:>6.1f}x {cpu * 1000:>8.1f} {size / 1e6 / max(cpu, 1e-9):>8.1f}'
+                )
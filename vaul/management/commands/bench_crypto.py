@@ -0,0 +1,51 @@
+import time
+
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from vaul.utils import get_engine
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark: coste por entrada del cifrado antiguo (Fernet por llamada) frente al motor cacheado.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=5000)
+
+    def _measure(self, label: str, n: int, func) -> None:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{label:<32} {elapsed * 1e6 / n:8.1f} µs/entrada  ({elapsed:.3f} s total)')
+
+    def handle(self, *args, **options):
+        n = options['entries']
+        key = settings.FERNET_KEY
+        engine = get_engine()
+        plaintexts = [f'Contraseña-{i}!' for i in range(n)]
+        tokens = [engine.encrypt(p) for p in plaintexts]
+
+        def old_encrypt():
+            for p in plaintexts:
+                Fernet(key.encode()).encrypt(p.encode()).decode()
+
+        def old_decrypt():
+            for t in tokens:
+                Fernet(key.encode()).decrypt(t.encode()).decode()
+
+        def new_encrypt():
+            for p in plaintexts:
+                engine.encrypt(p)
+
+        def new_decrypt():
+            for t in tokens:
+                engine.decrypt(t)
+
+        self.stdout.write(f'{n} entradas, {engine.max_workers} hilos para lotes >= {engine.parallel_threshold}')
+        self._measure('antiguo: encrypt', n, old_encrypt)
+        self._measure('motor: encrypt', n, new_encrypt)
+        self._measure('motor: encrypt_many', n, lambda: engine.encrypt_many(plaintexts))
+        self._measure('antiguo: decrypt', n, old_decrypt)
+        self._measure('motor: decrypt', n, new_decrypt)
+        self._measure('motor: decrypt_many', n, lambda: engine.decrypt_many(tokens))
@@ -0,0 +1,112 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from vaul.models import PasswordEntry
+from vaul.views import prepare_cards
+
+# Tarjetas tal como se pintaban antes: pertenencia en listas y bucle sobre las categorías por entrada
+LEGACY_CARDS = """
+<div class="grid cols-3"> <!-- 3 columnas para una vista más amplia -->
+{% for entry in entries %}
+  <div class="card list item" style="position: relative; {% if entry.id in weak_passwords or entry.id in duplicate_passwords %}border-left: 4px solid #ef4444;{% endif %}">
+    <div style="display: flex; justify-content: space-between; align-items: start; margin-bottom: 8px;">
+      <div style="font-weight:600; flex: 1;">{{ entry.site_name }}</div>
+      <span style="font-size: 11px; padding: 4px 8px; background: rgba(99, 102, 241, 0.2); border-radius: 4px; color: var(--primary);">
+        {% for choice in category_choices %}{% if choice.0 == entry.category %}{{ choice.1 }}{% endif %}{% endfor %}
+      </span>
+    </div>
+    {% if entry.id in weak_passwords %}
+    <div style="font-size: 11px; color: #fecaca; margin-bottom: 4px;">
+      <i class="fas fa-exclamation-triangle"></i> Contraseña débil
+    </div>
+    {% endif %}
+    {% if entry.id in duplicate_passwords %}
+    <div style="font-size: 11px; color: #fecaca; margin-bottom: 4px;">
+      <i class="fas fa-exclamation-circle"></i> Contraseña duplicada
+    </div>
+    {% endif %}
+    <div class="muted"><a href="{{ entry.site_url }}" target="_blank" style="color: var(--muted);">{{ entry.site_url }}</a></div>
+    <div class="muted">Usuario: {{ entry.username }}</div>
+    {% if entry.notes %}
+    <div class="muted" style="margin-top: 8px; font-size: 12px; font-style: italic; border-left: 2px solid #374151; padding-left: 8px;">
+      {{ entry.notes|truncatewords:15 }}
+    </div>
+    {% endif %}
+    <div style="margin-top:8px;">
+      Contraseña:
+      <span id="pwd-mask-{{ entry.id }}">••••••••</span>
+      <span id="pwd-value-{{ entry.id }}" style="display:none;"></span>
+    </div>
+    <div style="margin-top:8px; display:flex; gap:8px; flex-wrap:wrap;">
+      <button id="btn-toggle-{{ entry.id }}" class="btn" type="button" onclick="togglePassword({{ entry.id }}); window.appScheduleHide && window.appScheduleHide({{ entry.id }});">Mostrar</button>
+      <button class="btn" type="button" onclick="window.appCopy && window.appCopy({{ entry.id }})">Copiar</button>
+      <a class="btn primary" href="{% url 'edit_password' entry.id %}">Editar</a>
+      <form method="post" action="{% url 'delete_password' entry.id %}" onsubmit="return confirmDelete(event)" style="margin: 0;">
+        {% csrf_token %}
+        <button class="btn danger" type="submit">Eliminar</button>
+      </form>
+    </div>
+  </div>
+{% empty %}
+  <p class="muted">No tienes contraseñas guardadas todavía.</p>
+{% endfor %}
+</div>
+"""
+
+
+class Command(BaseCommand):
+    help = 'Mide el render de las tarjetas del dashboard (antes/después) con 12, 100 y 1000 entradas por página.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='12,100,1000', help='Entradas por página, separadas por comas')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _entries(self, n: int) -> list:
+        categories = [key for key, _ in PasswordEntry.CATEGORY_CHOICES]
+        entries = []
+        for i in range(1, n + 1):
+            entry = PasswordEntry(
+                id=i,
+                site_name=f'Sitio {i}',
+                site_url=f'https://sitio{i}.example.com/login',
+                username=f'usuario{i}',
+                category=categories[i % len(categories)],
+                notes='Nota de prueba con bastantes palabras para que el truncado tenga trabajo que hacer ' * 2,
+                strength='weak' if i % 3 == 0 else 'ok',
+            )
+            entry.is_duplicate = i % 4 == 0
+            entries.append(entry)
+        return entries
+
+    def _measure(self, render, repeat: int) -> float:
+        render()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            render()
+        return (time.perf_counter() - start) * 1000 / repeat
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/dashboard/')
+        legacy = engines['django'].from_string(LEGACY_CARDS)
+        current = get_template('vaul/dashboard_cards.html')
+        repeat = options['repeat']
+
+        self.stdout.write(f'{"entradas":>9} {"antes ms":>10} {"después ms":>11} {"mejora":>8}')
+        for n in (int(size) for size in options['sizes'].split(',')):
+            entries = self._entries(n)
+            legacy_context = {
+                'entries': entries,
+                'weak_passwords': [entry.id for entry in entries if entry.strength == 'weak'],
+                'duplicate_passwords': [entry.id for entry in entries if entry.is_duplicate],
+                'category_choices': PasswordEntry.CATEGORY_CHOICES,
+            }
+            before = self._measure(lambda: legacy.render(legacy_context, request), repeat)
+            # El coste de preparar las tarjetas forma parte del "después"
+            after = self._measure(
+                lambda: current.render({'entries': prepare_cards(entries)}, request), repeat
+            )
+            self.stdout.write(f'{n:>9} {before:>10.2f} {after:>11.2f} {before / after:>7.1f}x')
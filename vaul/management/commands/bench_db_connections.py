@@ -0,0 +1,109 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el coste por petición de abrir una conexión nueva, reutilizar una conexión '
+        'persistente (CONN_MAX_AGE) y sacarla del pool de psycopg 3, contra la base de datos configurada.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--requests', type=int, default=200, help='Peticiones simuladas por modo')
+        parser.add_argument('--queries', type=int, default=3, help='Consultas por petición')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in connections:
+            raise CommandError(f'No existe la base de datos {alias}')
+        base = copy.deepcopy(connections[alias].settings_dict)
+        base['OPTIONS'].pop('pool', None)
+        self.stdout.write(
+            f'{base["ENGINE"]} en {base.get("HOST") or base["NAME"]}: {options["requests"]} peticiones '
+            f'de {options["queries"]} consultas por modo\n'
+        )
+        self.stdout.write(f'{"modo":<24} {"media ms":>9} {"p50 ms":>8} {"p95 ms":>8} {"ahorro":>8}')
+
+        results = [
+            ('conexión nueva', self._fresh(base, alias, options)),
+            ('persistente', self._persistent(base, alias, options)),
+        ]
+        if base['ENGINE'] in ('django.db.backends.postgresql', 'password_manager.db'):
+            try:
+                import psycopg_pool  # noqa: F401
+            except ImportError:
+                self.stdout.write(self.style.WARNING('psycopg_pool no está instalado: se omite el modo pool'))
+            else:
+                results.append(('pool', self._pooled(base, alias, options)))
+
+        baseline = statistics.fmean(results[0][1])
+        for label, timings in results:
+            cuts = statistics.quantiles(timings, n=100)
+            mean = statistics.fmean(timings)
+            self.stdout.write(
+                f'{label:<24} {mean:>9.2f} {cuts[49]:>8.2f} {cuts[94]:>8.2f} {1 - mean / baseline:>8.0%}'
+            )
+
+    def _wrapper(self, settings_dict: dict, alias: str):
+        return load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+
+    def _request(self, connection, queries: int) -> None:
+        with connection.cursor() as cursor:
+            for _ in range(queries):
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+
+    def _fresh(self, base: dict, alias: str, options) -> list:
+        settings_dict = {**copy.deepcopy(base), 'CONN_MAX_AGE': 0}
+        timings = []
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            connection = self._wrapper(settings_dict, alias)
+            self._request(connection, options['queries'])
+            connection.close()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _persistent(self, base: dict, alias: str, options) -> list:
+        settings_dict = {**copy.deepcopy(base), 'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': True}
+        connection = self._wrapper(settings_dict, alias)
+        self._request(connection, 1)
+        timings = []
+        try:
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                # Lo mismo que hace Django al empezar y terminar cada petición
+                connection.close_if_unusable_or_obsolete()
+                self._request(connection, options['queries'])
+                connection.close_if_unusable_or_obsolete()
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+        return timings
+
+    def _pooled(self, base: dict, alias: str, options) -> list:
+        from psycopg_pool import ConnectionPool
+
+        pool_alias = f'{alias}-bench-pool'
+        settings_dict = {**copy.deepcopy(base), 'CONN_MAX_AGE': 0}
+        settings_dict['OPTIONS']['pool'] = {'min_size': 1, 'max_size': 2, 'check': ConnectionPool.check_connection}
+        warmup = self._wrapper(settings_dict, pool_alias)
+        self._request(warmup, 1)
+        warmup.close()
+        timings = []
+        try:
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                connection = self._wrapper(settings_dict, pool_alias)
+                self._request(connection, options['queries'])
+                connection.close()
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            warmup.close_pool()
+        return timings
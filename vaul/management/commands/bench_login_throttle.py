@@ -0,0 +1,84 @@
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from vaul.views import login_view
+
+BENCH_CACHE = 'throttle-bench'
+
+
+class Command(BaseCommand):
+    help = (
+        'Reproduce en proceso un ataque de relleno de credenciales contra login_view y compara '
+        'el tiempo de CPU y las llamadas al hasher con y sin límite de intentos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=2000)
+        parser.add_argument('--ips', type=int, default=20, help='IPs de origen distintas')
+        parser.add_argument('--usernames', type=int, default=200, help='Usuarios atacados distintos')
+        parser.add_argument('--concurrency', type=int, default=8)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{options["attempts"]} intentos desde {options["ips"]} IPs contra {options["usernames"]} usuarios, '
+            f'{options["concurrency"]} hilos (hasher: {hashers.get_hasher().algorithm})\n'
+        )
+        self.stdout.write(
+            f'{"modo":<16} {"429":>6} {"hasher":>7} {"CPU s":>8} {"CPU ms/intento":>15} {"pared s":>8}'
+        )
+        # Caché propia para no tocar los contadores reales de THROTTLE_CACHE
+        caches_setting = {**settings.CACHES, BENCH_CACHE: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': BENCH_CACHE,
+        }}
+        with override_settings(CACHES=caches_setting, THROTTLE_CACHE=BENCH_CACHE):
+            for label, enabled in (('sin límite', False), ('con límite', True)):
+                with override_settings(THROTTLE_ENABLED=enabled):
+                    self._report(label, self._replay(options))
+
+    def _replay(self, options) -> dict:
+        factory = RequestFactory()
+        ips = [f'10.66.{i // 250}.{i % 250 + 1}' for i in range(options['ips'])]
+        usernames = [f'bench-victima-{i}' for i in range(options['usernames'])]
+        pairs = list(itertools.islice(zip(itertools.cycle(ips), itertools.cycle(usernames)), options['attempts']))
+        hashed = [0]
+        # get_hasher() devuelve siempre la misma instancia: basta con envolver su encode
+        hasher = hashers.get_hasher()
+        real_encode = hasher.encode
+
+        def encode(*args, **kwargs):
+            hashed[0] += 1
+            return real_encode(*args, **kwargs)
+
+        def one(pair):
+            ip, username = pair
+            request = factory.post('/login/', {'username': username, 'password': 'hunter2'}, REMOTE_ADDR=ip)
+            request.user = AnonymousUser()
+            request._messages = CookieStorage(request)
+            return login_view(request).status_code
+
+        hasher.encode = encode
+        try:
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                codes = list(pool.map(one, pairs))
+            cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+        finally:
+            del hasher.encode
+        return {
+            'rejected': codes.count(429), 'hashed': hashed[0], 'cpu': cpu, 'wall': wall, 'attempts': len(codes),
+        }
+
+    def _report(self, label: str, result: dict) -> None:
+        self.stdout.write(
+            f'{label:<16} {result["rejected"]:>6} {result["hashed"]:>7} {result["cpu"]:>8.2f} '
+            f'{result["cpu"] * 1000 / result["attempts"]:>15.2f} {result["wall"]:>8.2f}'
+        )
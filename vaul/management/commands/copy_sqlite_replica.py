@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia la base SQLite primaria sobre sus réplicas SQLite. Sirve para probar en local el '
+        'enrutado primario/réplica: entre dos copias, la réplica queda desfasada como lo haría una real.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', help='Réplica a actualizar (por defecto todas)')
+
+    def handle(self, *args, **options):
+        aliases = options['database'] or list(getattr(settings, 'DATABASE_REPLICAS', []))
+        if not aliases:
+            raise CommandError('No hay réplicas configuradas (DATABASE_REPLICAS)')
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if settings.DATABASES.get(alias, {}).get('ENGINE') != 'django.db.backends.sqlite3':
+                raise CommandError(f'{alias} no es una base SQLite')
+
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in aliases:
+                # La conexión de Django a la réplica no debe tener nada a medias durante la copia
+                connections[alias].close()
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f'{alias} actualizada desde {DEFAULT_DB_ALIAS}'))
+        finally:
+            source.close()
@@ -0,0 +1,183 @@
+import http.client
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+SCENARIOS = ('reveal', 'dashboard', 'logs')
+
+
+class _Target:
+    """Una instancia desplegada (WSGI o ASGI) con una sesión ya iniciada."""
+
+    def __init__(self, label: str, base_url: str):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise CommandError(f'URL no válida para {label}: {base_url}')
+        self.label = label
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.origin = f'{parts.scheme}://{parts.netloc}'
+        self.cookies = {}
+
+    def connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=30)
+
+    def request(self, conn, method: str, path: str, body: bytes = None, headers: dict = None):
+        # Bajo HTTPS la protección CSRF de Django exige un Referer del mismo origen
+        headers = {'Referer': self.origin + self.prefix + '/', **(headers or {})}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        conn.request(method, self.prefix + path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        return response, data
+
+    def _store_cookies(self, response) -> None:
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+
+    def login(self, username: str, password: str) -> None:
+        conn = self.connect()
+        try:
+            response, _ = self.request(conn, 'GET', '/login/')
+            self._store_cookies(response)
+            body = urlencode({'username': username, 'password': password}).encode()
+            response, _ = self.request(conn, 'POST', '/login/', body, {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-CSRFToken': self.cookies.get('csrftoken', ''),
+            })
+            self._store_cookies(response)
+        finally:
+            conn.close()
+        if 'sessionid' not in self.cookies:
+            raise CommandError(f'{self.label}: no se pudo iniciar sesión como {username}')
+
+    def first_entry_id(self) -> int:
+        conn = self.connect()
+        try:
+            response, data = self.request(conn, 'GET', '/dashboard/')
+        finally:
+            conn.close()
+        match = re.search(rb'id="pwd-value-(\d+)"', data) if response.status == 200 else None
+        if not match:
+            raise CommandError(f'{self.label}: el usuario no tiene entradas que revelar')
+        return int(match.group(1))
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de las vistas de revelado, dashboard y registros contra uno o varios '
+        'despliegues (p. ej. WSGI y ASGI) y compara latencias y concurrencia.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True, metavar='ETIQUETA=URL',
+            help='Despliegue a medir, p. ej. wsgi=http://127.0.0.1:8000 (repetible)',
+        )
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--scenario', choices=SCENARIOS, action='append',
+                            help='Vista a medir (repetible; por defecto todas)')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=1000, help='Peticiones por escenario y despliegue')
+        parser.add_argument('--warmup', type=int, default=20)
+
+    def handle(self, *args, **options):
+        targets = []
+        for spec in options['target']:
+            label, sep, url = spec.partition('=')
+            if not sep:
+                raise CommandError(f'--target debe tener la forma ETIQUETA=URL: {spec}')
+            target = _Target(label, url)
+            target.login(options['username'], options['password'])
+            targets.append(target)
+
+        scenarios = options['scenario'] or list(SCENARIOS)
+        self.stdout.write(
+            f'{options["requests"]} peticiones por escenario, {options["concurrency"]} clientes concurrentes\n'
+        )
+        self.stdout.write(
+            f'{"despliegue":<12} {"escenario":<10} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"máx ms":>8} {"en vuelo":>9} {"errores":>8}'
+        )
+        for scenario in scenarios:
+            for target in targets:
+                result = self._run(target, scenario, options)
+                self.stdout.write(
+                    f'{target.label:<12} {scenario:<10} {result["rps"]:>8.1f} {result["p50"]:>8.1f} '
+                    f'{result["p95"]:>8.1f} {result["p99"]:>8.1f} {result["max"]:>8.1f} '
+                    f'{result["max_in_flight"]:>9} {result["errors"]:>8}'
+                )
+
+    def _request_factory(self, target: _Target, scenario: str):
+        if scenario == 'reveal':
+            path = f'/reveal/{target.first_entry_id()}/'
+            headers = {
+                'X-CSRFToken': target.cookies.get('csrftoken', ''),
+                'Content-Type': 'application/json',
+            }
+            return lambda conn: target.request(conn, 'POST', path, b'{}', headers)
+        path = '/dashboard/' if scenario == 'dashboard' else '/logs/'
+        return lambda conn: target.request(conn, 'GET', path)
+
+    def _run(self, target: _Target, scenario: str, options) -> dict:
+        send = self._request_factory(target, scenario)
+        local = threading.local()
+        lock = threading.Lock()
+        state = {'in_flight': 0, 'max_in_flight': 0, 'errors': 0}
+        latencies = []
+
+        def one(_):
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = target.connect()
+            with lock:
+                state['in_flight'] += 1
+                state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            started = time.perf_counter()
+            try:
+                response, _ = send(conn)
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                local.conn = None
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                state['in_flight'] -= 1
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    state['errors'] += 1
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(one, range(options['warmup'])))
+            latencies.clear()
+            state.update(errors=0, max_in_flight=0)
+            started = time.perf_counter()
+            list(pool.map(one, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        if len(latencies) < 2:
+            raise CommandError(f'{target.label}/{scenario}: {state["errors"]} errores, sin resultados válidos')
+        cuts = statistics.quantiles(latencies, n=100)
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': cuts[49],
+            'p95': cuts[94],
+            'p99': cuts[98],
+            'max': max(latencies),
+            'max_in_flight': state['max_in_flight'],
+            'errors': state['errors'],
+        }
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from vaul.models import PasswordEntry
+from vaul.search import index_entries, search_backend
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla de tokens de búsqueda (backend portable; en PostgreSQL la mantiene un trigger).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if search_backend() != 'tokens':
+            self.stdout.write('El backend de búsqueda activo no usa la tabla de tokens; nada que hacer.')
+            return
+        batch_size = options['batch_size']
+        entries = PasswordEntry.objects.only('id', 'user_id', 'site_name', 'site_url', 'username').order_by('id')
+        last_id = 0
+        indexed = 0
+        while True:
+            batch = list(entries.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            index_entries(batch)
+            last_id = batch[-1].id
+            indexed += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'{indexed} entradas indexadas.'))
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from vaul.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los contadores de VaultStats a partir de las entradas existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Nombre de usuario; por defecto todos.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+
+        rebuilt = 0
+        for user in users.iterator():
+            rebuild_stats(user)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas reconstruidas para {rebuilt} usuario(s).'))
@@ -0,0 +1,147 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, F, TextField, Value, When
+
+from vaul.models import PasswordEntry
+from vaul.utils import CryptoEngine
+
+_worker_engine = None
+
+
+def _init_worker(keys):
+    global _worker_engine
+    _worker_engine = CryptoEngine(keys)
+
+
+def _rotate_tokens(tokens):
+    return [_rotate_one(_worker_engine, token) for token in tokens]
+
+
+def _rotate_one(engine, token):
+    try:
+        return engine.rotate(token)
+    except Exception:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-cifra todas las contraseñas con la clave Fernet nueva, por lotes ordenados por id '
+        'y con una transacción corta por lote. Se puede reanudar desde un checkpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--new-key', help='Clave nueva; por defecto la primera de FERNET_KEYS.')
+        parser.add_argument('--old-keys', help='Claves anteriores separadas por comas; por defecto el resto de FERNET_KEYS.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=0, help='Procesos para el cifrado (0 = en este proceso).')
+        parser.add_argument('--checkpoint', help='Archivo donde guardar el último id procesado.')
+        parser.add_argument('--resume', action='store_true', help='Continuar desde el id guardado en --checkpoint.')
+
+    def _keys(self, options):
+        configured = list(getattr(settings, 'FERNET_KEYS', None) or [settings.FERNET_KEY])
+        new_key = options['new_key'] or configured[0]
+        if options['old_keys']:
+            old_keys = [key.strip() for key in options['old_keys'].split(',') if key.strip()]
+        else:
+            old_keys = [key for key in configured if key != new_key]
+        if not old_keys:
+            raise CommandError('No hay claves anteriores: define FERNET_KEYS=nueva,anterior o usa --old-keys.')
+        return [new_key] + old_keys
+
+    def _read_checkpoint(self, path: Path) -> int:
+        if not path.exists():
+            return 0
+        return int(json.loads(path.read_text())['last_id'])
+
+    def _write_checkpoint(self, path: Path, last_id: int) -> None:
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_text(json.dumps({'last_id': last_id}))
+        tmp.replace(path)
+
+    def handle(self, *args, **options):
+        keys = self._keys(options)
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        checkpoint = Path(options['checkpoint']) if options['checkpoint'] else None
+        if options['resume'] and not checkpoint:
+            raise CommandError('--resume necesita --checkpoint.')
+
+        last_id = self._read_checkpoint(checkpoint) if options['resume'] else 0
+        if last_id:
+            self.stdout.write(f'Reanudando después del id {last_id}.')
+
+        engine = CryptoEngine(keys)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(keys,)) if workers else None
+
+        rotated = failed = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                # Lectura sin bloqueos; el cifrado se hace fuera de la transacción
+                batch = list(
+                    PasswordEntry.objects.filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', 'encrypted_password')[:chunk_size]
+                )
+                if not batch:
+                    break
+
+                tokens = [token for _, token in batch]
+                if pool:
+                    step = -(-len(tokens) // workers)
+                    parts = [tokens[i:i + step] for i in range(0, len(tokens), step)]
+                    new_tokens = [t for part in pool.map(_rotate_tokens, parts) for t in part]
+                else:
+                    new_tokens = [_rotate_one(engine, token) for token in tokens]
+
+                whens = []
+                rotations = {}
+                for (entry_id, old_token), new_token in zip(batch, new_tokens):
+                    if new_token is None:
+                        failed += 1
+                        continue
+                    # Solo se actualiza si nadie cambió la contraseña mientras tanto
+                    whens.append(When(id=entry_id, encrypted_password=old_token, then=Value(new_token)))
+                    rotations[entry_id] = new_token
+
+                if whens:
+                    with transaction.atomic():
+                        PasswordEntry.objects.filter(id__in=rotations).update(
+                            encrypted_password=Case(*whens, default=F('encrypted_password'), output_field=TextField())
+                        )
+                        # update() cuenta también las filas que el Case dejó como estaban: se cuentan
+                        # solo las que tienen el token nuevo (siguen bloqueadas hasta el commit)
+                        rotated += sum(
+                            1 for entry_id, token in
+                            PasswordEntry.objects.filter(id__in=rotations).values_list('id', 'encrypted_password')
+                            if token == rotations[entry_id]
+                        )
+                # Las filas editadas entretanto conservan su valor, ya cifrado con la clave vigente
+                last_id = batch[-1][0]
+                if checkpoint:
+                    self._write_checkpoint(checkpoint, last_id)
+
+                elapsed = time.perf_counter() - started
+                processed = rotated + failed
+                self.stdout.write(
+                    f'id <= {last_id}: {rotated} re-cifradas, {failed} fallidas '
+                    f'({processed / elapsed if elapsed else 0:.0f} filas/s)'
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rotación completada: {rotated} re-cifradas, {failed} no se pudieron descifrar, '
+            f'{elapsed:.1f} s ({(rotated + failed) / elapsed if elapsed else 0:.0f} filas/s).'
+        ))
+        if failed:
+            self.stdout.write(self.style.WARNING('Hay entradas que no se pudieron descifrar con ninguna clave indicada.'))
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from vaul.jobs import claim_next_job, purge_finished_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Worker local: procesa las importaciones y exportaciones encoladas en la base de datos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Procesa la cola y termina.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Segundos entre consultas a la cola.')
+
+    def handle(self, *args, **options):
+        retention = getattr(settings, 'VAUL_JOBS_RETENTION_HOURS', 24)
+        self.stdout.write('Worker de tareas iniciado.')
+        while True:
+            job = claim_next_job()
+            if job is not None:
+                started = time.perf_counter()
+                job = run_job(job)
+                self.stdout.write(
+                    f'Tarea #{job.id} ({job.kind}): {job.status}, {job.processed_rows} filas '
+                    f'en {time.perf_counter() - started:.1f} s' + (f' — {job.error}' if job.error else '')
+                )
+                continue
+            purged = purge_finished_jobs(retention)
+            if purged:
+                self.stdout.write(f'{purged} tarea(s) antiguas eliminadas.')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0003_alter_passwordentry_options_passwordentry_category_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passwordentry',
+            name='password_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='passwordentry',
+            name='strength',
+            field=models.CharField(blank=True, choices=[('weak', 'Débil'), ('ok', 'Aceptable')], default='', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='passwordentry',
+            index=models.Index(fields=['user', 'password_fingerprint'], name='vaul_entry_user_fp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordentry',
+            index=models.Index(fields=['user', 'strength'], name='vaul_entry_user_strength_idx'),
+        ),
+    ]
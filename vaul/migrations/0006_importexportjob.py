@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0005_vaultstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('import', 'Importación'), ('export', 'Exportación')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'En cola'), ('running', 'En curso'), ('done', 'Completada'), ('failed', 'Fallida')], default='pending', max_length=10)),
+                ('format', models.CharField(default='json', max_length=10)),
+                ('file_path', models.CharField(blank=True, default='', max_length=500)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('imported', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('invalid', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-id',),
+                'indexes': [models.Index(fields=['status', 'id'], name='vaul_job_status_idx'), models.Index(fields=['user', '-id'], name='vaul_job_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0006_importexportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reveallog',
+            index=models.Index(fields=['user', 'revealed_at', 'id'], name='vaul_reveallog_user_time_idx'),
+        ),
+    ]
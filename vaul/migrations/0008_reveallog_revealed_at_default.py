@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0007_reveallog_user_time_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reveallog',
+            name='revealed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
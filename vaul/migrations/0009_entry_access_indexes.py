@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:30
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def rename_duplicate_logins(apps, schema_editor):
+    # Antes no se impedían entradas repetidas: se renombran (sin borrar nada) para poder crear la restricción
+    PasswordEntry = apps.get_model('vaul', 'PasswordEntry')
+    duplicates = (
+        PasswordEntry.objects.order_by()
+        .values('user_id', 'site_name', 'site_url', 'username')
+        .annotate(n=models.Count('id'))
+        .filter(n__gt=1)
+    )
+    for dup in duplicates.iterator():
+        entries = PasswordEntry.objects.filter(
+            user_id=dup['user_id'],
+            site_name=dup['site_name'],
+            site_url=dup['site_url'],
+            username=dup['username'],
+        ).order_by('id')
+        for i, entry in enumerate(entries[1:], start=2):
+            suffix = f' ({i})'
+            entry.site_name = entry.site_name[:100 - len(suffix)] + suffix
+            entry.save(update_fields=['site_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0008_reveallog_revealed_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passwordentry',
+            index=models.Index(fields=['user', '-id'], name='vaul_entry_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordentry',
+            index=models.Index(fields=['user', 'category', '-id'], name='vaul_entry_user_cat_idx'),
+        ),
+        migrations.RunPython(rename_duplicate_logins, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='passwordentry',
+            constraint=models.UniqueConstraint(models.F('user'), models.F('site_name'), django.db.models.functions.text.MD5('site_url'), models.F('username'), name='vaul_entry_unique_login'),
+        ),
+    ]
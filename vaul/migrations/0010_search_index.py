@@ -0,0 +1,101 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:32
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Índices y trigger de búsqueda, solo para PostgreSQL (en otras bases se usa SearchToken)
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """
+    CREATE OR REPLACE FUNCTION vaul_passwordentry_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.site_name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.username, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.site_url, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER vaul_passwordentry_search_vector_trg
+    BEFORE INSERT OR UPDATE ON vaul_passwordentry
+    FOR EACH ROW EXECUTE FUNCTION vaul_passwordentry_search_vector()
+    """,
+    # Rellena las filas existentes a través del trigger
+    'UPDATE vaul_passwordentry SET site_name = site_name',
+    'CREATE INDEX vaul_entry_search_vector_idx ON vaul_passwordentry USING gin (search_vector)',
+    # Mismas expresiones que genera icontains (UPPER(col::text) LIKE UPPER(...))
+    'CREATE INDEX vaul_entry_site_name_trgm_idx ON vaul_passwordentry USING gin (UPPER(site_name::text) gin_trgm_ops)',
+    'CREATE INDEX vaul_entry_site_url_trgm_idx ON vaul_passwordentry USING gin (UPPER(site_url::text) gin_trgm_ops)',
+    'CREATE INDEX vaul_entry_username_trgm_idx ON vaul_passwordentry USING gin (UPPER(username::text) gin_trgm_ops)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS vaul_entry_username_trgm_idx',
+    'DROP INDEX IF EXISTS vaul_entry_site_url_trgm_idx',
+    'DROP INDEX IF EXISTS vaul_entry_site_name_trgm_idx',
+    'DROP INDEX IF EXISTS vaul_entry_search_vector_idx',
+    'DROP TRIGGER IF EXISTS vaul_passwordentry_search_vector_trg ON vaul_passwordentry',
+    'DROP FUNCTION IF EXISTS vaul_passwordentry_search_vector()',
+]
+
+
+def _run_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+def build_search_tokens(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    from vaul.search import weighted_tokens
+    PasswordEntry = apps.get_model('vaul', 'PasswordEntry')
+    SearchToken = apps.get_model('vaul', 'SearchToken')
+    entries = PasswordEntry.objects.only('id', 'user_id', 'site_name', 'site_url', 'username')
+    batch = []
+    for entry in entries.iterator(chunk_size=1000):
+        for token, weight in weighted_tokens(entry).items():
+            batch.append(SearchToken(user_id=entry.user_id, entry_id=entry.id, token=token, weight=weight))
+        if len(batch) >= 5000:
+            SearchToken.objects.bulk_create(batch)
+            batch = []
+    SearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0009_entry_access_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passwordentry',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='vaul.passwordentry')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'token'], name='vaul_searchtoken_lookup_idx')],
+                'constraints': [models.UniqueConstraint(fields=('entry', 'token'), name='vaul_searchtoken_unique')],
+            },
+        ),
+        migrations.RunPython(_run_postgres(POSTGRES_FORWARD), _run_postgres(POSTGRES_BACKWARD)),
+        migrations.RunPython(build_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def number_existing_entries(apps, schema_editor):
+    # Las entradas existentes reciben 1..n por usuario para que la primera sincronización las vea
+    PasswordEntry = apps.get_model('vaul', 'PasswordEntry')
+    VaultStats = apps.get_model('vaul', 'VaultStats')
+    user_ids = PasswordEntry.objects.order_by().values_list('user_id', flat=True).distinct()
+    for user_id in user_ids.iterator():
+        entries = list(PasswordEntry.objects.filter(user_id=user_id).only('id', 'category').order_by('id'))
+        for seq, entry in enumerate(entries, start=1):
+            entry.change_seq = seq
+        PasswordEntry.objects.bulk_update(entries, ['change_seq'], batch_size=1000)
+        stats = VaultStats.objects.filter(user_id=user_id).first()
+        if stats is None:
+            counts = {}
+            for entry in entries:
+                counts[entry.category] = counts.get(entry.category, 0) + 1
+            stats = VaultStats(user_id=user_id, total_entries=len(entries), category_counts=counts)
+        stats.last_change_seq = len(entries)
+        stats.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0010_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='passwordentry',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vaultstats',
+            name='last_change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='passwordentry',
+            index=models.Index(fields=['user', 'change_seq'], name='vaul_entry_user_seq_idx'),
+        ),
+        migrations.AddField(
+            model_name='entrytombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='entrytombstone',
+            index=models.Index(fields=['user', 'change_seq'], name='vaul_tombstone_user_seq_idx'),
+        ),
+        migrations.RunPython(number_existing_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0011_sync_change_seq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('reason', models.CharField(choices=[('sampled', 'Muestreada'), ('slow', 'Lenta')], max_length=10)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=2048)),
+                ('view_name', models.CharField(blank=True, default='', max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField(null=True)),
+                ('duration_ms', models.FloatField()),
+                ('sql_count', models.PositiveIntegerField(default=0)),
+                ('sql_ms', models.FloatField(default=0)),
+                ('sql', models.TextField(blank=True, default='')),
+                ('profile_format', models.CharField(choices=[('cprofile', 'cProfile (pstats)'), ('stacks', 'Pilas muestreadas (folded)')], max_length=10)),
+                ('profile_summary', models.TextField(blank=True, default='')),
+                ('profile_data', models.BinaryField(blank=True, default=b'')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:26
+
+from django.db import migrations, models
+
+
+def start_heartbeats(apps, schema_editor):
+    # Las tareas que ya estaban en curso se pueden retomar como las nuevas
+    ImportExportJob = apps.get_model('vaul', 'ImportExportJob')
+    ImportExportJob.objects.filter(status='running').update(heartbeat_at=models.F('started_at'), attempts=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaul', '0012_slowrequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importexportjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importexportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
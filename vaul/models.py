@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models.functions import MD5
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .utils import encrypt_password, password_fingerprint, password_strength
 
 class PasswordEntry(models.Model):
     CATEGORY_CHOICES = [
@@ -12,6 +16,11 @@ class PasswordEntry(models.Model):
         ('education', 'Educación'),
         ('other', 'Otro'),
     ]
+
+    STRENGTH_CHOICES = [
+        ('weak', 'Débil'),
+        ('ok', 'Aceptable'),
+    ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     site_name = models.CharField(max_length=100)
@@ -20,21 +29,164 @@ class PasswordEntry(models.Model):
     encrypted_password = models.TextField()
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='other')
     notes = models.TextField(blank=True, null=True, max_length=500)
+    # Índice de salud: se calculan al guardar la contraseña para no descifrar en el dashboard
+    password_fingerprint = models.CharField(max_length=64, blank=True, default='')
+    strength = models.CharField(max_length=10, choices=STRENGTH_CHOICES, blank=True, default='')
+    # Solo en PostgreSQL: lo mantiene un trigger (ver migración 0010) y se consulta en vaul.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Secuencia de cambios por usuario para la sincronización incremental (vaul.sync)
+    change_seq = models.BigIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ('-created_at',)
         verbose_name_plural = 'Password Entries'
+        indexes = [
+            models.Index(fields=['user', 'password_fingerprint'], name='vaul_entry_user_fp_idx'),
+            models.Index(fields=['user', 'strength'], name='vaul_entry_user_strength_idx'),
+            # Listado del dashboard y filtro por categoría
+            models.Index(fields=['user', '-id'], name='vaul_entry_user_id_idx'),
+            models.Index(fields=['user', 'category', '-id'], name='vaul_entry_user_cat_idx'),
+            models.Index(fields=['user', 'change_seq'], name='vaul_entry_user_seq_idx'),
+        ]
+        constraints = [
+            # Una entrada por sitio, URL y usuario. La URL entra como hash para no
+            # superar el tamaño máximo de una clave de índice con URLs largas.
+            models.UniqueConstraint(
+                'user', 'site_name', MD5('site_url'), 'username',
+                name='vaul_entry_unique_login',
+            ),
+        ]
+
+    def set_password(self, password: str) -> None:
+        """Cifra la contraseña y actualiza su huella y fortaleza."""
+        self.encrypted_password = encrypt_password(password)
+        self.password_fingerprint = password_fingerprint(password)
+        self.strength = password_strength(password)
 
 # Create your models here.
 
 class RevealLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     entry = models.ForeignKey(PasswordEntry, on_delete=models.CASCADE)
-    revealed_at = models.DateTimeField(auto_now_add=True)
+    # Se fija al crear el objeto (no al guardarlo) para que la escritura diferida conserve la hora real
+    revealed_at = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
 
     class Meta:
         ordering = ('-revealed_at',)
+        indexes = [
+            models.Index(fields=['user', 'revealed_at', 'id'], name='vaul_reveallog_user_time_idx'),
+        ]
+
+class VaultStats(models.Model):
+    """Contadores por usuario y categoría, mantenidos en cada escritura de entradas."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='vault_stats')
+    total_entries = models.PositiveIntegerField(default=0)
+    category_counts = models.JSONField(default=dict)
+    # Último número de la secuencia de cambios del usuario
+    last_change_seq = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Vault Stats'
+
+class ImportExportJob(models.Model):
+    """Importación o exportación encolada para el worker `run_jobs`."""
+    KIND_CHOICES = [
+        ('import', 'Importación'),
+        ('export', 'Exportación'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'En cola'),
+        ('running', 'En curso'),
+        ('done', 'Completada'),
+        ('failed', 'Fallida'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    format = models.CharField(max_length=10, default='json')
+    # Archivo cifrado con Fernet: el JSON subido o el resultado de la exportación
+    file_path = models.CharField(max_length=500, blank=True, default='')
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    invalid = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    # Veces que un worker la ha tomado y última señal de vida del que la procesa: una tarea
+    # 'running' sin señales durante VAUL_JOBS_LEASE_SECONDS se vuelve a tomar
+    attempts = models.PositiveSmallIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-id',)
+        indexes = [
+            models.Index(fields=['status', 'id'], name='vaul_job_status_idx'),
+            models.Index(fields=['user', '-id'], name='vaul_job_user_idx'),
+        ]
+
+class SearchToken(models.Model):
+    """Índice de búsqueda portable (tokens normalizados) para bases de datos sin búsqueda de texto."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    entry = models.ForeignKey(PasswordEntry, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'token'], name='vaul_searchtoken_lookup_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['entry', 'token'], name='vaul_searchtoken_unique'),
+        ]
+
+class EntryTombstone(models.Model):
+    """Marca de borrado para que la sincronización propague las eliminaciones."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    entry_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='vaul_tombstone_user_seq_idx'),
+        ]
+
+class SlowRequest(models.Model):
+    """Perfil de una petición muestreada o que superó el umbral de latencia (ver password_manager.profiling)."""
+    REASON_CHOICES = [
+        ('sampled', 'Muestreada'),
+        ('slow', 'Lenta'),
+    ]
+    FORMAT_CHOICES = [
+        ('cprofile', 'cProfile (pstats)'),
+        ('stacks', 'Pilas muestreadas (folded)'),
+    ]
+
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    view_name = models.CharField(max_length=200, blank=True, default='')
+    status_code = models.PositiveSmallIntegerField(null=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    duration_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    # Sentencias SQL con su duración, una por línea (sin parámetros)
+    sql = models.TextField(blank=True, default='')
+    profile_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    # Resumen legible y perfil completo descargable
+    profile_summary = models.TextField(blank=True, default='')
+    profile_data = models.BinaryField(blank=True, default=b'')
+
+    class Meta:
+        ordering = ['-created_at']
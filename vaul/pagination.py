@@ -0,0 +1,134 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, keys: tuple, cursor: str, converters: Optional[dict] = None) -> Optional[list]:
+    """Devuelve los valores del cursor ya convertidos, o None si el cursor no es válido.
+
+    Las claves que no son campos del modelo (anotaciones) necesitan un conversor en `converters`.
+    """
+    converters = converters or {}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            return None
+        return [
+            converters[key](value) if key in converters else model._meta.get_field(key).to_python(value)
+            for key, value in zip(keys, values)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+class KeysetPage:
+    """Página de resultados ordenados de forma descendente por `keys`, sin COUNT ni OFFSET."""
+
+    def __init__(self, object_list: list, keys: tuple, has_next: bool, has_previous: bool):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self._keys = keys
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _cursor(self, obj) -> str:
+        return encode_cursor([getattr(obj, key) for key in self._keys])
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        return self._cursor(self.object_list[-1]) if self.has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        return self._cursor(self.object_list[0]) if self.has_previous and self.object_list else None
+
+
+def _after_q(keys: tuple, values: list, op: str) -> Q:
+    """Condición lexicográfica (k1, k2, ...) op (v1, v2, ...)."""
+    q = Q()
+    for i, key in enumerate(keys):
+        term = Q(**{f'{key}__{op}': values[i]})
+        for prev_key, prev_value in zip(keys[:i], values[:i]):
+            term &= Q(**{prev_key: prev_value})
+        q |= term
+    return q
+
+
+def _keyset_query(queryset, keys: tuple, size: int, before: str, after: str, last: bool,
+                  converters: Optional[dict]):
+    """Devuelve (consulta, ascendente, desde_cursor) para keyset_page/akeyset_page."""
+    model = queryset.model
+    before_values = decode_cursor(model, keys, before, converters) if before else None
+    after_values = decode_cursor(model, keys, after, converters) if not before_values and after else None
+
+    if after_values or (last and not before_values):
+        qs = queryset.order_by(*keys)
+        if after_values:
+            qs = qs.filter(_after_q(keys, after_values, 'gt'))
+        return qs[:size + 1], True, bool(after_values)
+
+    qs = queryset.order_by(*[f'-{key}' for key in keys])
+    if before_values:
+        qs = qs.filter(_after_q(keys, before_values, 'lt'))
+    return qs[:size + 1], False, bool(before_values)
+
+
+def _keyset_result(rows: list, keys: tuple, size: int, ascending: bool, from_cursor: bool) -> KeysetPage:
+    if ascending:
+        has_previous = len(rows) > size
+        rows = rows[:size]
+        rows.reverse()
+        return KeysetPage(rows, keys, has_next=from_cursor, has_previous=has_previous)
+    return KeysetPage(rows[:size], keys, has_next=len(rows) > size, has_previous=from_cursor)
+
+
+def keyset_page(queryset, keys: tuple, size: int, before: str = '', after: str = '',
+                last: bool = False, converters: Optional[dict] = None) -> KeysetPage:
+    """Pagina `queryset` en orden descendente por `keys`.
+
+    `before` pide los elementos siguientes (más antiguos) a un cursor y `after` los
+    anteriores (más recientes); `last` pide la última página. Sin cursor se devuelve
+    la primera página.
+    """
+    qs, ascending, from_cursor = _keyset_query(queryset, keys, size, before, after, last, converters)
+    return _keyset_result(list(qs), keys, size, ascending, from_cursor)
+
+
+async def akeyset_page(queryset, keys: tuple, size: int, before: str = '', after: str = '',
+                       last: bool = False, converters: Optional[dict] = None) -> KeysetPage:
+    """Versión asíncrona de keyset_page para las vistas async."""
+    qs, ascending, from_cursor = _keyset_query(queryset, keys, size, before, after, last, converters)
+    return _keyset_result([obj async for obj in qs], keys, size, ascending, from_cursor)
+
+
+def _offset_query(queryset, keys: tuple, size: int, number: int):
+    start = (max(number, 1) - 1) * size
+    return queryset.order_by(*[f'-{key}' for key in keys])[start:start + size + 1]
+
+
+def offset_page(queryset, keys: tuple, size: int, number: int) -> KeysetPage:
+    """Compatibilidad con los enlaces antiguos `?page=N`: una consulta con OFFSET (sin COUNT)
+    que devuelve cursores para seguir navegando sin OFFSET."""
+    rows = list(_offset_query(queryset, keys, size, number))
+    return KeysetPage(rows[:size], keys, has_next=len(rows) > size, has_previous=number > 1)
+
+
+async def aoffset_page(queryset, keys: tuple, size: int, number: int) -> KeysetPage:
+    """Versión asíncrona de offset_page."""
+    rows = [obj async for obj in _offset_query(queryset, keys, size, number)]
+    return KeysetPage(rows[:size], keys, has_next=len(rows) > size, has_previous=number > 1)
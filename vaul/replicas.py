@@ -0,0 +1,180 @@
+"""Lecturas en réplicas y escrituras en el primario.
+
+Solo van a una réplica las lecturas de los modelos de vaul hechas dentro de una vista
+marcada con `read_from_replica`; todo lo demás (sesiones, usuarios, escrituras, lecturas
+dentro de una transacción) usa el primario. Cuando una petición escribe, la respuesta
+lleva la cookie PIN_COOKIE y durante DB_REPLICA_PIN_SECONDS las lecturas de ese
+navegador también van al primario, para que el usuario vea enseguida sus cambios.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'vaul_primary'
+REPLICA_APPS = {'vaul'}
+
+
+class _RoutingState:
+    """Decisión de enrutado de una petición."""
+
+    def __init__(self, pinned: bool):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+_state: ContextVar[Optional[_RoutingState]] = ContextVar('replica_routing_state', default=None)
+
+
+def replica_aliases() -> list:
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None:
+            return None
+        if (
+            state.replica is None
+            or state.pinned
+            or state.wrote
+            or model._meta.app_label not in REPLICA_APPS
+            # Lo leído en una transacción debe ver lo que ya ha escrito
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Explícito: si no, Django escribiría en la base de la que se leyó la instancia
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def _bound_iterator(state, iterator):
+    # El servidor consume el streaming cuando el middleware ya ha terminado
+    iterator = iter(iterator)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+async def _abound_iterator(state, iterator):
+    iterator = aiter(iterator)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+def _use_replica(response):
+    state = _state.get()
+    if state is not None and response.streaming:
+        if response.is_async:
+            response.streaming_content = _abound_iterator(state, response.streaming_content)
+        else:
+            response.streaming_content = _bound_iterator(state, response.streaming_content)
+    return response
+
+
+def read_from_replica(view):
+    """Las lecturas de modelos de vaul de la vista (y de su streaming) van a una réplica."""
+    def choose():
+        state = _state.get()
+        aliases = replica_aliases()
+        if state is not None and aliases and not state.pinned:
+            state.replica = random.choice(aliases)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            choose()
+            return _use_replica(await view(request, *args, **kwargs))
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        choose()
+        return _use_replica(view(request, *args, **kwargs))
+    return wrapper
+
+
+class ReplicaRoutingMiddleware:
+    """Crea el estado de enrutado de cada petición y fija al primario a quien escribe.
+
+    Debe ir antes de SessionMiddleware para ver también las escrituras de la sesión (login).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'DB_REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        state = _RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(state, response)
+
+    def _pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=self.pin_seconds,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
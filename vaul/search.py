@@ -0,0 +1,137 @@
+import re
+import unicodedata
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from .models import PasswordEntry, SearchToken
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+MAX_TOKEN_LENGTH = 64
+
+
+def search_backend() -> str:
+    """'postgres' (tsvector + trigramas) o 'tokens' (tabla SearchToken)."""
+    backend = getattr(settings, 'VAUL_SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return 'postgres' if connection.vendor == 'postgresql' else 'tokens'
+    return backend
+
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin tildes."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(*texts: str) -> set:
+    tokens = set()
+    for text in texts:
+        tokens.update(t[:MAX_TOKEN_LENGTH] for t in _TOKEN_RE.findall(normalize(text)))
+    return tokens
+
+
+def weighted_tokens(entry) -> dict:
+    """{token: peso}; el nombre del sitio pesa más que el usuario y este más que la URL."""
+    weights = {}
+    for text, weight in ((entry.site_url, 1), (entry.username, 2), (entry.site_name, 3)):
+        for token in tokenize(text):
+            weights[token] = max(weight, weights.get(token, 0))
+    return weights
+
+
+def index_entries(entries: Iterable[PasswordEntry]) -> None:
+    """Actualiza los tokens de las entradas indicadas (no hace nada en PostgreSQL)."""
+    if search_backend() != 'tokens':
+        return
+    entries = list(entries)
+    if not entries:
+        return
+    SearchToken.objects.filter(entry__in=[entry.id for entry in entries]).delete()
+    SearchToken.objects.bulk_create([
+        SearchToken(user_id=entry.user_id, entry_id=entry.id, token=token, weight=weight)
+        for entry in entries
+        for token, weight in weighted_tokens(entry).items()
+    ], batch_size=1000)
+
+
+def last_entry_id(user):
+    """Id más alto del usuario antes de una inserción masiva; None si no hace falta indexar."""
+    if search_backend() != 'tokens':
+        return None
+    return PasswordEntry.objects.filter(user=user).aggregate(last=Max('id'))['last'] or 0
+
+
+def index_user_entries_after(user, last_id) -> None:
+    """Indexa las entradas del usuario creadas después de `last_id` (p. ej. tras un bulk_create)."""
+    if last_id is None:
+        return
+    index_entries(
+        PasswordEntry.objects.filter(user=user, id__gt=last_id)
+        .only('id', 'user_id', 'site_name', 'site_url', 'username')
+    )
+
+
+def _search_postgres(entries, q: str):
+    query = SearchQuery(q, config='simple', search_type='websearch')
+    substring = (
+        Q(site_name__icontains=q) |
+        Q(site_url__icontains=q) |
+        Q(username__icontains=q)
+    )
+    # ts_rank y similarity() devuelven real (float4): en double precision el valor del cursor
+    # de paginación (un float de Python) vuelve a compararse igual que el guardado
+    return entries.filter(Q(search_vector=query) | substring).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query) + Greatest(
+            TrigramSimilarity('site_name', q),
+            TrigramSimilarity('username', q),
+            TrigramSimilarity('site_url', q),
+        ), FloatField())
+    )
+
+
+def _search_tokens(user, entries, q: str):
+    terms = tokenize(q)
+    if not terms:
+        return entries.filter(
+            Q(site_name__icontains=q) |
+            Q(site_url__icontains=q) |
+            Q(username__icontains=q)
+        ).annotate(rank=Value(0.0, output_field=FloatField()))
+    # Todas las palabras deben aparecer como prefijo de algún token de la entrada
+    for term in terms:
+        entries = entries.filter(id__in=SearchToken.objects.filter(
+            user=user, token__startswith=term
+        ).values('entry_id'))
+    exact_matches = (
+        SearchToken.objects.filter(entry=OuterRef('pk'), token__in=terms)
+        .order_by()
+        .values('entry')
+        .annotate(score=Sum('weight'))
+        .values('score')
+    )
+    return entries.annotate(
+        rank=Coalesce(Subquery(exact_matches, output_field=IntegerField()), 0) * 1.0
+    )
+
+
+def search_entries(user, q: str, entries=None):
+    """Punto de entrada único de búsqueda: entradas del usuario ordenadas por relevancia.
+
+    `entries` permite partir de un queryset ya filtrado (p. ej. por categoría).
+    El resultado lleva la anotación `rank`.
+    """
+    if entries is None:
+        entries = PasswordEntry.objects.filter(user=user)
+    q = (q or '').strip()
+    if not q:
+        return entries.annotate(rank=Value(0.0, output_field=FloatField())).order_by('-id')
+    if search_backend() == 'postgres':
+        results = _search_postgres(entries, q)
+    else:
+        results = _search_tokens(user, entries, q)
+    return results.order_by('-rank', '-id')
@@ -0,0 +1,109 @@
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import PasswordEntry, VaultStats
+
+
+def _count_entries(user) -> tuple[int, dict]:
+    rows = (
+        PasswordEntry.objects.filter(user=user)
+        .order_by()
+        .values('category')
+        .annotate(n=Count('id'))
+    )
+    counts = {row['category']: row['n'] for row in rows}
+    return sum(counts.values()), counts
+
+
+def rebuild_stats(user) -> VaultStats:
+    """Recalcula desde cero los contadores de un usuario."""
+    with transaction.atomic():
+        stats, created = _lock_stats(user)
+        if not created:
+            stats.total_entries, stats.category_counts = _count_entries(user)
+            stats.save()
+    return stats
+
+
+def _lock_stats(user) -> tuple[VaultStats, bool]:
+    """Fila de estadísticas bloqueada hasta el final de la transacción.
+
+    Si no existía se crea con el recuento actual, que ya incluye cualquier escritura
+    hecha antes en la misma transacción.
+    """
+    stats, created = VaultStats.objects.select_for_update().get_or_create(user=user)
+    if created:
+        stats.total_entries, stats.category_counts = _count_entries(user)
+        stats.save()
+    return stats, created
+
+
+def apply_delta(user, deltas: dict) -> None:
+    """Suma `deltas` ({categoría: n}) a los contadores del usuario.
+
+    Debe llamarse dentro de la misma transacción que la escritura de entradas, después de ella.
+    """
+    deltas = {category: n for category, n in deltas.items() if n}
+    if not deltas:
+        return
+    with transaction.atomic():
+        stats, created = _lock_stats(user)
+        if created:
+            # El recuento recién hecho ya incluye la escritura en curso
+            return
+        counts = Counter(stats.category_counts)
+        counts.update(deltas)
+        stats.category_counts = {category: n for category, n in counts.items() if n > 0}
+        stats.total_entries = sum(stats.category_counts.values())
+        stats.save()
+
+
+def reserve_change_seq(user, count: int = 1) -> int:
+    """Reserva `count` números consecutivos de la secuencia de cambios y devuelve el primero.
+
+    Debe llamarse dentro de la transacción de la escritura y antes de ella: el bloqueo
+    de la fila garantiza que los números se confirman en orden.
+    """
+    with transaction.atomic():
+        stats, _ = _lock_stats(user)
+        first = stats.last_change_seq + 1
+        stats.last_change_seq += count
+        stats.save(update_fields=['last_change_seq', 'updated_at'])
+    return first
+
+
+def release_change_seq(user, last_used: int) -> None:
+    """Devuelve los números reservados después de `last_used` que no se llegaron a usar.
+
+    Solo es válido en la misma transacción que reserve_change_seq, que sigue bloqueando
+    la fila: nadie más ha podido reservar números desde entonces.
+    """
+    VaultStats.objects.filter(user=user).update(last_change_seq=last_used)
+
+
+def get_stats(user) -> tuple[int, dict]:
+    """Devuelve (total, {categoría: n}) en el orden de CATEGORY_CHOICES con una sola consulta."""
+    stats = VaultStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = rebuild_stats(user)
+    return stats_summary(stats)
+
+
+async def aget_stats_row(user) -> VaultStats:
+    """Fila de estadísticas del usuario para las vistas async. La reconstrucción (rara) sigue siendo síncrona."""
+    stats = await VaultStats.objects.filter(user=user).afirst()
+    if stats is None:
+        stats = await sync_to_async(rebuild_stats)(user)
+    return stats
+
+
+def stats_summary(stats: VaultStats) -> tuple[int, dict]:
+    """(total, {categoría: n}) en el orden de CATEGORY_CHOICES."""
+    category_stats = {
+        key: stats.category_counts.get(key, 0) for key, _ in PasswordEntry.CATEGORY_CHOICES
+    }
+    return stats.total_entries, category_stats
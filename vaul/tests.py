@@ -1,3 +1,984 @@
-from django.test import TestCase
+import asyncio
+import html
+import io
+import json
+import os
+import re
+import tempfile
+import warnings
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, close_old_connections, connection, connections, router, transaction
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .audit import AuditWriter
+from .imports import ImportFormatError, ImportReport, _insert_batch, iter_entries
+from .jobs import claim_next_job, enqueue_export, enqueue_import, read_encrypted, run_job
+from .models import ImportExportJob, PasswordEntry, RevealLog, SearchToken, VaultStats
+from .pagination import keyset_page
+from .replicas import PIN_COOKIE, _RoutingState, _state
+from .search import index_user_entries_after, search_entries
+from .stats import apply_delta, reserve_change_seq
+from .utils import CryptoEngine, count_crypto, decrypt_password, get_engine, password_fingerprint
+
+
+class AccessPatternIndexTests(TestCase):
+    """Las consultas calientes deben resolverse con índices, no con recorridos completos."""
+
+    USERS = 20
+    ENTRIES_PER_USER = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = [key for key, _ in PasswordEntry.CATEGORY_CHOICES]
+        users = [User.objects.create_user(f'user{i}') for i in range(cls.USERS)]
+        PasswordEntry.objects.bulk_create([
+            PasswordEntry(
+                user=user,
+                site_name=f'site{n}',
+                site_url=f'https://site{n}.example.com/',
+                username=f'login{n}',
+                encrypted_password='x',
+                category=categories[n % len(categories)],
+            )
+            for user in users
+            for n in range(cls.ENTRIES_PER_USER)
+        ], batch_size=1000)
+        cls.user = users[0]
+        entries = list(PasswordEntry.objects.filter(user=cls.user)[:50])
+        RevealLog.objects.bulk_create([
+            RevealLog(user=user, entry=entries[n % len(entries)])
+            for user in users
+            for n in range(200)
+        ], batch_size=1000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertIndexScan(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn('INDEX', plan, plan)
+            self.assertNotIn('USE TEMP B-TREE', plan, plan)
+        elif connection.vendor == 'postgresql':
+            self.assertIn('Index', plan, plan)
+            self.assertNotIn('Seq Scan', plan, plan)
+            self.assertNotIn('Sort', plan, plan)
+        else:
+            self.skipTest(f'Sin comprobación de planes para {connection.vendor}')
+
+    def test_dashboard_list(self):
+        self.assertIndexScan(PasswordEntry.objects.filter(user=self.user).order_by('-id')[:12])
+
+    def test_dashboard_category_filter(self):
+        self.assertIndexScan(
+            PasswordEntry.objects.filter(user=self.user, category='work').order_by('-id')[:12]
+        )
+
+    def test_import_dedup_lookup(self):
+        self.assertIndexScan(PasswordEntry.objects.filter(
+            user=self.user,
+            site_name='site7',
+            site_url='https://site7.example.com/',
+            username='login7',
+        ).order_by())
+
+    def test_import_existing_keys(self):
+        self.assertIndexScan(
+            PasswordEntry.objects.filter(user=self.user).order_by()
+            .values_list('site_name', 'site_url', 'username')
+        )
+
+    def test_reveal_logs(self):
+        self.assertIndexScan(
+            RevealLog.objects.filter(user=self.user).order_by('-revealed_at', '-id')[:50]
+        )
+
+
+class CryptoEngineTests(TestCase):
+    VALUES = [f'contraseña-{n}' for n in range(40)] + ['', '€ñ"\\']
+
+    def setUp(self):
+        self.key = Fernet.generate_key().decode()
+
+    def test_batches_round_trip_in_order(self):
+        for workers, threshold in ((1, 512), (4, 4)):
+            engine = CryptoEngine([self.key], max_workers=workers, parallel_threshold=threshold)
+            with self.subTest(workers=workers), count_crypto() as counter:
+                tokens = engine.encrypt_many(self.VALUES)
+                self.assertTrue(all(result.ok for result in tokens))
+                results = engine.decrypt_many(result.value for result in tokens)
+                self.assertEqual([result.value for result in results], self.VALUES)
+                # Los hilos del lote paralelo también cuentan
+                self.assertEqual((counter.encrypts, counter.decrypts), (len(self.VALUES), len(self.VALUES)))
+
+    def test_bad_tokens_fail_alone(self):
+        engine = CryptoEngine([self.key], max_workers=2, parallel_threshold=2)
+        foreign = CryptoEngine([Fernet.generate_key().decode()]).encrypt('ajena')
+        good = engine.encrypt('buena')
+        results = engine.decrypt_many(['basura', good, foreign])
+        self.assertEqual([result.error for result in results], ['InvalidToken', None, 'InvalidToken'])
+        self.assertEqual(results[1].value, 'buena')
+
+    def test_old_keys_decrypt_and_rotate_to_the_first(self):
+        old_key = self.key
+        old_token = CryptoEngine([old_key]).encrypt('secreto')
+        new_key = Fernet.generate_key().decode()
+        engine = CryptoEngine([new_key, old_key])
+        self.assertEqual(engine.decrypt(old_token), 'secreto')
+        rotated = engine.rotate(old_token)
+        self.assertEqual(CryptoEngine([new_key]).decrypt(rotated), 'secreto')
+
+    def test_engine_is_rebuilt_when_the_keys_change(self):
+        token = get_engine().encrypt('secreto')
+        with override_settings(FERNET_KEYS=[Fernet.generate_key().decode()]):
+            self.assertFalse(get_engine().decrypt_many([token])[0].ok)
+        self.assertEqual(get_engine().decrypt(token), 'secreto')
+
+
+class RotateFernetKeyTests(TestCase):
+    def setUp(self):
+        self.old_key = settings.FERNET_KEY
+        self.new_key = Fernet.generate_key().decode()
+        user = User.objects.create_user('owner')
+        for n in range(3):
+            entry = PasswordEntry(user=user, site_name=f'site{n}', site_url='https://example.com/', username=f'login{n}')
+            entry.set_password(f'secreto{n}')
+            entry.save()
+
+    def test_entry_edited_during_rotation_is_not_counted(self):
+        from vaul.management.commands import rotate_fernet_key
+
+        edited = PasswordEntry.objects.order_by('id').first()
+        rotate_one = rotate_fernet_key._rotate_one
+
+        def edit_then_rotate(engine, token):
+            # Alguien cambia la contraseña entre la lectura del lote y el UPDATE
+            if token == edited.encrypted_password:
+                PasswordEntry.objects.filter(pk=edited.pk).update(encrypted_password=engine.encrypt('nueva'))
+            return rotate_one(engine, token)
+
+        out = io.StringIO()
+        with override_settings(FERNET_KEYS=[self.new_key, self.old_key]), \
+                mock.patch.object(rotate_fernet_key, '_rotate_one', edit_then_rotate):
+            call_command('rotate_fernet_key', stdout=out)
+        self.assertIn('Rotación completada: 2 re-cifradas', out.getvalue())
+        with override_settings(FERNET_KEY=self.new_key, FERNET_KEYS=[self.new_key]):
+            passwords = {entry.username: decrypt_password(entry.encrypted_password) for entry in PasswordEntry.objects.all()}
+        self.assertEqual(passwords, {'login0': 'nueva', 'login1': 'secreto1', 'login2': 'secreto2'})
+
+
+class BackgroundJobTests(TestCase):
+    def setUp(self):
+        jobs_root = tempfile.TemporaryDirectory()
+        self.addCleanup(jobs_root.cleanup)
+        self.enterContext(override_settings(VAUL_JOBS_ROOT=jobs_root.name))
+        self.user = User.objects.create_user('owner')
+
+    def _ndjson(self, lines):
+        return SimpleUploadedFile('import.ndjson', ''.join(lines).encode())
+
+    def test_failed_import_keeps_committed_progress(self):
+        lines = [
+            json.dumps({'site_name': f'site{n}', 'site_url': 'https://example.com/', 'username': f'u{n}', 'password': 'pw'}) + '\n'
+            for n in range(600)
+        ]
+        enqueue_import(self.user, self._ndjson(lines + ['{roto\n']))
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, 'failed')
+        job.refresh_from_db()
+        # El primer lote (500) quedó confirmado; el guardado final no debe pisar sus contadores
+        self.assertEqual((job.imported, job.processed_rows), (500, 500))
+        self.assertEqual(PasswordEntry.objects.filter(user=self.user).count(), 500)
+
+    def test_abandoned_job_is_reclaimed_until_max_attempts(self):
+        job = enqueue_export(self.user)
+        with override_settings(VAUL_JOBS_LEASE_SECONDS=60, VAUL_JOBS_MAX_ATTEMPTS=2):
+            self.assertEqual(claim_next_job().pk, job.pk)
+            self.assertIsNone(claim_next_job())
+            # El worker se cae: no vuelve a dar señales
+            ImportExportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+            reclaimed = claim_next_job()
+            self.assertEqual((reclaimed.pk, reclaimed.attempts), (job.pk, 2))
+            ImportExportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+            self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def _files(self):
+        return sorted(path.name for path in Path(settings.VAUL_JOBS_ROOT).iterdir())
+
+    def test_stale_worker_does_not_overwrite_reclaimed_job(self):
+        enqueue_export(self.user)
+        stale = claim_next_job()
+        ImportExportJob.objects.filter(pk=stale.pk).update(attempts=2)
+        run_job(stale)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.file_path), ('running', ''))
+        # Su archivo no lo publica nadie: se borra
+        self.assertEqual(self._files(), [])
+
+    def test_reclaimed_export_gets_its_own_file(self):
+        PasswordEntry.objects.create(
+            user=self.user, site_name='s', site_url='https://example.com/', username='u',
+            encrypted_password=get_engine().encrypt('pw'),
+        )
+        enqueue_export(self.user, 'ndjson')
+        stale = claim_next_job()
+        ImportExportJob.objects.filter(pk=stale.pk).update(attempts=2)
+        current = run_job(ImportExportJob.objects.get(pk=stale.pk))
+        # El worker lento termina después y no toca el archivo publicado
+        run_job(stale)
+        job = ImportExportJob.objects.get(pk=stale.pk)
+        self.assertEqual((job.status, job.file_path), ('done', current.file_path))
+        self.assertEqual(self._files(), [Path(current.file_path).name])
+        self.assertEqual(len(b''.join(read_encrypted(Path(job.file_path))).splitlines()), 1)
+
+    def test_failed_export_leaves_no_partial_file(self):
+        enqueue_export(self.user)
+
+        def broken_export(*args, **kwargs):
+            yield '{"entries": ['
+            raise OSError('disco lleno')
+
+        with mock.patch('vaul.jobs.iter_export', broken_export):
+            job = run_job(claim_next_job())
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(self._files(), [])
+
+    def test_stale_import_leaves_the_upload_to_the_current_worker(self):
+        line = json.dumps({'site_name': 's', 'site_url': 'https://example.com/', 'username': 'u', 'password': 'pw'})
+        enqueue_import(self.user, self._ndjson([line + '\n']))
+        stale = claim_next_job()
+        ImportExportJob.objects.filter(pk=stale.pk).update(attempts=2)
+        run_job(stale)
+        # El worker que la retomó aún tiene que leerlo
+        self.assertTrue(Path(stale.file_path).exists())
+        current = run_job(ImportExportJob.objects.get(pk=stale.pk))
+        self.assertEqual(current.status, 'done')
+        self.assertFalse(Path(stale.file_path).exists())
+        self.assertEqual(PasswordEntry.objects.filter(user=self.user).count(), 1)
+
+
+class ImportConflictTests(TestCase):
+    def test_rows_dropped_by_unique_constraint_are_not_counted(self):
+        user = User.objects.create_user('owner')
+        # Otra escritura confirmó esta entrada después de que la importación cargara sus claves
+        taken = PasswordEntry(user=user, site_name='site1', site_url='https://example.com/', username='u1', category='work')
+        taken.set_password('pw')
+        taken.change_seq = reserve_change_seq(user)
+        taken.save()
+        apply_delta(user, {'work': 1})
+
+        batch = [
+            {'site_name': f'site{n}', 'site_url': 'https://example.com/', 'username': f'u{n}',
+             'password': 'pw', 'category': 'work' if n % 2 else 'social'}
+            for n in range(4)
+        ]
+        report = ImportReport()
+        with transaction.atomic():
+            apply_delta(user, _insert_batch(user, batch, set(), get_engine(), report))
+
+        self.assertEqual((report.imported, report.skipped), (3, 1))
+        self.assertEqual(report.by_category, {'social': 2, 'work': 1})
+        stats = VaultStats.objects.get(user=user)
+        self.assertEqual((stats.total_entries, stats.category_counts), (4, {'work': 2, 'social': 2}))
+        # Sin huecos en la secuencia de cambios
+        self.assertEqual(
+            sorted(PasswordEntry.objects.filter(user=user).values_list('change_seq', flat=True)), [1, 2, 3, 4]
+        )
+        self.assertEqual(stats.last_change_seq, 4)
+
+
+def _chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class StreamingParserTests(TestCase):
+    ENTRIES = [
+        {'site_name': 'Señal [beta]', 'site_url': 'https://example.com/?q={x}', 'username': 'ana', 'password': 'p"a\\ss,]}'},
+        {'site_name': 'Banco', 'site_url': 'https://banco.example/', 'username': 'luis', 'password': 'ñandú€', 'notes': None},
+        {'site_name': 'Números', 'site_url': 'https://n.example/', 'username': 'x', 'password': '1', 'extra': [1, 2.5e3, -40]},
+    ]
+
+    def _parse(self, data: bytes, ndjson=False):
+        return {size: list(iter_entries(_chunked(data, size), ndjson=ndjson)) for size in (1, 3, 7, 1000)}
+
+    def test_json_export_in_any_chunk_size(self):
+        # Claves antes y después de `entries`, BOM y caracteres multibyte cortados entre fragmentos
+        document = {'exported_at': '2024-01-01', 'meta': {'entries': 'no'}, 'entries': self.ENTRIES, 'count': 3}
+        data = '\ufeff'.encode() + json.dumps(document, ensure_ascii=False, indent=1).encode()
+        for size, entries in self._parse(data).items():
+            with self.subTest(size=size):
+                self.assertEqual(entries, self.ENTRIES)
+
+    def test_ndjson_in_any_chunk_size(self):
+        data = '\n\n'.join(json.dumps(entry, ensure_ascii=False) for entry in self.ENTRIES).encode() + b'\n'
+        for size, entries in self._parse(data, ndjson=True).items():
+            with self.subTest(size=size):
+                self.assertEqual(entries, self.ENTRIES)
+
+    def test_empty_entries(self):
+        self.assertEqual(list(iter_entries([b'{"entries": [ ]}'])), [])
+        self.assertEqual(list(iter_entries([b' \n'], ndjson=True)), [])
+
+    def test_document_without_entries_array_is_rejected(self):
+        for data in (b'{}', b'{"entries": {}}', b'{"otra": [1, 2]}'):
+            with self.subTest(data=data), self.assertRaises(ImportFormatError):
+                list(iter_entries(_chunked(data, 3)))
+
+    def test_truncated_or_broken_json_raises(self):
+        data = json.dumps({'entries': self.ENTRIES}).encode()
+        for broken in (data[:-1], data[:len(data) // 2], b'[' + data, data.replace(b',', b';', 1)):
+            with self.subTest(broken=broken[:20]), self.assertRaises(json.JSONDecodeError):
+                list(iter_entries(_chunked(broken, 7)))
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_entries([b'{"a": 1}\n{"b": '], ndjson=True))
+
+
+class ExportImportRoundTripTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.other = User.objects.create_user('other')
+        for n, (category, notes) in enumerate([('work', 'VPN'), ('finance', None), ('social', 'ñandú €'), ('other', None)]):
+            entry = PasswordEntry(
+                user=self.owner, site_name=f'Sitio {n}', site_url=f'https://s{n}.example/',
+                username=f'user{n}', category=category, notes=notes,
+            )
+            entry.set_password(f'pw-"{n}"\\ñ')
+            entry.save()
+
+    def _snapshot(self, user):
+        return sorted(
+            (e.site_name, e.site_url, e.username, e.category, e.notes, decrypt_password(e.encrypted_password))
+            for e in PasswordEntry.objects.filter(user=user)
+        )
+
+    def _export(self, fmt):
+        self.client.force_login(self.owner)
+        response = self.client.get('/export/', {'format': fmt})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def _import(self, data, name):
+        self.client.force_login(self.other)
+        return self.client.post('/import/', {'file': SimpleUploadedFile(name, data)})
+
+    def test_export_then_import_restores_every_entry(self):
+        for fmt in ('json', 'ndjson'):
+            with self.subTest(fmt=fmt):
+                PasswordEntry.objects.filter(user=self.other).delete()
+                self._import(self._export(fmt), f'export.{fmt}')
+                self.assertEqual(self._snapshot(self.other), self._snapshot(self.owner))
+
+    def test_importing_the_same_export_twice_skips_everything(self):
+        data = self._export('json')
+        self._import(data, 'export.json')
+        response = self._import(data, 'export.json')
+        self.assertEqual(
+            [str(m) for m in response.wsgi_request._messages][-1],
+            'Importación completada: 0 entradas importadas, 4 duplicadas omitidas, 0 inválidas.',
+        )
+        self.assertEqual(PasswordEntry.objects.filter(user=self.other).count(), 4)
+        self.assertEqual(VaultStats.objects.get(user=self.other).total_entries, 4)
+
+    def _asgi_get(self, path, query=''):
+        """GET a través de ASGIHandler, como bajo uvicorn. Devuelve (estado, cuerpo, avisos)."""
+        self.client.force_login(self.owner)
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': 'GET', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver'), (b'cookie', f'{settings.SESSION_COOKIE_NAME}={session}'.encode())],
+        }
+        received = []
+        sent = []
+
+        async def receive():
+            if received:
+                # Sin desconexión: el handler espera aquí hasta terminar la respuesta
+                await asyncio.Future()
+            received.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        # Como el cliente de pruebas: sin cerrar la conexión de la transacción del test
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+        body = [message.get('body', b'') for message in sent if message['type'] == 'http.response.body']
+        body = [part for part in body if part]
+        return sent[0]['status'], body, [str(w.message) for w in caught]
+
+    def test_asgi_export_is_streamed_not_buffered(self):
+        for fmt in ('json', 'ndjson'):
+            with self.subTest(fmt=fmt):
+                status, body, caught = self._asgi_get('/export/', f'format={fmt}')
+                self.assertEqual(status, 200)
+                # Django avisa cuando tiene que acumular un iterador síncrono
+                self.assertFalse([w for w in caught if 'synchronous iterators' in w], caught)
+                self.assertGreater(len(body), 2)
+                PasswordEntry.objects.filter(user=self.other).delete()
+                self._import(b''.join(body), f'export.{fmt}')
+                self.assertEqual(self._snapshot(self.other), self._snapshot(self.owner))
+
+    def test_asgi_job_download_is_streamed(self):
+        jobs_root = tempfile.TemporaryDirectory()
+        self.addCleanup(jobs_root.cleanup)
+        self.enterContext(override_settings(VAUL_JOBS_ROOT=jobs_root.name))
+        enqueue_export(self.owner, 'ndjson')
+        export = run_job(claim_next_job())
+        status, body, caught = self._asgi_get(f'/jobs/{export.id}/download/')
+        self.assertEqual(status, 200)
+        self.assertFalse([w for w in caught if 'synchronous iterators' in w], caught)
+        self.assertEqual(len(b''.join(body).splitlines()), 4)
+
+    def test_background_export_then_import(self):
+        jobs_root = tempfile.TemporaryDirectory()
+        self.addCleanup(jobs_root.cleanup)
+        self.enterContext(override_settings(VAUL_JOBS_ROOT=jobs_root.name))
+        for fmt in ('json', 'ndjson'):
+            with self.subTest(fmt=fmt):
+                PasswordEntry.objects.filter(user=self.other).delete()
+                enqueue_export(self.owner, fmt)
+                export = run_job(claim_next_job())
+                self.assertEqual(export.status, 'done')
+                self.client.force_login(self.owner)
+                data = b''.join(self.client.get(f'/jobs/{export.id}/download/').streaming_content)
+                enqueue_import(self.other, SimpleUploadedFile(f'export.{fmt}', data))
+                self.assertEqual(run_job(claim_next_job()).status, 'done')
+                self.assertEqual(self._snapshot(self.other), self._snapshot(self.owner))
+
+
+class SearchPagingTests(TestCase):
+    def test_cursor_pages_through_tied_ranks(self):
+        user = User.objects.create_user('owner')
+        PasswordEntry.objects.bulk_create([
+            PasswordEntry(
+                user=user,
+                site_name='banco central' if n % 5 == 0 else 'banco',
+                site_url='https://banco.example.com/',
+                username=f'cliente{n}',
+                encrypted_password='x',
+            )
+            for n in range(23)
+        ])
+        index_user_entries_after(user, 0)
+        expected = list(search_entries(user, 'banco').values_list('id', flat=True))
+        self.assertEqual(len(expected), 23)
+
+        seen, cursor = [], ''
+        while True:
+            page = keyset_page(search_entries(user, 'banco'), ('rank', 'id'), 5, before=cursor, converters={'rank': float})
+            seen += [entry.id for entry in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+        # Y hacia atrás desde la última página
+        seen, cursor = [], ''
+        page = keyset_page(search_entries(user, 'banco'), ('rank', 'id'), 5, last=True, converters={'rank': float})
+        while True:
+            seen = [entry.id for entry in page] + seen
+            if not page.has_previous:
+                break
+            page = keyset_page(search_entries(user, 'banco'), ('rank', 'id'), 5, after=page.previous_cursor,
+                               converters={'rank': float})
+        self.assertEqual(seen, expected)
+
+
+@override_settings(VAUL_SEARCH_BACKEND='tokens')
+class TokenSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.force_login(self.user)
+
+    def _add(self, site_name, site_url='https://example.com/', username='ana', category='other'):
+        self.client.post('/add/', {
+            'site_name': site_name, 'site_url': site_url, 'username': username,
+            'password': 'S3creto!largo', 'category': category,
+        })
+        return PasswordEntry.objects.get(user=self.user, site_name=site_name, site_url=site_url, username=username)
+
+    def _found(self, q):
+        return [entry.site_name for entry in search_entries(self.user, q)]
+
+    def test_prefix_and_accent_insensitive_terms(self):
+        self._add('Señal Móvil')
+        self._add('Banco Central', username='luis')
+        self.assertEqual(self._found('senal'), ['Señal Móvil'])
+        self.assertEqual(self._found('MOV'), ['Señal Móvil'])
+        # Todas las palabras deben aparecer
+        self.assertEqual(self._found('banco luis'), ['Banco Central'])
+        self.assertEqual(self._found('banco ana'), [])
+
+    def test_site_name_matches_rank_above_url_matches(self):
+        self._add('Correo', site_url='https://banco.example/')
+        self._add('Banco', site_url='https://example.com/')
+        self.assertEqual(self._found('banco'), ['Banco', 'Correo'])
+
+    def test_edit_and_delete_keep_the_index_current(self):
+        entry = self._add('Antiguo')
+        self.client.post(f'/edit/{entry.id}/', {
+            'site_name': 'Nuevo', 'site_url': entry.site_url, 'username': entry.username,
+            'password': 'S3creto!largo', 'category': 'other',
+        })
+        self.assertEqual((self._found('antiguo'), self._found('nuevo')), ([], ['Nuevo']))
+        self.client.post(f'/delete/{entry.id}/')
+        self.assertEqual(self._found('nuevo'), [])
+        self.assertFalse(SearchToken.objects.exists())
+
+    def test_rebuild_command_restores_the_index(self):
+        self._add('Señal Móvil')
+        SearchToken.objects.all().delete()
+        self.assertEqual(self._found('senal'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self._found('senal'), ['Señal Móvil'])
+
+
+class VaultStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.force_login(self.user)
+
+    def _add(self, site_name, category):
+        self.client.post('/add/', {
+            'site_name': site_name, 'site_url': 'https://example.com/', 'username': 'ana',
+            'password': 'S3creto!largo', 'category': category,
+        })
+        return PasswordEntry.objects.get(user=self.user, site_name=site_name)
+
+    def _counts(self):
+        stats = VaultStats.objects.get(user=self.user)
+        return stats.total_entries, {k: n for k, n in stats.category_counts.items() if n}
+
+    def test_views_and_import_keep_the_counters(self):
+        work = self._add('Uno', 'work')
+        self._add('Dos', 'work')
+        finance = self._add('Tres', 'finance')
+        self.assertEqual(self._counts(), (3, {'work': 2, 'finance': 1}))
+
+        self.client.post(f'/edit/{work.id}/', {
+            'site_name': 'Uno', 'site_url': 'https://example.com/', 'username': 'ana',
+            'password': 'S3creto!largo', 'category': 'social',
+        })
+        self.client.post(f'/delete/{finance.id}/')
+        self.assertEqual(self._counts(), (2, {'work': 1, 'social': 1}))
+
+        lines = [
+            json.dumps({'site_name': name, 'site_url': 'https://example.com/', 'username': 'ana', 'password': 'pw', 'category': category}) + '\n'
+            for name, category in (('Cuatro', 'personal'), ('Cinco', 'desconocida'), ('Uno', 'work'))
+        ]
+        self.client.post('/import/', {'file': SimpleUploadedFile('import.ndjson', ''.join(lines).encode())})
+        # La categoría desconocida cuenta como 'other' y el duplicado no suma
+        self.assertEqual(self._counts(), (4, {'work': 1, 'social': 1, 'personal': 1, 'other': 1}))
+
+    def test_rebuild_command_fixes_drifted_counters(self):
+        self._add('Uno', 'work')
+        VaultStats.objects.filter(user=self.user).update(total_entries=9, category_counts={'work': 9})
+        call_command('rebuild_vault_stats', user='owner', stdout=io.StringIO())
+        self.assertEqual(self._counts(), (1, {'work': 1}))
+
+    def test_dashboard_reads_the_counters_not_the_entries(self):
+        self._add('Uno', 'work')
+        VaultStats.objects.filter(user=self.user).update(total_entries=5, category_counts={'work': 5})
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.context['filtered_total'], 5)
+
+
+class PasswordHealthTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.client.force_login(self.user)
+        for n, password in enumerate(['corta', '12345678901', 'Repetida#2024', 'Repetida#2024', 'Única$Fuerte9']):
+            entry = PasswordEntry(user=self.user, site_name=f'site{n}', site_url='https://example.com/', username='ana')
+            entry.set_password(password)
+            entry.save()
+
+    def test_health_is_stored_without_the_plaintext(self):
+        weak = PasswordEntry.objects.filter(user=self.user, strength='weak').values_list('site_name', flat=True)
+        self.assertEqual(sorted(weak), ['site0', 'site1'])
+        fingerprints = PasswordEntry.objects.filter(site_name__in=['site2', 'site3']).values_list('password_fingerprint', flat=True)
+        self.assertEqual(len(set(fingerprints)), 1)
+        self.assertNotIn('Repetida', fingerprints[0])
+        with override_settings(PASSWORD_FINGERPRINT_KEY='otra-clave'):
+            self.assertNotEqual(password_fingerprint('Repetida#2024'), fingerprints[0])
+
+    def test_dashboard_flags_weak_and_duplicates_without_decrypting(self):
+        with count_crypto() as counter:
+            response = self.client.get('/dashboard/')
+        self.assertEqual(counter.decrypts, 0)
+        self.assertContains(response, '<strong>2</strong> contraseña(s) débil(es)')
+        self.assertContains(response, '<strong>2</strong> contraseña(s) duplicada(s)')
+        duplicates = {entry.site_name for entry in response.context['entries'] if entry.is_duplicate}
+        self.assertEqual(duplicates, {'site2', 'site3'})
+
+    def test_backfill_fills_missing_health(self):
+        PasswordEntry.objects.update(password_fingerprint='', strength='ok')
+        call_command('backfill_password_health', stdout=io.StringIO())
+        self.assertFalse(PasswordEntry.objects.filter(password_fingerprint='').exists())
+        self.assertEqual(PasswordEntry.objects.filter(strength='weak').count(), 2)
+        self.assertEqual(
+            PasswordEntry.objects.values('password_fingerprint').distinct().count(), 4
+        )
+
+
+class ChangeSequenceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+
+    def _entry(self, password, username='login', **fields):
+        entry = PasswordEntry(user=self.user, site_name='site', site_url='https://example.com/', username=username, **fields)
+        entry.set_password(password)
+        entry.change_seq = reserve_change_seq(self.user)
+        entry.save()
+        return entry
+
+    def test_backfill_bumps_change_seq_when_strength_changes(self):
+        entry = self._entry('corta')
+        PasswordEntry.objects.filter(pk=entry.pk).update(password_fingerprint='', strength='ok')
+        unchanged = self._entry('OtraClave123', username='otro')
+        PasswordEntry.objects.filter(pk=unchanged.pk).update(password_fingerprint='')
+
+        call_command('backfill_password_health', stdout=io.StringIO())
+
+        entry.refresh_from_db()
+        unchanged.refresh_from_db()
+        self.assertEqual((entry.strength, entry.change_seq), ('weak', 3))
+        self.assertEqual(unchanged.change_seq, 2)
+        self.assertEqual(VaultStats.objects.get(user=self.user).last_change_seq, 3)
+
+    def test_admin_cannot_move_entry_to_another_user(self):
+        admin_user = User.objects.create_superuser('admin', password='x')
+        other = User.objects.create_user('other')
+        entry = self._entry('Clave1234', category='work')
+        self.client.force_login(admin_user)
+        response = self.client.post(f'/admin/vaul/passwordentry/{entry.pk}/change/', {
+            'user': other.pk, 'site_name': 'site', 'site_url': 'https://example.com/', 'username': 'login',
+            'encrypted_password': entry.encrypted_password, 'category': 'personal', 'notes': '',
+            'password_fingerprint': entry.password_fingerprint, 'strength': entry.strength,
+        })
+        self.assertEqual(response.status_code, 302)
+        entry.refresh_from_db()
+        self.assertEqual((entry.user, entry.category), (self.user, 'personal'))
+
+
+@override_settings(VAUL_AUDIT_MODE='sync')
+class RevealBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.entries = []
+        for n in range(3):
+            entry = PasswordEntry(user=self.user, site_name=f'site{n}', site_url='https://example.com/', username='login')
+            entry.set_password(f'secreto{n}')
+            entry.save()
+            self.entries.append(entry)
+        self.client.force_login(self.user)
+
+    def _reveal(self, payload):
+        return self.client.post('/reveal/batch/', json.dumps(payload), content_type='application/json')
+
+    def test_reveals_own_entries(self):
+        first, second, _ = self.entries
+        response = self._reveal({'ids': [first.id, str(second.id), 999999]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], {
+            str(first.id): {'password': 'secreto0'},
+            str(second.id): {'password': 'secreto1'},
+            '999999': {'error': 'No encontrada'},
+        })
+        self.assertEqual(RevealLog.objects.count(), 2)
+
+    def test_rejects_ids_that_are_not_a_list_of_integers(self):
+        ids = ''.join(str(entry.id) for entry in self.entries)
+        for payload in (
+            {'ids': ids},  # Una cadena se recorrería carácter a carácter
+            {'ids': {str(entry.id): True for entry in self.entries}},
+            {'ids': [True]},
+            {'ids': [1.5]},
+            {'ids': ['1a']},
+            {'ids': [None]},
+            # Fuera del rango de bigint: PostgreSQL y SQLite fallarían con un 500
+            {'ids': [99999999999999999999]},
+            {'ids': ['99999999999999999999']},
+            {'ids': [2 ** 63]},
+            {'ids': [0]},
+            {'ids': [-1]},
+            {'ids': ['9' * 5000]},
+            [self.entries[0].id],
+        ):
+            with self.subTest(payload=payload):
+                response = self._reveal(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn('password', response.content.decode())
+        self.assertEqual(RevealLog.objects.count(), 0)
+
+
+class RevealLogsPagingTests(TestCase):
+    def test_filters_survive_the_pagination_links(self):
+        user = User.objects.create_user('owner')
+        entry = PasswordEntry.objects.create(
+            user=user, site_name='site', site_url='https://example.com/', username='ana', encrypted_password='x'
+        )
+        RevealLog.objects.bulk_create([RevealLog(user=user, entry=entry) for _ in range(60)])
+        self.client.force_login(user)
+        # Una fecha ISO con zona lleva ':' y '+', y un '&' cortaría la consulta
+        filters = {'start': '2020-01-01T00:00+01:00', 'end': 'a&b=c'}
+        response = self.client.get('/logs/', filters)
+        self.assertContains(response, 'start=2020-01-01T00%3A00%2B01%3A00&end=a%26b%3Dc&before=')
+
+        next_url = re.search(r'href="(\?[^"]*before=[^"]*)"', response.content.decode()).group(1)
+        query = QueryDict(html.unescape(next_url)[1:])
+        self.assertEqual((query['start'], query['end']), (filters['start'], filters['end']))
+        self.assertNotIn('b', query)
+        self.assertEqual(len(self.client.get('/logs/' + html.unescape(next_url)).context['logs']), 10)
+
+
+class AuditWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.entry = PasswordEntry.objects.create(
+            user=self.user, site_name='site', site_url='https://example.com/', username='ana', encrypted_password='x'
+        )
+        # Sin hilo: los volcados se hacen aquí, dentro de la transacción del test
+        self.writer = AuditWriter(flush_size=2, flush_interval=60, max_queue=4)
+        self.enterContext(mock.patch.object(self.writer, '_ensure_thread'))
+
+    def _logs(self, n):
+        return [RevealLog(user=self.user, entry=self.entry, user_agent=f'agente{i}') for i in range(n)]
+
+    def _agents(self, logs):
+        return [log.user_agent for log in logs]
+
+    def test_buffers_until_flush(self):
+        first, second, third = self._logs(3)
+        self.writer.record(first)
+        self.assertFalse(self.writer._wakeup.is_set())
+        self.writer.record_many([second, third])
+        # Al llegar a flush_size se despierta al hilo
+        self.assertTrue(self.writer._wakeup.is_set())
+        self.assertFalse(RevealLog.objects.exists())
+        self.assertEqual(self.writer.flush(), 3)
+        self.assertEqual(RevealLog.objects.count(), 3)
+        self.assertEqual(self.writer.stats()['written'], 3)
+
+    def test_stop_flushes_what_is_pending(self):
+        self.writer.record_many(self._logs(3))
+        self.writer.stop()
+        self.assertEqual(RevealLog.objects.count(), 3)
+        self.assertEqual(self.writer.stats()['queue_depth'], 0)
+
+    def test_database_outage_requeues_the_batch(self):
+        logs = self._logs(3)
+        self.writer.record_many(logs)
+        with mock.patch.object(RevealLog.objects, 'bulk_create', side_effect=OperationalError('server closed the connection')), \
+                mock.patch.object(RevealLog, 'save') as save, self.assertLogs('vaul.audit', 'ERROR'):
+            self.assertEqual(self.writer.flush(), 0)
+            # stop() no se queda en bucle con la base caída
+            self.writer.stop()
+        save.assert_not_called()
+        self.assertEqual(self._agents(self.writer._queue), self._agents(logs))
+        self.assertEqual((self.writer.failed, self.writer.requeued), (0, 6))
+        self.writer.flush()
+        self.assertEqual(RevealLog.objects.count(), 3)
+
+    def test_requeue_is_bounded_by_max_queue(self):
+        failed_batch = self._logs(3)
+        # Mientras se volcaba llegaron más registros
+        self.writer.record_many(self._logs(2))
+        with self.assertLogs('vaul.audit', 'ERROR'):
+            self.writer._requeue(failed_batch)
+        self.assertEqual((len(self.writer._queue), self.writer.requeued, self.writer.failed), (4, 2, 1))
+        # Los más antiguos van delante
+        self.assertEqual(self._agents(self.writer._queue)[:2], ['agente0', 'agente1'])
+
+    def test_bad_row_is_dropped_alone(self):
+        logs = self._logs(3)
+        self.writer.record_many(logs)
+        real_save = RevealLog.save
+
+        def save(log, *args, **kwargs):
+            if log is logs[1]:
+                raise IntegrityError('entrada eliminada')
+            return real_save(log, *args, **kwargs)
+
+        with mock.patch.object(RevealLog.objects, 'bulk_create', side_effect=IntegrityError), \
+                mock.patch.object(RevealLog, 'save', save), self.assertLogs('vaul.audit', 'ERROR'):
+            self.assertEqual(self.writer.flush(), 3)
+        self.assertEqual((self.writer.written, self.writer.failed), (2, 1))
+
+    def test_writer_thread_refreshes_its_connection_before_each_flush(self):
+        calls = []
+
+        def flush():
+            calls.append('flush')
+            self.writer._stopped = True
+
+        self.writer.flush_interval = 0
+        with mock.patch('vaul.audit.close_old_connections', side_effect=lambda: calls.append('refresh')), \
+                mock.patch.object(self.writer, 'flush', flush), mock.patch('vaul.audit.connection'):
+            self.writer._run()
+        self.assertEqual(calls, ['refresh', 'flush'])
+
+
+@override_settings(
+    THROTTLE_ENABLED=True,
+    THROTTLE_LOGIN_IP_RATE='100/300',
+    THROTTLE_LOGIN_USER_RATE='3/900',
+    THROTTLE_BACKOFF_BASE=30,
+    THROTTLE_BACKOFF_MAX=3600,
+    THROTTLE_TRUSTED_PROXIES=[],
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        User.objects.create_user('victima', password='Correcta123')
+
+    def _login(self, password, ip='203.0.113.1', **extra):
+        return self.client.post('/login/', {'username': 'victima', 'password': password}, REMOTE_ADDR=ip, **extra)
+
+    def test_lock_returns_429_with_retry_after_and_skips_the_hasher(self):
+        for _ in range(3):
+            self.assertEqual(self._login('mala').status_code, 200)
+        with mock.patch('vaul.views.authenticate') as authenticate:
+            response = self._login('mala')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '30')
+            # Mientras dura el bloqueo, ni siquiera la contraseña correcta llega al hasher
+            self.assertEqual(self._login('Correcta123').status_code, 429)
+        authenticate.assert_not_called()
+
+    def test_backoff_doubles_on_each_consecutive_lock(self):
+        now = [1_000_000.0]
+        with mock.patch('vaul.throttling.time.time', side_effect=lambda: now[0]):
+            for _ in range(3):
+                self._login('mala')
+            self.assertEqual(self._login('mala')['Retry-After'], '30')
+            now[0] += 31
+            self.assertEqual(self._login('mala')['Retry-After'], '60')
+            now[0] += 61
+            self.assertEqual(self._login('mala')['Retry-After'], '120')
+
+    def test_success_resets_the_user_counter(self):
+        for _ in range(2):
+            self._login('mala')
+        self.assertEqual(self._login('Correcta123').status_code, 302)
+        self.client.logout()
+        for _ in range(3):
+            self.assertEqual(self._login('mala').status_code, 200)
+
+    def test_lock_from_one_ip_does_not_lock_the_account_elsewhere(self):
+        for _ in range(4):
+            self._login('mala', ip='198.51.100.7')
+        self.assertEqual(self._login('mala', ip='198.51.100.7').status_code, 429)
+        self.assertEqual(self._login('Correcta123', ip='203.0.113.1').status_code, 302)
+
+    def test_client_ip_comes_from_forwarded_for_behind_a_trusted_proxy(self):
+        with override_settings(THROTTLE_TRUSTED_PROXIES=['127.0.0.1']):
+            for _ in range(4):
+                self._login('mala', ip='127.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.7')
+            self.assertEqual(
+                self._login('mala', ip='127.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.7').status_code, 429
+            )
+            # Otro cliente detrás del mismo proxy no comparte el bloqueo; lo que el cliente
+            # añada a la izquierda de la cabecera no cuenta
+            response = self._login('Correcta123', ip='127.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.7, 203.0.113.9')
+            self.assertEqual(response.status_code, 302)
+        # Sin proxy de confianza la cabecera se ignora
+        self.client.logout()
+        for _ in range(3):
+            self._login('mala', ip='192.0.2.1', HTTP_X_FORWARDED_FOR='10.0.0.1')
+        self.assertEqual(self._login('mala', ip='192.0.2.1', HTTP_X_FORWARDED_FOR='10.0.0.2').status_code, 429)
+
+
+REPLICA = 'replica_test'
+
+# Una segunda base SQLite hace de réplica: lo que se escribe en el primario no llega a ella.
+# Se declara al importar para que el runner cree y migre su base de pruebas junto a la de default.
+if REPLICA not in connections:
+    connections.settings[REPLICA] = connections.configure_settings({
+        DEFAULT_DB_ALIAS: {},
+        REPLICA: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(tempfile.gettempdir(), 'vaul_replica.sqlite3')},
+    })[REPLICA]
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], DB_REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TransactionTestCase):
+    # TransactionTestCase: dentro del atomic de TestCase todas las lecturas irían al primario
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        VaultStats.objects.create(user=self.user, last_change_seq=7)
+        self.client.force_login(self.user)
+
+    def _sync_token(self):
+        response = self.client.get('/api/v1/sync/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['token'], response
+
+    def test_marked_view_reads_from_the_replica(self):
+        # La réplica todavía no tiene las estadísticas del usuario
+        token, response = self._sync_token()
+        self.assertEqual(token, '0')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_the_browser_to_the_primary(self):
+        response = self.client.post('/add/', {
+            'site_name': 'Ejemplo', 'site_url': 'https://example.com/', 'username': 'ana',
+            'password': 'S3creto!largo', 'category': 'work',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        self.assertTrue(response.cookies[PIN_COOKIE]['httponly'])
+        # El siguiente sondeo lleva la cookie y ve su propia escritura
+        token, _ = self._sync_token()
+        self.assertEqual(token, '8')
+        self.assertFalse(PasswordEntry.objects.using(REPLICA).exists())
+
+    def test_pin_cookie_sends_reads_to_the_primary(self):
+        self.client.cookies[PIN_COOKIE] = '1'
+        token, _ = self._sync_token()
+        self.assertEqual(token, '7')
+
+    def test_router_decisions(self):
+        # Fuera de una petición no se decide nada: Django usa el primario
+        self.assertEqual(router.db_for_read(PasswordEntry), DEFAULT_DB_ALIAS)
+        state = _RoutingState(pinned=False)
+        state.replica = REPLICA
+        token = _state.set(state)
+        try:
+            self.assertEqual(router.db_for_read(PasswordEntry), REPLICA)
+            # Sesiones y usuarios siempre en el primario
+            self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(PasswordEntry), DEFAULT_DB_ALIAS)
+            self.assertEqual(router.db_for_write(PasswordEntry), DEFAULT_DB_ALIAS)
+            self.assertTrue(state.wrote)
+            self.assertEqual(router.db_for_read(PasswordEntry), DEFAULT_DB_ALIAS)
+        finally:
+            _state.reset(token)
+        self.assertFalse(router.allow_migrate(REPLICA, 'vaul'))
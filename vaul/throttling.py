@@ -0,0 +1,130 @@
+"""Límite de intentos de login y registro, con contadores en la caché de Django.
+
+Cada regla es una ventana deslizante aproximada: se guardan el contador de la ventana
+actual y el de la anterior, y el de la anterior pesa en proporción a lo que aún solapa.
+Los contadores son `incr` atómicos de la caché THROTTLE_CACHE, así que sirve igual
+LocMemCache (límite por proceso) que Redis o Memcached (límite compartido).
+
+Al pasar el límite se bloquea durante THROTTLE_BACKOFF_BASE segundos, que se duplican
+con cada bloqueo seguido hasta THROTTLE_BACKOFF_MAX. Mientras dura el bloqueo los
+intentos se rechazan con una sola lectura de caché, sin llegar al hasher.
+
+La regla por usuario cuenta los intentos de ese usuario desde cada IP: si contara el
+usuario a secas, cualquiera podría mantener bloqueada una cuenta ajena.
+"""
+import hashlib
+import ipaddress
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """'20/300' -> (20 intentos, 300 segundos)."""
+    limit, _, seconds = rate.partition('/')
+    return int(limit), int(seconds)
+
+
+def _trusted(ip: str, proxies: list) -> bool:
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def client_ip(request) -> str:
+    """IP del cliente. Detrás de un proxy de THROTTLE_TRUSTED_PROXIES (IPs o redes) se toma de
+    X-Forwarded-For: la primera dirección, empezando por la derecha, que no sea de un proxy
+    de confianza (las de la izquierda las puede escribir el propio cliente)."""
+    ip = request.META.get('REMOTE_ADDR') or 'desconocida'
+    proxies = getattr(settings, 'THROTTLE_TRUSTED_PROXIES', [])
+    if not proxies or not _trusted(ip, proxies):
+        return ip
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    for hop in reversed(forwarded):
+        if not _trusted(hop, proxies):
+            return hop
+    return forwarded[0] if forwarded else ip
+
+
+class Throttle:
+    """Intentos de un tipo (`scope`) por IP y, si hay `user_rate`, por nombre de usuario e IP.
+
+    Las tasas son nombres de ajustes con el formato de `parse_rate`; se leen en cada
+    llamada para que se puedan cambiar con override_settings.
+    """
+
+    def __init__(self, scope: str, ip_rate: str, user_rate: str = None):
+        self.scope = scope
+        self.ip_rate = ip_rate
+        self.user_rate = user_rate
+
+    def _rules(self, request, username: str) -> list[tuple[str, int, int]]:
+        ip = client_ip(request)
+        rules = [(self._key('ip', ip), *parse_rate(getattr(settings, self.ip_rate)))]
+        if self.user_rate and username:
+            rules.append((self._key('user', f'{username.lower()}|{ip}'), *parse_rate(getattr(settings, self.user_rate))))
+        return rules
+
+    def _key(self, kind: str, ident: str) -> str:
+        # Hash: las claves de Memcached no admiten espacios ni longitudes arbitrarias
+        digest = hashlib.sha256(ident.encode()).hexdigest()[:32]
+        return f'throttle:{self.scope}:{kind}:{digest}'
+
+    def attempt(self, request, username: str = '') -> int:
+        """Cuenta un intento. Devuelve 0 si se permite o los segundos que quedan de bloqueo."""
+        if not getattr(settings, 'THROTTLE_ENABLED', True):
+            return 0
+        cache = caches[settings.THROTTLE_CACHE]
+        rules = self._rules(request, username)
+        now = time.time()
+
+        locks = cache.get_many([f'{key}:lock' for key, _, _ in rules])
+        if locks:
+            return max(1, math.ceil(max(locks.values()) - now))
+
+        wait = 0
+        for key, limit, window in rules:
+            bucket = int(now // window)
+            current = self._incr(cache, f'{key}:{bucket}', window * 2)
+            previous = cache.get(f'{key}:{bucket - 1}', 0)
+            overlap = 1 - (now % window) / window
+            if current + previous * overlap > limit:
+                wait = max(wait, self._lock(cache, key, now))
+        return wait
+
+    def reset(self, request, username: str = '') -> None:
+        """Olvida los intentos del usuario desde esta IP (p. ej. tras un login correcto); los
+        de la IP se mantienen."""
+        if not (self.user_rate and username):
+            return
+        cache = caches[settings.THROTTLE_CACHE]
+        key, _, window = self._rules(request, username)[1]
+        bucket = int(time.time() // window)
+        cache.delete_many([f'{key}:{bucket}', f'{key}:{bucket - 1}', f'{key}:strikes', f'{key}:lock'])
+
+    @staticmethod
+    def _incr(cache, key: str, timeout: int) -> int:
+        cache.add(key, 0, timeout)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expiró entre add e incr
+            cache.set(key, 1, timeout)
+            return 1
+
+    @staticmethod
+    def _lock(cache, key: str, now: float) -> int:
+        base = settings.THROTTLE_BACKOFF_BASE
+        cap = settings.THROTTLE_BACKOFF_MAX
+        strikes = Throttle._incr(cache, f'{key}:strikes', cap * 2)
+        delay = min(cap, base * 2 ** (strikes - 1))
+        cache.set(f'{key}:lock', now + delay, delay)
+        return delay
+
+
+login_throttle = Throttle('login', 'THROTTLE_LOGIN_IP_RATE', 'THROTTLE_LOGIN_USER_RATE')
+register_throttle = Throttle('register', 'THROTTLE_REGISTER_IP_RATE')
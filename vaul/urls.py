@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home_view, name='home'),
@@ -9,10 +9,16 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('add/', views.add_password, name='add_password'),
     path('reveal/<int:entry_id>/', views.reveal_password, name='reveal_password'),
+    path('reveal/batch/', views.reveal_passwords, name='reveal_passwords'),
     path('edit/<int:entry_id>/', views.edit_password, name='edit_password'),
     path('delete/<int:entry_id>/', views.delete_password, name='delete_password'),
     path('help/', views.help_view, name='help'),
     path('logs/', views.reveal_logs, name='reveal_logs'),
+    path('logs/audit-stats/', views.audit_stats, name='audit_stats'),
     path('export/', views.export_passwords, name='export_passwords'),
     path('import/', views.import_passwords, name='import_passwords'),
+    path('export/job/', views.export_job, name='export_job'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+    path('api/v1/sync/', api.sync, name='api_sync'),
 ]
@@ -1,14 +1,213 @@
-from cryptography.fernet import Fernet
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial, wraps
+from typing import Iterable, NamedTuple, Optional
+
+from cryptography.fernet import Fernet, MultiFernet
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class CryptoResult(NamedTuple):
+    """Resultado por elemento de las operaciones por lotes."""
+    value: Optional[str]
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class CryptoCounter:
+    """Llamadas de cifrado/descifrado y tiempo empleado dentro de un contexto (p. ej. una petición)."""
+
+    def __init__(self):
+        self.encrypts = 0
+        self.decrypts = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, seconds: float) -> None:
+        # Los lotes paralelos suman desde varios hilos
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+            self.seconds += seconds
+
+
+_crypto_counter: contextvars.ContextVar[Optional[CryptoCounter]] = contextvars.ContextVar(
+    'vaul_crypto_counter', default=None
+)
+
+
+@contextmanager
+def count_crypto():
+    """Cuenta las operaciones de CryptoEngine hechas dentro del bloque (incluidos hilos de run_crypto)."""
+    counter = CryptoCounter()
+    token = _crypto_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _crypto_counter.reset(token)
+
+
+def _counted(kind: str):
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, value):
+            counter = _crypto_counter.get()
+            if counter is None:
+                return method(self, value)
+            started = time.perf_counter()
+            try:
+                return method(self, value)
+            finally:
+                counter.add(kind, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class CryptoEngine:
+    """Motor de cifrado del proceso: construye las claves una sola vez.
+
+    La primera clave de `keys` cifra; todas se prueban al descifrar (MultiFernet),
+    lo que permite rotar claves sin dejar entradas ilegibles.
+    """
+
+    def __init__(self, keys: list[str], max_workers: int = 1, parallel_threshold: int = 512):
+        if not keys:
+            raise ValueError('Se necesita al menos una clave Fernet.')
+        fernets = [Fernet(key.encode()) for key in keys]
+        self._fernet = fernets[0] if len(fernets) == 1 else MultiFernet(fernets)
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+
+    @_counted('encrypts')
+    def encrypt(self, value: str) -> str:
+        return self._fernet.encrypt(value.encode()).decode()
+
+    @_counted('decrypts')
+    def decrypt(self, token: str) -> str:
+        return self._fernet.decrypt(token.encode()).decode()
+
+    @_counted('encrypts')
+    def encrypt_bytes(self, data: bytes) -> bytes:
+        return self._fernet.encrypt(data)
+
+    @_counted('decrypts')
+    def decrypt_bytes(self, token: bytes) -> bytes:
+        return self._fernet.decrypt(token)
+
+    def rotate(self, token: str) -> str:
+        """Re-cifra un token con la clave principal."""
+        if isinstance(self._fernet, MultiFernet):
+            return self._fernet.rotate(token.encode()).decode()
+        return self.encrypt(self.decrypt(token))
+
+    def encrypt_many(self, values: Iterable[str]) -> list[CryptoResult]:
+        return self._run_many(self.encrypt, values)
+
+    def decrypt_many(self, tokens: Iterable[str]) -> list[CryptoResult]:
+        return self._run_many(self.decrypt, tokens)
+
+    def _run_many(self, func, items: Iterable[str]) -> list[CryptoResult]:
+        items = list(items)
+
+        def run_one(item: str) -> CryptoResult:
+            try:
+                return CryptoResult(func(item))
+            except Exception as e:
+                return CryptoResult(None, e.__class__.__name__)
+
+        # Los lotes pequeños no compensan el coste de repartir el trabajo entre hilos
+        if len(items) < self.parallel_threshold or self.max_workers <= 1:
+            return [run_one(item) for item in items]
+        chunk_size = -(-len(items) // self.max_workers)
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        # Cada trozo se ejecuta en una copia del contexto para que count_crypto lo vea
+        contexts = [contextvars.copy_context() for _ in chunks]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = pool.map(
+                lambda ctx, chunk: ctx.run(lambda: [run_one(item) for item in chunk]), contexts, chunks
+            )
+        return [result for chunk in results for result in chunk]
+
+
+_engine: Optional[CryptoEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> CryptoEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                keys = list(getattr(settings, 'FERNET_KEYS', None) or [settings.FERNET_KEY])
+                _engine = CryptoEngine(
+                    keys,
+                    max_workers=getattr(settings, 'CRYPTO_MAX_WORKERS', 1),
+                    parallel_threshold=getattr(settings, 'CRYPTO_PARALLEL_THRESHOLD', 512),
+                )
+    return _engine
+
+
+_async_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_async_executor() -> ThreadPoolExecutor:
+    global _async_executor
+    if _async_executor is None:
+        with _engine_lock:
+            if _async_executor is None:
+                _async_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CRYPTO_ASYNC_WORKERS', 4),
+                    thread_name_prefix='vaul-crypto',
+                )
+    return _async_executor
+
+
+async def run_crypto(func, *args):
+    """Ejecuta `func(*args)` en un pool de hilos acotado para no bloquear el bucle de eventos.
+
+    El tamaño del pool (CRYPTO_ASYNC_WORKERS) limita cuántos descifrados se hacen a la vez;
+    el resto espera en la cola del pool sin ocupar el bucle.
+    """
+    loop = asyncio.get_running_loop()
+    # run_in_executor no propaga el contexto: se copia para que count_crypto siga contando
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_get_async_executor(), partial(ctx.run, func, *args))
+
+
+@receiver(setting_changed)
+def _reset_engine(setting, **kwargs):
+    global _engine, _async_executor
+    if setting in ('FERNET_KEY', 'FERNET_KEYS', 'CRYPTO_MAX_WORKERS', 'CRYPTO_PARALLEL_THRESHOLD'):
+        _engine = None
+    if setting == 'CRYPTO_ASYNC_WORKERS' and _async_executor is not None:
+        _async_executor.shutdown(wait=False)
+        _async_executor = None
 
-def _get_fernet() -> Fernet:
-    key: str = settings.FERNET_KEY
-    return Fernet(key.encode())
 
 def encrypt_password(password: str) -> str:
-    fernet = _get_fernet()
-    return fernet.encrypt(password.encode()).decode()
+    return get_engine().encrypt(password)
 
 def decrypt_password(encrypted_password: str) -> str:
-    fernet = _get_fernet()
-    return fernet.decrypt(encrypted_password.encode()).decode()
\ No newline at end of file
+    return get_engine().decrypt(encrypted_password)
+
+def password_fingerprint(password: str) -> str:
+    """HMAC-SHA256 de la contraseña en claro; permite detectar duplicados sin descifrar."""
+    key: str = settings.PASSWORD_FINGERPRINT_KEY
+    return hmac.new(key.encode(), password.encode(), hashlib.sha256).hexdigest()
+
+def password_strength(password: str) -> str:
+    """Clasifica la contraseña con la misma regla que usaba el dashboard."""
+    # Débil: menos de 8 caracteres o solo números/letras
+    if len(password) < 8 or password.isdigit() or password.isalpha():
+        return 'weak'
+    return 'ok'
@@ -1,22 +1,49 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponse
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponse, StreamingHttpResponse
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.utils import timezone
-from django.db.models import Q
-from datetime import datetime, time
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef
+from datetime import datetime, time, timedelta
+from itertools import islice
+from pathlib import Path
 import csv
-from .models import PasswordEntry, RevealLog
-from .utils import encrypt_password, decrypt_password
+import json
+from password_manager.compression import no_compression
+from .models import EntryTombstone, ImportExportJob, PasswordEntry, RevealLog
+from .audit import arecord_reveal, get_audit_writer, record_reveals
+from .exports import iter_export
+from .imports import ImportFormatError, import_entries, is_ndjson
+from .jobs import enqueue_export, enqueue_import, read_encrypted
+from .pagination import akeyset_page, aoffset_page
+from .replicas import read_from_replica
+from .search import index_entries, search_entries
+from .stats import aget_stats_row, apply_delta, reserve_change_seq, stats_summary
+from .throttling import login_throttle, register_throttle
+from .utils import decrypt_password, get_engine, run_crypto
 
 def home_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
     return render(request, 'vaul/home.html')
 
+def _throttled(request, template, username, wait):
+    messages.error(request, f'Demasiados intentos. Vuelve a intentarlo en {wait} segundos.')
+    response = render(request, template, {'username_value': username}, status=429)
+    response['Retry-After'] = str(wait)
+    return response
+
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
@@ -27,9 +54,15 @@ def login_view(request):
         if not username or not password:
             messages.error(request, 'Por favor, ingresa tu usuario y contraseña.')
             return render(request, 'vaul/login.html', {'username_value': username})
-        
+
+        # Antes de authenticate: cada intento rechazado aquí se ahorra el PBKDF2
+        wait = login_throttle.attempt(request, username)
+        if wait:
+            return _throttled(request, 'vaul/login.html', username, wait)
+
         user = authenticate(username=username, password=password)
         if user:
+            login_throttle.reset(request, username)
             login(request, user)
             messages.success(request, f'¡Bienvenido, {user.username}!')
             return redirect('dashboard')
@@ -46,6 +79,10 @@ def register_view(request):
         password = request.POST.get('password', '').strip()
         confirm  = request.POST.get('confirm_password', '').strip()
 
+        wait = register_throttle.attempt(request)
+        if wait:
+            return _throttled(request, 'vaul/register.html', username, wait)
+
         if not username:
             messages.error(request, 'Debes ingresar un nombre de usuario.')
             return render(request, 'vaul/register.html', {'username_value': username})
@@ -77,74 +114,114 @@ def logout_view(request):
         logout(request)
     return redirect('home')
 
+DASHBOARD_PAGE_SIZE = 12  # 12 entradas por página (3x3 grid)
+CATEGORY_LABELS = dict(PasswordEntry.CATEGORY_CHOICES)
+
+def prepare_cards(entries):
+    """Precalcula lo que pinta cada tarjeta para que la plantilla no busque en listas
+    ni recorra las categorías. `is_duplicate` viene anotado en la consulta."""
+    for entry in entries:
+        entry.is_weak = entry.strength == 'weak'
+        entry.category_label = CATEGORY_LABELS.get(entry.category, entry.category)
+        entry.notes_preview = Truncator(entry.notes).words(15) if entry.notes else ''
+    return entries
+
+async def _stats_panel(user) -> tuple:
+    """Panel de estadísticas y alertas, cacheado por usuario.
+
+    La clave incluye la secuencia de cambios y la fecha de los contadores: cualquier
+    escritura de entradas la cambia, así que el fragmento antiguo deja de usarse.
+    """
+    stats = await aget_stats_row(user)
+    total_entries, category_stats = stats_summary(stats)
+    key = f'vaul:dashboard-stats:{user.id}:{stats.last_change_seq}:{stats.updated_at.timestamp()}'
+    panel = await cache.aget(key)
+    if panel is None:
+        # Índice de salud (sin descifrar)
+        user_entries = PasswordEntry.objects.filter(user=user)
+        duplicated_fingerprints = (
+            user_entries.exclude(password_fingerprint='')
+            .order_by()
+            .values('password_fingerprint')
+            .annotate(n=Count('id'))
+            .filter(n__gt=1)
+            .values('password_fingerprint')
+        )
+        panel = render_to_string('vaul/dashboard_stats.html', {
+            'total_entries': total_entries,
+            'category_rows': [(CATEGORY_LABELS[category], n) for category, n in category_stats.items() if n],
+            'weak_count': await user_entries.filter(strength='weak').acount(),
+            'duplicate_count': await user_entries.filter(password_fingerprint__in=duplicated_fingerprints).acount(),
+        })
+        await cache.aset(key, panel, settings.VAUL_DASHBOARD_CACHE_SECONDS)
+    return panel, total_entries, category_stats
+
 @login_required
-def dashboard(request):
-    entries_list = PasswordEntry.objects.filter(user=request.user).order_by('-id')
+@read_from_replica
+async def dashboard(request):
+    # Vista async: el usuario se resuelve una vez y las consultas usan el ORM asíncrono
+    request.user = user = await request.auser()
+    entries_list = PasswordEntry.objects.filter(user=user).order_by('-id')
     
-    # Estadísticas
-    total_entries = PasswordEntry.objects.filter(user=request.user).count()
-    category_stats = {}
-    for choice in PasswordEntry.CATEGORY_CHOICES:
-        category_stats[choice[0]] = PasswordEntry.objects.filter(user=request.user, category=choice[0]).count()
-    
-    # Detección de contraseñas duplicadas y débiles
-    all_entries = PasswordEntry.objects.filter(user=request.user)
-    password_hashes = {}
-    weak_passwords = []
-    duplicate_passwords = []
-    
-    for entry in all_entries:
-        try:
-            decrypted = decrypt_password(entry.encrypted_password)
-            # Detectar contraseñas débiles (menos de 8 caracteres o solo números/letras)
-            if len(decrypted) < 8 or (decrypted.isdigit() or decrypted.isalpha()):
-                weak_passwords.append(entry.id)
-            
-            # Detectar duplicados
-            if decrypted in password_hashes:
-                if entry.id not in duplicate_passwords:
-                    duplicate_passwords.append(entry.id)
-                if password_hashes[decrypted] not in duplicate_passwords:
-                    duplicate_passwords.append(password_hashes[decrypted])
-            else:
-                password_hashes[decrypted] = entry.id
-        except:
-            pass  # Si no se puede descifrar, omitir
-    
-    # Búsqueda
-    search_query = request.GET.get('q', '').strip()
-    if search_query:
-        entries_list = entries_list.filter(
-            Q(site_name__icontains=search_query) |
-            Q(site_url__icontains=search_query) |
-            Q(username__icontains=search_query)
-        )
+    # Estadísticas y alertas (contadores de VaultStats, fragmento cacheado)
+    stats_panel, total_entries, category_stats = await _stats_panel(user)
     
     # Filtro por categoría
     category_filter = request.GET.get('category', '').strip()
     if category_filter:
         entries_list = entries_list.filter(category=category_filter)
     
-    paginator = Paginator(entries_list, 12)  # 12 entradas por página (3x3 grid)
+    # Búsqueda (ordenada por relevancia; ver vaul.search)
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        entries_list = search_entries(user, search_query, entries_list)
+    
+    # Duplicada = otra entrada del usuario con la misma huella (índice user + huella)
+    entries_list = entries_list.annotate(is_duplicate=Exists(
+        PasswordEntry.objects.filter(user=user, password_fingerprint=OuterRef('password_fingerprint'))
+        .exclude(password_fingerprint='')
+        .exclude(pk=OuterRef('pk'))
+    ))
     
-    page = request.GET.get('page')
-    try:
-        entries = paginator.page(page)
-    except PageNotAnInteger:
-        # Si la página no es un entero, mostrar la primera página
-        entries = paginator.page(1)
-    except EmptyPage:
-        # Si la página está fuera de rango, mostrar la última página
-        entries = paginator.page(paginator.num_pages)
+    # Paginación por cursor (sin COUNT ni OFFSET). Con búsqueda se ordena por relevancia.
+    keys = ('rank', 'id') if search_query else ('id',)
+    converters = {'rank': float} if search_query else None
+    page = request.GET.get('page', '')
+    if page.isdigit() and not (request.GET.get('before') or request.GET.get('after')):
+        # Enlaces antiguos ?page=N
+        entries = await aoffset_page(entries_list, keys, DASHBOARD_PAGE_SIZE, int(page))
+    else:
+        entries = await akeyset_page(
+            entries_list,
+            keys,
+            DASHBOARD_PAGE_SIZE,
+            before=request.GET.get('before', ''),
+            after=request.GET.get('after', ''),
+            last=request.GET.get('last') == '1',
+            converters=converters,
+        )
+    prepare_cards(entries)
+    
+    # El total sale de las estadísticas precalculadas; con búsqueda no se cuenta
+    if search_query:
+        filtered_total = None
+    elif category_filter:
+        filtered_total = category_stats.get(category_filter, 0)
+    else:
+        filtered_total = total_entries
+    
+    jobs = [job async for job in ImportExportJob.objects.filter(
+        user=user,
+        created_at__gte=timezone.now() - timedelta(hours=settings.VAUL_JOBS_RETENTION_HOURS),
+    )[:5]]
     
     return render(request, 'vaul/dashboard.html', {
         'entries': entries,
+        'filtered_total': filtered_total,
+        'jobs': jobs,
         'search_query': search_query,
         'category_filter': category_filter,
-        'total_entries': total_entries,
-        'category_stats': category_stats,
-        'weak_passwords': weak_passwords,
-        'duplicate_passwords': duplicate_passwords,
+        'stats_panel': mark_safe(stats_panel),
         'category_choices': PasswordEntry.CATEGORY_CHOICES,
     })
 
@@ -176,16 +253,29 @@ def add_password(request):
                 'notes': notes,
             })
 
-        encrypted = encrypt_password(password)
-        PasswordEntry.objects.create(
+        entry = PasswordEntry(
             user=request.user,
             site_name=site_name,
             site_url=site_url,
             username=username,
-            encrypted_password=encrypted,
             category=category,
             notes=notes[:500] if notes else None
         )
+        entry.set_password(password)
+        try:
+            with transaction.atomic():
+                entry.change_seq = reserve_change_seq(request.user)
+                entry.save()
+                apply_delta(request.user, {category: 1})
+                index_entries([entry])
+        except IntegrityError:
+            messages.error(request, 'Ya tienes una entrada para ese sitio, URL y usuario.')
+            return render(request, 'vaul/add_password.html', {
+                'site_name': site_name,
+                'site_url': site_url,
+                'username': username,
+                'notes': notes,
+            })
         messages.success(request, 'Contraseña guardada correctamente.')
         return redirect('dashboard')
     return render(request, 'vaul/add_password.html')
@@ -206,11 +296,21 @@ def edit_password(request, entry_id: int):
         entry.site_name = site_name or entry.site_name
         entry.site_url = site_url or entry.site_url
         entry.username = username or entry.username
+        previous_category = entry.category
         entry.category = category
         entry.notes = notes[:500] if notes else None
         if new_password:
-            entry.encrypted_password = encrypt_password(new_password)
-        entry.save()
+            entry.set_password(new_password)
+        try:
+            with transaction.atomic():
+                entry.change_seq = reserve_change_seq(request.user)
+                entry.save()
+                if category != previous_category:
+                    apply_delta(request.user, {previous_category: -1, category: 1})
+                index_entries([entry])
+        except IntegrityError:
+            messages.error(request, 'Ya tienes otra entrada para ese sitio, URL y usuario.')
+            return render(request, 'vaul/edit_password.html', {'entry': entry})
         messages.success(request, 'Entrada actualizada correctamente.')
         return redirect('dashboard')
     # No enviamos la contraseña en claro. Mostramos campos para reemplazar.
@@ -223,7 +323,12 @@ def delete_password(request, entry_id: int):
     entry = get_object_or_404(PasswordEntry, id=entry_id)
     if entry.user_id != request.user.id:
         return HttpResponseForbidden('No autorizado')
-    entry.delete()
+    with transaction.atomic():
+        EntryTombstone.objects.create(
+            user=request.user, entry_id=entry.id, change_seq=reserve_change_seq(request.user),
+        )
+        entry.delete()
+        apply_delta(request.user, {entry.category: -1})
     messages.success(request, 'Entrada eliminada correctamente.')
     return redirect('dashboard')
 
@@ -231,25 +336,108 @@ def help_view(request):
     return render(request, 'vaul/help.html')
 
 @login_required
-def reveal_password(request, entry_id: int):
+@no_compression
+async def reveal_password(request, entry_id: int):
     if request.method != 'POST':
         return HttpResponseForbidden('Método no permitido')
-    entry = get_object_or_404(PasswordEntry, id=entry_id)
-    if entry.user_id != request.user.id:
+    user = await request.auser()
+    entry = await aget_object_or_404(PasswordEntry, id=entry_id)
+    if entry.user_id != user.id:
         return HttpResponseForbidden('No autorizado')
     try:
-        decrypted = decrypt_password(entry.encrypted_password)
-        # Log de auditoría
+        # El descifrado va al pool acotado; el bucle de eventos sigue atendiendo peticiones
+        decrypted = await run_crypto(decrypt_password, entry.encrypted_password)
+        # Log de auditoría (síncrono o diferido según VAUL_AUDIT_MODE)
         ip = request.META.get('REMOTE_ADDR')
         ua = request.META.get('HTTP_USER_AGENT', '')
-        RevealLog.objects.create(user=request.user, entry=entry, ip_address=ip, user_agent=ua)
+        await arecord_reveal(user, entry, ip, ua)
         return JsonResponse({'password': decrypted})
     except Exception:
         return JsonResponse({'error': 'No se pudo descifrar'}, status=400)
 
+def _valid_entry_id(value) -> bool:
+    """Entero (o cadena de dígitos) dentro del rango de una clave primaria bigint."""
+    if isinstance(value, str) and value.isascii() and value.isdigit() and len(value) <= 19:
+        value = int(value)
+    return isinstance(value, int) and not isinstance(value, bool) and 0 < value < 2 ** 63
+
 @login_required
-def reveal_logs(request):
-    logs = RevealLog.objects.filter(user=request.user).select_related('entry')
+@no_compression
+def reveal_passwords(request):
+    """Revela varias entradas en una petición: {"ids": [...]} -> {"results": {id: {...}}}.
+
+    Una consulta para comprobar la propiedad, un descifrado por lotes y una sola
+    inserción de auditoría. Los ids ajenos o inexistentes reciben el mismo error.
+    """
+    if request.method != 'POST':
+        return HttpResponseForbidden('Método no permitido')
+    try:
+        ids = json.loads(request.body or b'{}').get('ids')
+    except (ValueError, AttributeError):
+        ids = None
+    # Solo una lista de ids: una cadena o un objeto se recorrerían carácter a carácter
+    # o por sus claves
+    if not isinstance(ids, list) or not all(_valid_entry_id(entry_id) for entry_id in ids):
+        return JsonResponse({'error': 'Se esperaba {"ids": [...]}'}, status=400)
+    ids = list(dict.fromkeys(int(entry_id) for entry_id in ids))
+    if not ids:
+        return JsonResponse({'error': 'No se indicó ninguna entrada'}, status=400)
+    if len(ids) > settings.VAUL_REVEAL_BATCH_MAX:
+        return JsonResponse(
+            {'error': f'Como máximo {settings.VAUL_REVEAL_BATCH_MAX} entradas por petición'}, status=400
+        )
+
+    entries = list(
+        PasswordEntry.objects.filter(id__in=ids, user=request.user).order_by().only('id', 'encrypted_password')
+    )
+    decrypted = get_engine().decrypt_many(entry.encrypted_password for entry in entries)
+    results = {str(entry_id): {'error': 'No encontrada'} for entry_id in ids}
+    revealed = []
+    for entry, result in zip(entries, decrypted):
+        if result.ok:
+            results[str(entry.id)] = {'password': result.value}
+            revealed.append(entry)
+        else:
+            results[str(entry.id)] = {'error': 'No se pudo descifrar'}
+    record_reveals(
+        request.user, revealed, request.META.get('REMOTE_ADDR'), request.META.get('HTTP_USER_AGENT', '')
+    )
+    return JsonResponse({'results': results})
+
+REVEAL_LOGS_PER_PAGE = 50
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: devuelve cada línea en vez de guardarla."""
+    def write(self, value):
+        return value
+
+def _streaming_content(request, iterator, batch_size=100):
+    """Contenido de un StreamingHttpResponse a partir de un iterador síncrono.
+
+    Bajo ASGI Django acumularía en memoria un iterador síncrono: se recorre por lotes
+    en un hilo y se entrega con un iterador async.
+    """
+    if not isinstance(request, ASGIRequest):
+        return iterator
+    iterator = iter(iterator)
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)))
+
+    async def chunks():
+        try:
+            while batch := await next_batch():
+                for chunk in batch:
+                    yield chunk
+        finally:
+            # Si el cliente se desconecta, el generador libera el cursor o el archivo
+            if hasattr(iterator, 'close'):
+                await sync_to_async(iterator.close)()
+    return chunks()
+
+@login_required
+@read_from_replica
+async def reveal_logs(request):
+    request.user = user = await request.auser()
+    logs = RevealLog.objects.filter(user=user).select_related('entry')
 
     start_str = request.GET.get('start', '').strip()
     end_str = request.GET.get('end', '').strip()
@@ -273,68 +461,75 @@ def reveal_logs(request):
         logs = logs.filter(revealed_at__lte=end_dt)
 
     if request.GET.get('format') == 'csv':
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="reveal_logs.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['Entrada', 'Usuario', 'Revelado en', 'IP', 'User-Agent'])
-        for log in logs:
-            writer.writerow([
+        logs = logs.only(
+            'revealed_at', 'ip_address', 'user_agent', 'entry__site_name', 'entry__username'
+        ).order_by('-revealed_at', '-id')
+        username = user.username
+        writer = csv.writer(_Echo())
+
+        header = ['Entrada', 'Usuario', 'Revelado en', 'IP', 'User-Agent']
+
+        def row(log):
+            return writer.writerow([
                 f"{log.entry.site_name} ({log.entry.username})",
-                request.user.username,
+                username,
                 timezone.localtime(log.revealed_at).strftime('%Y-%m-%d %H:%M:%S'),
                 log.ip_address or '',
                 (log.user_agent or '')[:500]
             ])
+
+        # Django acumula en memoria los iteradores del tipo contrario al del servidor:
+        # bajo ASGI se transmite con un iterador async y bajo WSGI con uno síncrono.
+        if isinstance(request, ASGIRequest):
+            async def rows():
+                yield writer.writerow(header)
+                async for log in logs.aiterator(chunk_size=2000):
+                    yield row(log)
+        else:
+            def rows():
+                yield writer.writerow(header)
+                for log in logs.iterator(chunk_size=2000):
+                    yield row(log)
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="reveal_logs.csv"'
         return response
 
+    # Paginación por cursor sobre (revealed_at, id): sin COUNT ni OFFSET
+    page = await akeyset_page(
+        logs,
+        ('revealed_at', 'id'),
+        REVEAL_LOGS_PER_PAGE,
+        before=request.GET.get('before', ''),
+        after=request.GET.get('after', ''),
+    )
+
     context = {
-        'logs': logs,
+        'logs': page,
         'start': start_str,
         'end': end_str,
     }
     return render(request, 'vaul/reveal_logs.html', context)
 
 @login_required
+@read_from_replica
 def export_passwords(request):
-    """Exporta todas las contraseñas del usuario en formato JSON"""
+    """Exporta todas las contraseñas del usuario en formato JSON (o NDJSON con ?format=ndjson)"""
     if request.method != 'GET':
         return HttpResponseForbidden('Método no permitido')
     
-    entries = PasswordEntry.objects.filter(user=request.user).order_by('-created_at')
-    import json
-    from datetime import datetime
-    
-    data = {
-        'export_date': timezone.now().isoformat(),
-        'total_entries': entries.count(),
-        'entries': []
-    }
-    
-    for entry in entries:
-        try:
-            decrypted = decrypt_password(entry.encrypted_password)
-            data['entries'].append({
-                'site_name': entry.site_name,
-                'site_url': entry.site_url,
-                'username': entry.username,
-                'password': decrypted,
-                'category': entry.category,
-                'notes': entry.notes or '',
-                'created_at': entry.created_at.isoformat(),
-            })
-        except:
-            pass  # Omitir entradas que no se pueden descifrar
-    
-    response = HttpResponse(
-        json.dumps(data, indent=2, ensure_ascii=False),
-        content_type='application/json; charset=utf-8'
+    fmt = 'ndjson' if request.GET.get('format') == 'ndjson' else 'json'
+    content_type = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    response = StreamingHttpResponse(
+        _streaming_content(request, iter_export(request.user, fmt)),
+        content_type=f'{content_type}; charset=utf-8'
     )
-    response['Content-Disposition'] = f'attachment; filename="passwords_export_{timezone.now().strftime("%Y%m%d_%H%M%S")}.json"'
+    response['Content-Disposition'] = f'attachment; filename="passwords_export_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{fmt}"'
     return response
 
 @login_required
 def import_passwords(request):
-    """Importa contraseñas desde un archivo JSON"""
+    """Importa contraseñas desde un archivo JSON (o NDJSON)"""
     if request.method != 'POST':
         return HttpResponseForbidden('Método no permitido')
     
@@ -342,62 +537,73 @@ def import_passwords(request):
         messages.error(request, 'No se proporcionó ningún archivo.')
         return redirect('dashboard')
     
-    import json
+    upload = request.FILES['file']
+    if upload.size > settings.VAUL_IMPORT_ASYNC_THRESHOLD:
+        job = enqueue_import(request.user, upload)
+        messages.success(request, f'Archivo recibido: la importación #{job.id} se procesará en segundo plano.')
+        return redirect('dashboard')
     
     try:
-        file = request.FILES['file']
-        content = file.read().decode('utf-8')
-        data = json.loads(content)
-        
-        if 'entries' not in data:
-            messages.error(request, 'Formato de archivo inválido.')
-            return redirect('dashboard')
-        
-        imported = 0
-        skipped = 0
-        
-        for entry_data in data['entries']:
-            try:
-                site_name = entry_data.get('site_name', '').strip()
-                site_url = entry_data.get('site_url', '').strip()
-                username = entry_data.get('username', '').strip()
-                password = entry_data.get('password', '')
-                category = entry_data.get('category', 'other')
-                notes = entry_data.get('notes', '').strip()
-                
-                if not site_name or not site_url or not username or not password:
-                    skipped += 1
-                    continue
-                
-                # Verificar si ya existe (evitar duplicados)
-                if PasswordEntry.objects.filter(
-                    user=request.user,
-                    site_name=site_name,
-                    site_url=site_url,
-                    username=username
-                ).exists():
-                    skipped += 1
-                    continue
-                
-                encrypted = encrypt_password(password)
-                PasswordEntry.objects.create(
-                    user=request.user,
-                    site_name=site_name,
-                    site_url=site_url,
-                    username=username,
-                    encrypted_password=encrypted,
-                    category=category,
-                    notes=notes[:500] if notes else None
-                )
-                imported += 1
-            except Exception as e:
-                skipped += 1
-                continue
-        
-        messages.success(request, f'Importación completada: {imported} entradas importadas, {skipped} omitidas.')
-    except json.JSONDecodeError:
+        report = import_entries(request.user, upload.chunks(), ndjson=is_ndjson(upload.name))
+        messages.success(
+            request,
+            f'Importación completada: {report.imported} entradas importadas, '
+            f'{report.skipped} duplicadas omitidas, {report.invalid} inválidas.'
+        )
+    except ImportFormatError:
+        messages.error(request, 'Formato de archivo inválido.')
+    except (json.JSONDecodeError, UnicodeDecodeError):
         messages.error(request, 'El archivo no es un JSON válido.')
     except Exception as e:
         messages.error(request, f'Error al importar: {str(e)}')
     
     return redirect('dashboard')
+
+def _job_payload(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'format': job.format,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'imported': job.imported,
+        'skipped': job.skipped,
+        'invalid': job.invalid,
+        'error': job.error,
+        'download_url': reverse('job_download', args=[job.id]) if job.kind == 'export' and job.status == 'done' else None,
+    }
+
+@login_required
+def export_job(request):
+    """Encola una exportación para el worker en segundo plano"""
+    if request.method != 'POST':
+        return HttpResponseForbidden('Método no permitido')
+    fmt = 'ndjson' if request.POST.get('format') == 'ndjson' else 'json'
+    job = enqueue_export(request.user, fmt)
+    messages.success(request, f'La exportación #{job.id} se está preparando en segundo plano.')
+    return redirect('dashboard')
+
+@login_required
+def job_status(request, job_id: int):
+    job = get_object_or_404(ImportExportJob, id=job_id, user=request.user)
+    return JsonResponse(_job_payload(job))
+
+@login_required
+def job_download(request, job_id: int):
+    job = get_object_or_404(ImportExportJob, id=job_id, user=request.user, kind='export', status='done')
+    content_type = 'application/x-ndjson' if job.format == 'ndjson' else 'application/json'
+    response = StreamingHttpResponse(
+        _streaming_content(request, read_encrypted(Path(job.file_path))),
+        content_type=f'{content_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="passwords_export_{timezone.localtime(job.created_at).strftime("%Y%m%d_%H%M%S")}.{job.format}"'
+    return response
+
+@login_required
+def audit_stats(request):
+    """Contadores del escritor de auditoría diferido (solo staff)"""
+    if not request.user.is_staff:
+        return HttpResponseForbidden('No autorizado')
+    return JsonResponse({'mode': settings.VAUL_AUDIT_MODE, **get_audit_writer().stats()})